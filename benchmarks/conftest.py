@@ -0,0 +1,55 @@
+"""Shared data for the benchmarks. Run them with `make benchmark`, which
+compares against the latest baseline saved by `make benchmark-baseline`."""
+
+import random
+from typing import Any, Dict, List
+
+import pytest
+
+from cybersecuritytools.aws_permissions_helper.benchmark import write_synthetic_log
+
+# Large enough to dominate per call overhead while keeping a full
+# benchmark run to a minute or two.
+LOG_BYTES = 4 * 1048576
+RESULT_ROWS = 100000
+ACCOUNTS = 500
+LOG_GROUPS_PER_ACCOUNT = 20
+
+
+@pytest.fixture(scope="session")
+def synthetic_log(tmp_path_factory: Any) -> str:
+    path = tmp_path_factory.mktemp("logs") / "terraform-debug.log"
+    write_synthetic_log(str(path), LOG_BYTES)
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def splunk_results() -> List[Dict[str, str]]:
+    """Rows shaped like `payload_search_query` results."""
+    rng = random.Random(0)
+    return [
+        {
+            "_raw": f"Hello {rng.getrandbits(64):x} 2021-01-25 16:25:{n % 60:02}",
+            "_time": "2021-01-25T16:25:56.957+00:00",
+            "_cd": f"0:{n}",
+            "indextime": str(1611591956 + n // 1000),
+            "latency": "3",
+            "sourcetype": "gds:test:raw",
+        }
+        for n in range(RESULT_ROWS)
+    ]
+
+
+@pytest.fixture(scope="session")
+def accounts_toml(tmp_path_factory: Any) -> str:
+    path = tmp_path_factory.mktemp("accounts") / "accounts_loggroup_index.toml"
+    with open(path, "w") as f:
+        for account in range(ACCOUNTS):
+            f.write(f"[{100000000000 + account}]\n")
+            for group in range(LOG_GROUPS_PER_ACCOUNT):
+                f.write(
+                    f'"/aws/service{group}/group{account}" = '
+                    f'{{ index = "index{(account + group) % 50}", '
+                    f'sourcetype = "aws:service{group}" }}\n'
+                )
+    return str(path)
@@ -0,0 +1,31 @@
+from typing import Any
+
+from cybersecuritytools.csls.hec_index_checker import accountstoml
+from cybersecuritytools.csls.hec_index_checker.accountstoml import (
+    indexes_from_accounts,
+    load_accounts_loggroup_index_toml,
+    load_accounts_toml,
+)
+
+
+def test_indexes_from_accounts(benchmark: Any, accounts_toml: str) -> None:
+    accounts = load_accounts_loggroup_index_toml(accounts_toml)
+    assert len(benchmark(indexes_from_accounts, accounts)) == 50
+
+
+def test_load_accounts_toml_uncached(benchmark: Any, accounts_toml: str) -> None:
+    def load() -> Any:
+        accountstoml._accounts_cache.clear()
+        return load_accounts_toml(accounts_toml)
+
+    assert len(benchmark(load).indexes) == 50
+
+
+def test_load_accounts_toml_cached(benchmark: Any, accounts_toml: str) -> None:
+    load_accounts_toml(accounts_toml)
+    assert len(benchmark(load_accounts_toml, accounts_toml).indexes) == 50
+
+
+def test_account_index_lookup(benchmark: Any, accounts_toml: str) -> None:
+    accounts = load_accounts_toml(accounts_toml)
+    assert benchmark(accounts.index, "100000000499", "/aws/service19/group499")
@@ -0,0 +1,25 @@
+from typing import Any
+
+from cybersecuritytools.aws_permissions_helper.aws_requests import (
+    actions_from_paths,
+    extract_requests,
+    grouped_permissions,
+)
+
+
+def test_extract_requests(benchmark: Any, synthetic_log: str) -> None:
+    def extract() -> str:
+        with open(synthetic_log) as f:
+            return extract_requests(f)
+
+    assert benchmark(extract)
+
+
+def test_grouped_permissions(benchmark: Any, synthetic_log: str) -> None:
+    with open(synthetic_log) as f:
+        requests = extract_requests(f)
+    assert benchmark(grouped_permissions, requests)
+
+
+def test_actions_from_paths(benchmark: Any, synthetic_log: str) -> None:
+    assert benchmark(actions_from_paths, [synthetic_log], 1)
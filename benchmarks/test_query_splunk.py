@@ -0,0 +1,45 @@
+from typing import Any, Dict, List
+
+from cybersecuritytools.csls.generate_cloudwatch_logs.put_cloudwatch_logs import (
+    CloudWatchLogResult,
+    log_lines,
+)
+from cybersecuritytools.csls.generate_cloudwatch_logs.query_splunk import (
+    PayloadTracker,
+    load_test_found,
+    payload_found,
+)
+
+
+def cloudwatch_results(splunk_results: List[Dict[str, str]]) -> Any:
+    """Results for lines near the end of the Splunk results."""
+    return {
+        str(n): CloudWatchLogResult(0, "/gds/test/raw", row["_raw"], "stream", "p")
+        for n, row in enumerate(splunk_results[-4:])
+    }
+
+
+def test_payload_found(benchmark: Any, splunk_results: List[Dict[str, str]]) -> None:
+    expected = cloudwatch_results(splunk_results)
+    assert benchmark(payload_found, expected, splunk_results)
+
+
+def test_payload_tracker_update(
+    benchmark: Any, splunk_results: List[Dict[str, str]]
+) -> None:
+    expected = cloudwatch_results(splunk_results)
+
+    def update() -> bool:
+        return PayloadTracker(expected).update(splunk_results)
+
+    assert benchmark(update)
+
+
+def test_load_test_found(benchmark: Any) -> None:
+    # One row per split of a `stats count(source) by ...` search.
+    results = [{"count(source)": str(n)} for n in range(100000)]
+    assert benchmark(load_test_found, results, 100000, 100000)
+
+
+def test_log_lines(benchmark: Any) -> None:
+    assert benchmark(log_lines, "payload").logs
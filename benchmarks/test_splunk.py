@@ -0,0 +1,32 @@
+import base64
+import os
+from typing import Any, Dict, List
+
+from cybersecuritytools.csls.generate_cloudwatch_logs.emulator import (
+    StubJob,
+    StubSearch,
+    StubSplunk,
+)
+from cybersecuritytools.splunk.x509 import (
+    CertBundle,
+    RequestsFingerPrintAdapterCertificates,
+)
+
+
+def test_certificate_fingerprint(benchmark: Any) -> None:
+    # About the size of a DER encoded RSA 2048 certificate.
+    cert = base64.b64encode(os.urandom(1400)).decode()
+    rfpac = RequestsFingerPrintAdapterCertificates(CertBundle(cert, cert))
+    assert len(benchmark(rfpac.certificate_fingerprint, cert)) == 64
+
+
+def test_search_job_results(
+    benchmark: Any, splunk_results: List[Dict[str, str]]
+) -> None:
+    search = StubSearch(StubSplunk())
+    job = StubJob("1", splunk_results)
+
+    def parse() -> int:
+        return sum(1 for _ in search.job_results(job))
+
+    assert benchmark(parse) == len(splunk_results)
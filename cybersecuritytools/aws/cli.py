@@ -0,0 +1,13 @@
+import click
+
+from cybersecuritytools.aws_permissions_helper.cli import permissions
+
+
+# Top level module group
+@click.group()
+def aws() -> None:
+    pass
+
+
+# Module sub groups / commands
+aws.add_command(permissions)
@@ -1,18 +1,124 @@
 from os import environ
+from time import monotonic
+from typing import Any, Dict, Optional, Tuple
 
-import boto3
+from ..metrics import timed
+
+DEFAULT_TTL_SECONDS = 300.0
+
+
+class ParameterStore:
+    """A caching wrapper around AWS SSM Parameter Store.
+
+    A single SSM client is created on first use and shared by every
+    lookup. Decrypted values are held in memory for `ttl` seconds so
+    repeated lookups, and lookups of siblings under the same path, do
+    not make further requests to SSM.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL_SECONDS, client: Any = None):
+        self.ttl = ttl
+        self._client = client
+        self._cache: Dict[str, Tuple[float, str]] = {}
+        self._paths: Dict[str, float] = {}
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("ssm")
+        return self._client
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._paths.clear()
+
+    def _remember(self, name: str, value: str) -> None:
+        self._cache[name] = (monotonic() + self.ttl, value)
+
+    def cached(self, name: str) -> Optional[str]:
+        """Return an unexpired cached value, or `None`."""
+        entry = self._cache.get(name)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < monotonic():
+            del self._cache[name]
+            return None
+        return value
+
+    def get(self, name: str) -> str:
+        """Retrieve a single decrypted parameter, using the cache if possible."""
+        value = self.cached(name)
+        if value is None:
+            with timed("ssm.get_parameter") as call:
+                response = self.client.get_parameter(Name=name, WithDecryption=True)
+                value = str(response["Parameter"]["Value"])
+                call.bytes = len(value)
+            self._remember(name, value)
+        return value
+
+    def load_path(self, path: str) -> None:
+        """Fetch every parameter below `path` into the cache. The path
+        is only fetched again once the TTL has passed."""
+        path = "/" + path.strip("/")
+        if self._paths.get(path, 0.0) >= monotonic():
+            return
+
+        # Page through by hand rather than with a paginator, so each
+        # GetParametersByPath request is timed on its own.
+        kwargs = {"Path": path, "Recursive": True, "WithDecryption": True}
+        while True:
+            with timed("ssm.get_parameters_by_path") as call:
+                page = self.client.get_parameters_by_path(**kwargs)
+                parameters = page["Parameters"]
+                call.bytes = sum(len(p["Value"]) for p in parameters)
+            for parameter in parameters:
+                self._remember(parameter["Name"], parameter["Value"])
+            if not page.get("NextToken"):
+                break
+            kwargs["NextToken"] = page["NextToken"]
+
+        self._paths[path] = monotonic() + self.ttl
+
+    def env_or_param(self, ssm_root: str, parameter_name: str) -> str:
+        """Return the environment variable `PARAMETER_NAME` if it is set,
+        otherwise the SSM parameter `/{ssm_root}/parameter_name`.
+
+        The first SSM lookup under `ssm_root` loads the whole path in one
+        batch, so subsequent lookups are served from the cache."""
+        value = environ.get(parameter_name.upper())
+        if value is not None:
+            return value
+
+        name = f"/{ssm_root.strip('/')}/{parameter_name.lower()}"
+        value = self.cached(name)
+        if value is None:
+            self.load_path(ssm_root)
+            value = self.cached(name)
+        if value is None:
+            # Not found under the path, ask for it directly so SSM
+            # raises the usual ParameterNotFound error.
+            value = self.get(name)
+        return value
+
+
+_parameter_store: Optional[ParameterStore] = None
+
+
+def parameter_store() -> ParameterStore:
+    """The process wide ParameterStore used by the module functions."""
+    global _parameter_store
+    if _parameter_store is None:
+        _parameter_store = ParameterStore()
+    return _parameter_store
 
 
 def get_param_from_ssm(param: str) -> str:
     """Retrieve a decrypted SSM parameter and return the value"""
-    ssm_client = boto3.client("ssm")
-    response = ssm_client.get_parameter(Name=param, WithDecryption=True)
-    value: str = response["Parameter"]["Value"]
-    return value
+    return parameter_store().get(param)
 
 
 def env_or_param(ssm_root: str, parameter_name: str) -> str:
-    return environ.get(
-        parameter_name.upper(),
-        get_param_from_ssm(f"/{ssm_root}/{parameter_name.lower()}"),
-    )
+    return parameter_store().env_or_param(ssm_root, parameter_name)
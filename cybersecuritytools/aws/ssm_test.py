@@ -0,0 +1,87 @@
+import os
+from typing import Any, Iterator
+
+import boto3
+import pytest
+from moto import mock_ssm  # type: ignore
+from pytest_mock import MockerFixture
+
+from ..metrics import metrics
+from .ssm import ParameterStore
+
+
+@pytest.fixture
+def ssm() -> Iterator[Any]:
+    """A mocked SSM with a few parameters under `/root`"""
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-1"
+    with mock_ssm():
+        client = boto3.client("ssm")
+        for name in ["splunk_host_cert", "splunk_ca_cert"]:
+            client.put_parameter(
+                Name=f"/root/{name}", Value=f"{name}-value", Type="SecureString"
+            )
+        yield client
+
+
+def test_env_or_param_prefers_environment(
+    ssm: Any, mocker: MockerFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """SSM should not be called when the environment variable is set"""
+    monkeypatch.setenv("SPLUNK_HOST_CERT", "from-env")
+    store = ParameterStore(client=ssm)
+    spy = mocker.spy(ssm, "get_parameters_by_path")
+
+    assert store.env_or_param("root", "splunk_host_cert") == "from-env"
+    assert spy.call_count == 0
+
+
+def test_env_or_param_loads_path_once(ssm: Any, mocker: MockerFixture) -> None:
+    """Sibling parameters should be served from a single path lookup"""
+    store = ParameterStore(client=ssm)
+    spy = mocker.spy(ssm, "get_parameters_by_path")
+
+    assert store.env_or_param("root", "splunk_host_cert") == "splunk_host_cert-value"
+    assert store.env_or_param("root", "splunk_ca_cert") == "splunk_ca_cert-value"
+    assert spy.call_count == 1
+
+
+def test_env_or_param_missing(ssm: Any) -> None:
+    store = ParameterStore(client=ssm)
+    with pytest.raises(ssm.exceptions.ParameterNotFound):
+        store.env_or_param("root", "does_not_exist")
+
+
+def test_cache_expires(ssm: Any, mocker: MockerFixture) -> None:
+    store = ParameterStore(ttl=0, client=ssm)
+    spy = mocker.spy(ssm, "get_parameter")
+
+    store.get("/root/splunk_ca_cert")
+    store.get("/root/splunk_ca_cert")
+    assert spy.call_count == 2
+
+
+def test_ssm_calls_are_timed(ssm: Any) -> None:
+    metrics().clear()
+    store = ParameterStore(client=ssm)
+    store.load_path("root")
+    with pytest.raises(ssm.exceptions.ParameterNotFound):
+        store.get("/root/missing")
+
+    calls = metrics().snapshot()
+    assert calls["ssm.get_parameters_by_path"].count == 1
+    assert calls["ssm.get_parameters_by_path"].bytes == len(
+        "splunk_host_cert-value" "splunk_ca_cert-value"
+    )
+    assert calls["ssm.get_parameter"].errors == 1
+    metrics().clear()
+
+
+def test_each_page_is_timed(ssm: Any) -> None:
+    for i in range(25):
+        ssm.put_parameter(Name=f"/many/p{i}", Value="value", Type="SecureString")
+    metrics().clear()
+    ParameterStore(client=ssm).load_path("many")
+
+    # GetParametersByPath returns at most 10 parameters a page.
+    assert metrics().snapshot()["ssm.get_parameters_by_path"].count == 3
+    metrics().clear()
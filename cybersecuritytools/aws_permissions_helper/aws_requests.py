@@ -1,22 +1,171 @@
+import argparse
 import json
+import os
 import re
 import sys
-from typing import Dict, List, Pattern
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from time import sleep
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Pattern, Set, Tuple
 
 ACTION = re.compile(r"((?<=DEBUG: Request\s)(\w*\W\w*))")
 SERVICE = re.compile(r"(\w*(?=\:))")
 PERMISSION = re.compile(r"((?<=\:)\w*)")
 
+# Checking for this substring is much cheaper than running ACTION, and
+# only a small fraction of the lines in a Terraform debug log match it.
+REQUEST_MARKER = b"DEBUG: Request"
+ACTION_BYTES = re.compile(rb"DEBUG: Request\s(\w*\W\w*)")
+
+# Files smaller than this are not worth splitting between processes.
+MIN_CHUNK_BYTES = 64 * 1024 * 1024
+
+# The maximum size of a customer managed IAM policy, not counting whitespace.
+MAX_POLICY_CHARS = 6144
+
+ByteRange = Tuple[str, int, int]
+PermissionIndex = Dict[str, Set[str]]
+PolicyDocument = Dict[str, Any]
+
 
 def main() -> None:
-    input = sys.argv[1]
-    with open(input, "r") as raw_log:
-        debug_log = raw_log.readlines()
+    parser = argparse.ArgumentParser(
+        description="Extract the AWS API requests from Terraform debug logs."
+    )
+    parser.add_argument(
+        "logs", nargs="*", default=["-"], help="Log files, or - for stdin"
+    )
+    parser.add_argument(
+        "-j",
+        "--processes",
+        type=int,
+        default=1,
+        help="Split large log files between this many processes",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="aws_requests.json",
+        help="Where to write the output, or - for stdout",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=["grouped", "policy"],
+        default="grouped",
+        help="Actions grouped by service, or IAM policy documents",
+    )
+    parser.add_argument(
+        "-w",
+        "--wildcard",
+        action="append",
+        default=[],
+        help="Merge a service's actions starting with this verb, e.g. Describe",
+    )
+    parser.add_argument(
+        "-c",
+        "--checkpoint",
+        help="Only read log bytes added since the last run with this checkpoint",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep reading the logs as they grow, updating the output",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=1.0,
+        help="Seconds between checks for new log lines with --follow",
+    )
+    args = parser.parse_args()
+
+    try:
+        extract_permissions(
+            args.logs,
+            output=args.output,
+            output_format=args.format,
+            wildcards=args.wildcard,
+            processes=args.processes,
+            checkpoint_path=args.checkpoint,
+            follow=args.follow,
+            interval=args.interval,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+
+def extract_permissions(
+    logs: List[str],
+    output: str = "aws_requests.json",
+    output_format: str = "grouped",
+    wildcards: List[str] = [],
+    processes: int = 1,
+    checkpoint_path: Optional[str] = None,
+    follow: bool = False,
+    interval: float = 1.0,
+) -> None:
+    """Extract the AWS actions from `logs` and write them to `output`,
+    see `main` for what each of the options does."""
+    if not (checkpoint_path or follow):
+        actions = actions_from_paths(logs, processes)
+        write_actions(actions, output, output_format, wildcards)
+        return
+
+    if "-" in logs:
+        raise ValueError("stdin can not be used with --checkpoint or --follow")
+
+    checkpoint = Checkpoint()
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        checkpoint = load_checkpoint(checkpoint_path)
+
+    written = False
+    while True:
+        # Always write on the first pass, so the output exists even when
+        # no actions have been found yet.
+        if update_checkpoint(checkpoint, logs, processes) or not written:
+            write_actions(checkpoint.actions, output, output_format, wildcards)
+            written = True
+        if checkpoint_path:
+            checkpoint.save(checkpoint_path)
+        if not follow:
+            return
+        try:
+            sleep(interval)
+        except KeyboardInterrupt:
+            return
+
+
+def write_actions(
+    actions: Set[str], output: str, output_format: str, wildcards: List[str]
+) -> None:
+    index = permission_index(actions)
+    if output_format == "policy":
+        write_policy_documents(policy_documents(index, wildcards), output)
+    else:
+        write_output(json.dumps(sorted_index(index)), output)
+
+
+def write_output(text: str, output: str) -> None:
+    if output == "-":
+        print(text)
+    else:
+        with open(output, "w") as f:
+            f.write(text)
+
 
-    requests = extract_requests(debug_log)
+def write_policy_documents(documents: List[PolicyDocument], output: str) -> None:
+    """Write the policy documents to stdout as a JSON list, or to
+    `output`. More than one document is written to numbered files
+    alongside `output`, e.g. policy-1.json and policy-2.json."""
+    if output == "-" or len(documents) == 1:
+        text = documents if output == "-" else documents[0]
+        write_output(json.dumps(text, indent=2), output)
+        return
 
-    with open("aws_requests.json", "w") as aws_requests:
-        aws_requests.write(grouped_permissions(requests))
+    stem, ext = os.path.splitext(output)
+    for i, document in enumerate(documents, 1):
+        write_output(json.dumps(document, indent=2), f"{stem}-{i}{ext}")
 
 
 def first_match(pattern: Pattern[str], text: str) -> str:
@@ -30,7 +179,7 @@ def first_match(pattern: Pattern[str], text: str) -> str:
         return "No Match"
 
 
-def extract_requests(raw_log: List[str]) -> str:
+def extract_requests(raw_log: Iterable[str]) -> str:
     """
     >>> extract_requests(['2021-01-25T16:25:56.957Z [DEBUG] \
     plugin.terraform-provider-aws_v2.70.0_x4:2021/01/2516:25:56 \
@@ -40,6 +189,8 @@ def extract_requests(raw_log: List[str]) -> str:
     iam_actions = set()
 
     for line in raw_log:
+        if "DEBUG: Request" not in line:
+            continue
         match = re.search(ACTION, line)
         if match:
             iam_action = match.group(1).replace("/", ":")
@@ -48,6 +199,251 @@ def extract_requests(raw_log: List[str]) -> str:
     return "\n".join(sorted(iam_actions))
 
 
+def actions_from_stream(
+    stream: BinaryIO, start: int = 0, end: Optional[int] = None
+) -> Set[str]:
+    """Extract the IAM actions from a binary log stream one line at a
+    time, so memory use doesn't grow with the size of the log.
+
+    Only lines starting in the byte range [start, end) are read, which
+    lets a file be split between processes without reading a line twice.
+
+    >>> import io
+    >>> log = io.BytesIO(b"[DEBUG] DEBUG: Request ec2/CreateVpc Details:\\n"
+    ...                  b"[DEBUG] other\\n"
+    ...                  b"[DEBUG] DEBUG: Request s3/ListBuckets Details:\\n")
+    >>> sorted(actions_from_stream(log))
+    ['ec2:CreateVpc', 's3:ListBuckets']
+    >>> sorted(actions_from_stream(log, start=1, end=60))
+    []
+    """
+    position = start
+    if start > 0:
+        # Move to the start of the first line beginning at or after `start`.
+        # A stream read from the start, such as stdin, needn't be seekable.
+        stream.seek(start - 1)
+        position += len(stream.readline()) - 1
+
+    actions = set()
+    for line in stream:
+        if end is not None and position >= end:
+            break
+        position += len(line)
+        if REQUEST_MARKER not in line:
+            continue
+        match = ACTION_BYTES.search(line)
+        if match:
+            actions.add(match.group(1).decode(errors="replace").replace("/", ":"))
+    return actions
+
+
+def actions_from_byte_range(byte_range: ByteRange) -> Set[str]:
+    path, start, end = byte_range
+    with open(path, "rb") as f:
+        return actions_from_stream(f, start, end)
+
+
+def byte_ranges(
+    path: str, parts: int, start: int = 0, end: Optional[int] = None
+) -> List[ByteRange]:
+    """Split a file, or the part of it from `start` to `end`, into at
+    most `parts` byte ranges of at least MIN_CHUNK_BYTES each."""
+    if end is None:
+        end = os.path.getsize(path)
+    parts = max(1, min(parts, (end - start) // MIN_CHUNK_BYTES))
+    step = max(1, -(-(end - start) // parts))
+    return [(path, s, min(s + step, end)) for s in range(start, end, step)]
+
+
+def expand_paths(paths: Iterable[str]) -> List[str]:
+    """Replace directories with the files inside them."""
+    expanded: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in sorted(os.walk(path)):
+                expanded.extend(os.path.join(root, f) for f in sorted(files))
+        else:
+            expanded.append(path)
+    return expanded
+
+
+def actions_from_paths(paths: Iterable[str], processes: int = 1) -> Set[str]:
+    """Extract the IAM actions from many log files. A path of "-" reads
+    from stdin, and a directory reads every file in it. With more than
+    one process, large files are split into byte ranges that are scanned
+    in parallel."""
+    actions: Set[str] = set()
+    ranges: List[ByteRange] = []
+    for path in expand_paths(paths):
+        if path == "-":
+            actions |= actions_from_stream(sys.stdin.buffer)
+        else:
+            ranges.extend(byte_ranges(path, processes))
+
+    return actions | actions_from_ranges(ranges, processes)
+
+
+def actions_from_ranges(ranges: List[ByteRange], processes: int = 1) -> Set[str]:
+    actions: Set[str] = set()
+    if processes > 1 and len(ranges) > 1:
+        with Pool(processes) as pool:
+            for found in pool.imap_unordered(actions_from_byte_range, ranges):
+                actions |= found
+    else:
+        for byte_range in ranges:
+            actions |= actions_from_byte_range(byte_range)
+
+    return actions
+
+
+def complete_lines_end(path: str, start: int, size: int) -> int:
+    """The offset just past the last newline in `path` between `start`
+    and `size`, so a line still being written is left for later."""
+    with open(path, "rb") as f:
+        end = size
+        while end > start:
+            block_start = max(start, end - 65536)
+            f.seek(block_start)
+            newline = f.read(end - block_start).rfind(b"\n")
+            if newline >= 0:
+                return block_start + newline + 1
+            end = block_start
+    return start
+
+
+@dataclass
+class Checkpoint:
+    """The actions found so far, and how far into each log file has been
+    read. Files are identified by inode so a rotated or truncated log is
+    read again from the start."""
+
+    offsets: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    actions: Set[str] = field(default_factory=set)
+
+    def save(self, path: str) -> None:
+        data = {
+            "files": {
+                p: {"inode": inode, "offset": offset}
+                for p, (inode, offset) in self.offsets.items()
+            },
+            "actions": sorted(self.actions),
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> Checkpoint:
+    with open(path) as f:
+        data = json.load(f)
+    return Checkpoint(
+        offsets={p: (v["inode"], v["offset"]) for p, v in data["files"].items()},
+        actions=set(data["actions"]),
+    )
+
+
+def update_checkpoint(
+    checkpoint: Checkpoint, paths: Iterable[str], processes: int = 1
+) -> Set[str]:
+    """Read the complete lines added to each log since the checkpoint was
+    last updated, merging any actions found into it. Returns the actions
+    that weren't already in the checkpoint."""
+    ranges: List[ByteRange] = []
+    for path in expand_paths(paths):
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        inode, offset = checkpoint.offsets.get(key, (stat.st_ino, 0))
+        if inode != stat.st_ino or offset > stat.st_size:
+            offset = 0
+        end = complete_lines_end(path, offset, stat.st_size)
+        ranges.extend(byte_ranges(path, processes, offset, end))
+        checkpoint.offsets[key] = (stat.st_ino, end)
+
+    new_actions = actions_from_ranges(ranges, processes) - checkpoint.actions
+    checkpoint.actions |= new_actions
+    return new_actions
+
+
+def permission_index(actions: Iterable[str]) -> PermissionIndex:
+    """Group IAM actions by service in a single pass.
+
+    >>> permission_index(["ec2:CreateVpc", "s3:ListBuckets", "ec2:CreateVpc"])
+    {'ec2': {'CreateVpc'}, 's3': {'ListBuckets'}}
+    """
+    index: PermissionIndex = {}
+    for action in actions:
+        service, _, permission = action.partition(":")
+        index.setdefault(service, set()).add(permission)
+    return index
+
+
+def sorted_index(index: PermissionIndex) -> Dict[str, List[str]]:
+    return {service: sorted(index[service]) for service in sorted(index)}
+
+
+def merge_wildcards(permissions: Set[str], verbs: Iterable[str]) -> List[str]:
+    """Replace the permissions starting with each verb by `{verb}*` when
+    more than one of them would be merged.
+
+    >>> merge_wildcards({"DescribeVpcs", "DescribeSubnets", "CreateVpc",
+    ...                  "ListTags"}, ["Describe", "List"])
+    ['CreateVpc', 'Describe*', 'ListTags']
+    """
+    merged = set(permissions)
+    for verb in verbs:
+        matching = {p for p in merged if p.startswith(verb)}
+        if len(matching) > 1:
+            merged = (merged - matching) | {f"{verb}*"}
+    return sorted(merged)
+
+
+def policy_size(document: PolicyDocument) -> int:
+    return len(json.dumps(document, separators=(",", ":")))
+
+
+def policy_document(actions: List[str]) -> PolicyDocument:
+    return {
+        "Version": "2012-10-17",
+        "Statement": [{"Effect": "Allow", "Action": actions, "Resource": "*"}],
+    }
+
+
+def policy_documents(
+    index: PermissionIndex,
+    wildcards: Iterable[str] = (),
+    max_chars: int = MAX_POLICY_CHARS,
+) -> List[PolicyDocument]:
+    """Build IAM policy documents allowing every action in `index`,
+    splitting the actions between as many documents as needed to keep
+    each one under `max_chars`.
+
+    >>> policy_documents({"s3": {"ListBuckets"}})
+    [{'Version': '2012-10-17', 'Statement': [{'Effect': 'Allow', \
+'Action': ['s3:ListBuckets'], 'Resource': '*'}]}]
+    >>> len(policy_documents({"s3": {f"Get{i}" for i in range(30)}}, max_chars=200))
+    3
+    """
+    wildcards = list(wildcards)
+    documents = []
+    actions: List[str] = []
+    size = policy_size(policy_document([]))
+    for service in sorted(index):
+        for permission in merge_wildcards(index[service], wildcards):
+            action = f"{service}:{permission}"
+            # Quotes and a separating comma around each action
+            action_size = len(action) + 3
+            if actions and size + action_size > max_chars:
+                documents.append(policy_document(actions))
+                actions = []
+                size = policy_size(policy_document([]))
+            actions.append(action)
+            size += action_size
+    if actions:
+        documents.append(policy_document(actions))
+    return documents
+
+
 def grouped_permissions(requests: str) -> str:
     """
     >>> grouped_permissions(\
@@ -0,0 +1,169 @@
+import json
+import subprocess
+import sys
+from typing import Any
+
+from pytest_mock import MockerFixture
+
+from .aws_requests import (
+    MAX_POLICY_CHARS,
+    Checkpoint,
+    actions_from_paths,
+    byte_ranges,
+    complete_lines_end,
+    extract_permissions,
+    load_checkpoint,
+    policy_documents,
+    policy_size,
+    update_checkpoint,
+    write_policy_documents,
+)
+
+LOG = (
+    b"[DEBUG] plugin: DEBUG: Request ec2/CreateVpc Details:\n"
+    b"[DEBUG] plugin: something else\n"
+    b"[DEBUG] plugin: DEBUG: Request s3/ListBuckets Details:\n"
+)
+
+
+def test_actions_from_piped_stdin() -> None:
+    """stdin is a pipe, which can't be seeked"""
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "cybersecuritytools.aws_permissions_helper.aws_requests",
+            "-o",
+            "-",
+            "-",
+        ],
+        input=LOG,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    assert json.loads(process.stdout) == {"ec2": ["CreateVpc"], "s3": ["ListBuckets"]}
+
+
+def test_empty_file(tmp_path: Any) -> None:
+    path = str(tmp_path / "empty.log")
+    open(path, "w").close()
+
+    assert byte_ranges(path, 4) == []
+    assert actions_from_paths([path], processes=4) == set()
+
+
+def request_line(action: str) -> bytes:
+    return f"[DEBUG] plugin: DEBUG: Request {action} Details:\n".encode()
+
+
+def test_complete_lines_end_leaves_partial_line(tmp_path: Any) -> None:
+    path = tmp_path / "terraform.log"
+    path.write_bytes(b"first\nsecond\nthird still being wri")
+
+    size = path.stat().st_size
+    assert complete_lines_end(str(path), 0, size) == len(b"first\nsecond\n")
+    assert complete_lines_end(str(path), 13, size) == 13
+
+
+def test_update_checkpoint_resumes(tmp_path: Any) -> None:
+    path = tmp_path / "terraform.log"
+    path.write_bytes(request_line("ec2/CreateVpc") + b"[DEBUG] DEBUG: Request s3/Li")
+    checkpoint = Checkpoint()
+
+    assert update_checkpoint(checkpoint, [str(path)]) == {"ec2:CreateVpc"}
+    assert checkpoint.offsets[str(path)][1] == len(request_line("ec2/CreateVpc"))
+
+    with open(path, "ab") as f:
+        f.write(b"stBuckets Details:\n")
+    assert update_checkpoint(checkpoint, [str(path)]) == {"s3:ListBuckets"}
+    assert update_checkpoint(checkpoint, [str(path)]) == set()
+    assert checkpoint.actions == {"ec2:CreateVpc", "s3:ListBuckets"}
+
+
+def test_update_checkpoint_rereads_truncated_log(tmp_path: Any) -> None:
+    path = tmp_path / "terraform.log"
+    path.write_bytes(request_line("ec2/CreateVpc") * 3)
+    checkpoint = Checkpoint()
+    update_checkpoint(checkpoint, [str(path)])
+
+    path.write_bytes(request_line("iam/GetRole"))
+
+    assert update_checkpoint(checkpoint, [str(path)]) == {"iam:GetRole"}
+    assert checkpoint.offsets[str(path)][1] == len(request_line("iam/GetRole"))
+
+
+def test_update_checkpoint_rereads_rotated_log(tmp_path: Any) -> None:
+    path = tmp_path / "terraform.log"
+    path.write_bytes(request_line("ec2/CreateVpc"))
+    checkpoint = Checkpoint()
+    update_checkpoint(checkpoint, [str(path)])
+
+    # A new file with the same name, longer than the checkpointed offset.
+    rotated = tmp_path / "terraform.log.new"
+    rotated.write_bytes(request_line("iam/GetRole") * 2)
+    rotated.replace(path)
+
+    assert update_checkpoint(checkpoint, [str(path)]) == {"iam:GetRole"}
+
+
+def test_checkpoint_save_and_load(tmp_path: Any) -> None:
+    checkpoint = Checkpoint({"/logs/terraform.log": (1234, 56)}, {"ec2:CreateVpc"})
+    path = str(tmp_path / "checkpoint.json")
+
+    checkpoint.save(path)
+
+    assert load_checkpoint(path) == checkpoint
+
+
+def test_follow_writes_output_on_first_pass(
+    tmp_path: Any, mocker: MockerFixture
+) -> None:
+    log = tmp_path / "terraform.log"
+    log.write_bytes(b"[DEBUG] nothing to see\n")
+    output = tmp_path / "aws_requests.json"
+    mocker.patch(f"{__package__}.aws_requests.sleep", side_effect=KeyboardInterrupt)
+
+    extract_permissions([str(log)], output=str(output), follow=True)
+
+    assert json.loads(output.read_text()) == {}
+
+
+def test_policy_documents_split_at_managed_policy_limit() -> None:
+    index = {"ec2": {f"DescribeResource{i:04}" for i in range(1000)}}
+
+    documents = policy_documents(index)
+
+    assert len(documents) > 1
+    assert all(policy_size(d) <= MAX_POLICY_CHARS for d in documents)
+    actions = [a for d in documents for a in d["Statement"][0]["Action"]]
+    assert sorted(actions) == sorted(f"ec2:{p}" for p in index["ec2"])
+
+
+def test_policy_documents_merge_wildcards() -> None:
+    index = {"ec2": {f"DescribeResource{i:04}" for i in range(1000)} | {"RunVm"}}
+
+    documents = policy_documents(index, wildcards=["Describe"])
+
+    assert documents[0]["Statement"][0]["Action"] == ["ec2:Describe*", "ec2:RunVm"]
+
+
+def test_write_policy_documents_numbers_files(tmp_path: Any) -> None:
+    documents = policy_documents({"s3": {f"Get{i}" for i in range(30)}}, max_chars=200)
+    output = tmp_path / "policy.json"
+
+    write_policy_documents(documents, str(output))
+
+    written = sorted(p.name for p in tmp_path.iterdir())
+    assert written == [f"policy-{i}.json" for i in range(1, len(documents) + 1)]
+    assert json.loads((tmp_path / "policy-2.json").read_text()) == documents[1]
+
+
+def test_write_single_policy_document(tmp_path: Any) -> None:
+    documents = policy_documents({"s3": {"ListBuckets"}})
+    output = tmp_path / "policy.json"
+
+    write_policy_documents(documents, str(output))
+
+    assert [p.name for p in tmp_path.iterdir()] == ["policy.json"]
+    assert json.loads(output.read_text()) == documents[0]
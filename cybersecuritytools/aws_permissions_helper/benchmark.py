@@ -0,0 +1,114 @@
+"""A reproducible benchmark of the Terraform debug log parser, run with
+`cst aws permissions benchmark`."""
+
+import os
+import random
+import resource
+import sys
+from dataclasses import dataclass
+from time import perf_counter
+from typing import List
+
+from .aws_requests import actions_from_paths
+
+SERVICES = ["ec2", "iam", "s3", "rds", "ecs", "logs", "kms", "lambda", "sts"]
+VERBS = ["Describe", "List", "Get", "Create", "Put", "Delete", "Tag"]
+RESOURCES = ["Instances", "Roles", "Buckets", "Clusters", "Keys", "Policies"]
+
+# Lines around a request in a real TF_LOG=DEBUG log, most of which are
+# request and response bodies rather than "DEBUG: Request" lines.
+FILLER = [
+    "{ts} [DEBUG] plugin.terraform-provider-aws_v3.27.0_x5: {ts} [DEBUG] "
+    '[aws-sdk-go] {{"RequestId":"{rid}","Reservations":[]}}',
+    '{ts} [TRACE] dag/walk: vertex "aws_instance.web{n}" is waiting for '
+    '"provider[\\"registry.terraform.io/hashicorp/aws\\"]"',
+    "{ts} [DEBUG] plugin.terraform-provider-aws_v3.27.0_x5: Host: "
+    "ec2.eu-west-2.amazonaws.com",
+    "{ts} [DEBUG] plugin.terraform-provider-aws_v3.27.0_x5: X-Amz-Date: "
+    "20210125T162556Z",
+]
+REQUEST = (
+    "{ts} [DEBUG] plugin.terraform-provider-aws_v3.27.0_x5: {ts} [DEBUG] "
+    "[aws-sdk-go] DEBUG: Request {service}/{action} Details:"
+)
+
+
+@dataclass
+class BenchmarkResult:
+    lines: int
+    bytes: int
+    seconds: float
+    actions: int
+    peak_rss_kb: int
+
+    def lines_per_second(self) -> float:
+        return self.lines / self.seconds if self.seconds else 0.0
+
+    def megabytes_per_second(self) -> float:
+        return self.bytes / 1048576 / self.seconds if self.seconds else 0.0
+
+
+def write_synthetic_log(
+    path: str, size_bytes: int, request_ratio: float = 0.02, seed: int = 0
+) -> int:
+    """Write a Terraform style debug log of about `size_bytes` to `path`
+    where `request_ratio` of the lines are AWS requests. The same seed
+    always writes the same log. Returns the number of lines written."""
+    rng = random.Random(seed)
+    lines = 0
+    written = 0
+    with open(path, "w") as f:
+        chunk: List[str] = []
+        while written < size_bytes:
+            ts = f"2021-01-25T16:{rng.randrange(60):02}:{rng.randrange(60):02}.957Z"
+            if rng.random() < request_ratio:
+                action = rng.choice(VERBS) + rng.choice(RESOURCES)
+                line = REQUEST.format(
+                    ts=ts, service=rng.choice(SERVICES), action=action
+                )
+            else:
+                line = rng.choice(FILLER).format(
+                    ts=ts, rid=rng.getrandbits(64), n=rng.randrange(100)
+                )
+            chunk.append(line)
+            written += len(line) + 1
+            lines += 1
+            if len(chunk) == 10000:
+                f.write("\n".join(chunk) + "\n")
+                chunk = []
+        if chunk:
+            f.write("\n".join(chunk) + "\n")
+    return lines
+
+
+def count_lines(path: str) -> int:
+    lines = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1048576), b""):
+            lines += block.count(b"\n")
+    return lines
+
+
+def peak_rss_kb() -> int:
+    """Peak resident set size of this process and its finished children."""
+    rss = sum(
+        resource.getrusage(who).ru_maxrss
+        for who in [resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN]
+    )
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux.
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def run_benchmark(path: str, processes: int = 1) -> BenchmarkResult:
+    """Time extracting the actions from the log at `path`."""
+    lines = count_lines(path)
+    start = perf_counter()
+    actions = actions_from_paths([path], processes)
+    seconds = perf_counter() - start
+    return BenchmarkResult(
+        lines=lines,
+        bytes=os.path.getsize(path),
+        seconds=seconds,
+        actions=len(actions),
+        peak_rss_kb=peak_rss_kb(),
+    )
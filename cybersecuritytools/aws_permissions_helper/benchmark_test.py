@@ -0,0 +1,24 @@
+from typing import Any
+
+from .benchmark import run_benchmark, write_synthetic_log
+
+
+def test_synthetic_log_is_reproducible(tmp_path: Any) -> None:
+    first = str(tmp_path / "first.log")
+    second = str(tmp_path / "second.log")
+    write_synthetic_log(first, 100000, seed=1)
+    write_synthetic_log(second, 100000, seed=1)
+    with open(first) as f, open(second) as g:
+        assert f.read() == g.read()
+
+
+def test_run_benchmark(tmp_path: Any) -> None:
+    path = str(tmp_path / "terraform.log")
+    lines = write_synthetic_log(path, 100000, request_ratio=0.5)
+
+    result = run_benchmark(path)
+
+    assert result.lines == lines
+    assert result.bytes >= 100000
+    assert result.actions > 0
+    assert result.peak_rss_kb > 0
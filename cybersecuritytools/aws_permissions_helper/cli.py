@@ -0,0 +1,114 @@
+import os
+import tempfile
+from typing import List, Optional
+
+import click
+
+from .aws_requests import extract_permissions
+from .benchmark import run_benchmark, write_synthetic_log
+
+
+@click.group()
+def permissions() -> None:
+    """Find the AWS permissions used by a Terraform run."""
+    pass
+
+
+@permissions.command()
+@click.argument("logs", nargs=-1)
+@click.option(
+    "-o",
+    "--output",
+    default="aws_requests.json",
+    show_default=True,
+    help="Where to write the output, or - for stdout",
+)
+@click.option(
+    "-f",
+    "--format",
+    "output_format",
+    type=click.Choice(["grouped", "policy"]),
+    default="grouped",
+    help="Actions grouped by service, or IAM policy documents",
+)
+@click.option(
+    "-w",
+    "--wildcard",
+    multiple=True,
+    help="Merge a service's actions starting with this verb, e.g. Describe",
+)
+@click.option(
+    "-j",
+    "--processes",
+    type=int,
+    default=1,
+    help="Split large log files between this many processes",
+)
+@click.option(
+    "-c",
+    "--checkpoint",
+    help="Only read log bytes added since the last run with this checkpoint",
+)
+@click.option("--follow", is_flag=True, help="Keep reading the logs as they grow")
+@click.option("--interval", type=float, default=1.0, help="Seconds between reads")
+def extract(
+    logs: List[str],
+    output: str,
+    output_format: str,
+    wildcard: List[str],
+    processes: int,
+    checkpoint: Optional[str],
+    follow: bool,
+    interval: float,
+) -> None:
+    """Extract the AWS API requests from Terraform TF_LOG=DEBUG logs.
+
+    LOGS are log files or directories of them, read stdin if none are given.
+    """
+    try:
+        extract_permissions(
+            list(logs) or ["-"],
+            output=output,
+            output_format=output_format,
+            wildcards=list(wildcard),
+            processes=processes,
+            checkpoint_path=checkpoint,
+            follow=follow,
+            interval=interval,
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+
+@permissions.command()
+@click.option(
+    "-s", "--size-mb", type=int, default=2048, show_default=True, help="Log size"
+)
+@click.option("-j", "--processes", type=int, default=1, help="Parser processes")
+@click.option("--seed", type=int, default=0, help="Seed for the synthetic log")
+@click.option(
+    "--log",
+    type=click.Path(dir_okay=False),
+    help="Use or create this log rather than a temporary file",
+)
+def benchmark(size_mb: int, processes: int, seed: int, log: Optional[str]) -> None:
+    """Benchmark extracting permissions from a synthetic debug log."""
+    path = log or os.path.join(tempfile.mkdtemp(), "terraform-debug.log")
+    if not os.path.exists(path):
+        print(f"Writing a {size_mb} MB synthetic log to {path}")
+        write_synthetic_log(path, size_mb * 1048576, seed=seed)
+
+    try:
+        result = run_benchmark(path, processes)
+    finally:
+        if not log:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+
+    print(f"lines:      {result.lines}")
+    print(f"bytes:      {result.bytes}")
+    print(f"actions:    {result.actions}")
+    print(f"seconds:    {result.seconds:.2f}")
+    print(f"lines/s:    {result.lines_per_second():.0f}")
+    print(f"MB/s:       {result.megabytes_per_second():.1f}")
+    print(f"peak RSS:   {result.peak_rss_kb} KB")
@@ -1,15 +1,34 @@
+from typing import Optional
+
 import click
 
-from .generate_cloudwatch_logs.cli import generate_cloudwatch_logs
-from .hec_index_checker.cli import check_hec_token
+from cybersecuritytools.lazy_group import LazyGroup
 
+HEC_INDEX_CHECKER = "cybersecuritytools.csls.hec_index_checker.cli"
+CLOUDWATCH_LOGS = "cybersecuritytools.csls.generate_cloudwatch_logs.cli"
 
-# Top level module group
-@click.group()
-def csls() -> None:
-    pass
 
+# Top level module group, with its sub groups / commands
+@click.group(
+    cls=LazyGroup,
+    lazy_subcommands={
+        "check-hec-token": f"{HEC_INDEX_CHECKER}:check_hec_token",
+        "check-hec-tokens": f"{HEC_INDEX_CHECKER}:check_hec_tokens",
+        "generate-cloudwatch-logs": f"{CLOUDWATCH_LOGS}:generate_cloudwatch_logs",
+    },
+)
+@click.option(
+    "--cache-max-age",
+    type=int,
+    envvar="CST_CACHE_MAX_AGE",
+    help="Seconds to reuse cached Splunk credentials (needs CST_CACHE_KEY)",
+)
+@click.option(
+    "--refresh-cache",
+    is_flag=True,
+    help="Fetch Splunk credentials from SSM and rewrite the credential cache",
+)
+def csls(cache_max_age: Optional[int], refresh_cache: bool) -> None:
+    from cybersecuritytools.splunk.cache import configure_credential_cache
 
-# Module sub groups / commands
-csls.add_command(check_hec_token)
-csls.add_command(generate_cloudwatch_logs)
+    configure_credential_cache(max_age=cache_max_age, refresh=refresh_cache)
@@ -14,14 +14,29 @@ import sys
 from datetime import datetime
 from pprint import pprint
 from time import sleep
+from typing import List, Optional
 
 import click
 
-from cybersecuritytools.splunk.credentials import credentials
-from cybersecuritytools.splunk.search import Search
+from cybersecuritytools.splunk.search import SEARCH_MODES, Search
 
-from .put_cloudwatch_logs import send_logs_to_cloudwatch, setup_cloudwatch_log_groups
-from .query_splunk import load_test_found, payload_found, search_query
+from .emulator import DEFAULT_INDEXING_DELAY, PipelineEmulator
+from .generate_load import generate_load, load_manifest
+from .latency import latency_report as pipeline_latency_report
+from .latency import latency_report_json, latency_report_table
+from .put_cloudwatch_logs import (
+    log_formats,
+    provision_cloudwatch_log_groups,
+    send_logs_to_cloudwatch,
+    setup_cloudwatch_log_groups,
+)
+from .query_splunk import (
+    PayloadTracker,
+    load_test_found,
+    load_test_query,
+    payload_search_query,
+    search_query,
+)
 
 
 @click.group()
@@ -29,38 +44,193 @@ def generate_cloudwatch_logs() -> None:
     pass
 
 
+def pipeline_search(
+    ssm_root: Optional[str], emulate: bool, indexing_delay: float
+) -> Search:
+    """Search Splunk with the credentials in SSM or, with `emulate`, start
+    a local emulated pipeline which runs until the command finishes."""
+    if emulate:
+        try:
+            emulator = PipelineEmulator(indexing_delay=indexing_delay)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        return click.get_current_context().with_resource(emulator).search()
+    if not ssm_root:
+        raise click.UsageError("--ssm is required unless --emulate is given")
+
+    # The cache needs cryptography, so it is only imported when used.
+    from cybersecuritytools.splunk.cache import cached_credentials
+
+    return Search(cached_credentials(ssm_root, "search"))
+
+
+emulate_option = click.option(
+    "--emulate",
+    is_flag=True,
+    help="Use a local emulated CloudWatch and Splunk instead of AWS and Splunk",
+)
+indexing_delay_option = click.option(
+    "--indexing-delay",
+    type=float,
+    default=DEFAULT_INDEXING_DELAY,
+    show_default=True,
+    help="Seconds the emulated Splunk takes to make an event searchable",
+)
+
+
 @generate_cloudwatch_logs.command()
 @click.option("-d", "--destination-arn", required=True, type=str)
 @click.option("-r", "--role-arn", required=True, type=str)
-def create_log_groups(destination_arn: str, role_arn: str) -> None:
-    setup_cloudwatch_log_groups(dest_arn=destination_arn, role_arn=role_arn)
+@click.option(
+    "-g",
+    "--group",
+    "groups",
+    multiple=True,
+    help="Log group to provision, defaults to one per log format",
+)
+@click.option("--dry-run", is_flag=True, help="Print the changes without applying")
+@click.option(
+    "--serial",
+    is_flag=True,
+    help="Create and subscribe every group in turn, without reading first",
+)
+def create_log_groups(
+    destination_arn: str,
+    role_arn: str,
+    groups: List[str],
+    dry_run: bool,
+    serial: bool,
+) -> None:
+    if serial:
+        setup_cloudwatch_log_groups(dest_arn=destination_arn, role_arn=role_arn)
+        return
+
+    plan = provision_cloudwatch_log_groups(
+        dest_arn=destination_arn,
+        role_arn=role_arn,
+        group_names=list(groups) or None,
+        dry_run=dry_run,
+    )
+    if plan.empty():
+        print("[+] Log groups are already provisioned")
+    for group in plan.create_groups:
+        print(f"[+] Create log group {group}")
+    for group in plan.put_filters:
+        print(f"[+] Put subscription filter on {group}")
 
 
 @generate_cloudwatch_logs.command()
-def send_logs() -> None:
+@click.option(
+    "-n", "--events-per-format", type=int, default=1, help="Events to send per format"
+)
+@click.option("-w", "--workers", type=int, help="Formats to send concurrently")
+def send_logs(events_per_format: int, workers: Optional[int]) -> None:
     """Send test data to Cloudwatch log-groups based on selected format."""
-    send_logs_to_cloudwatch()
+    send_logs_to_cloudwatch(events_per_format=events_per_format, max_workers=workers)
+
+
+@generate_cloudwatch_logs.command(name="generate-load")
+@click.option(
+    "-r", "--rate", type=click.IntRange(min=1), required=True, help="Events per second"
+)
+@click.option(
+    "-d",
+    "--duration",
+    type=click.IntRange(min=1),
+    required=True,
+    help="Seconds to run for",
+)
+@click.option(
+    "-f",
+    "--format",
+    "formats",
+    multiple=True,
+    type=click.Choice(log_formats()),
+    help="Log format to send, can be repeated. Defaults to all formats",
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=4,
+    help="Log streams per format",
+)
+@click.option(
+    "-m",
+    "--manifest",
+    default="load_manifest.json",
+    show_default=True,
+    help="Where to write the manifest of what was sent",
+)
+def generate_load_command(
+    rate: int, duration: int, formats: List[str], workers: int, manifest: str
+) -> None:
+    """Send a sustained load of test data to CloudWatch and record it."""
+    load = generate_load(rate, duration, list(formats) or log_formats(), workers)
+    load.write(manifest)
+    print(
+        f"Sent {load.total_sent()} of {load.total_planned()} events "
+        f"with payload {load.payload} to CloudWatch"
+    )
+    print(f"Manifest written to {manifest}")
 
 
 @generate_cloudwatch_logs.command()
 @click.option("-t", "--timeout", type=int, default=600)
-@click.option("--ssm", required=True, help="SSM root path")
-def smoke_test(ssm_root: str, timeout: int) -> None:
+@click.option("--ssm", "ssm_root", help="SSM root path")
+@emulate_option
+@indexing_delay_option
+@click.option(
+    "--search-mode",
+    type=click.Choice(SEARCH_MODES),
+    default="normal",
+    help="How to run the Splunk searches",
+)
+@click.option(
+    "--incremental/--full",
+    default=True,
+    help="Only search events indexed since the previous poll",
+)
+@click.option(
+    "--latency-report",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the pipeline latency percentiles as JSON to this path",
+)
+def smoke_test(
+    ssm_root: Optional[str],
+    emulate: bool,
+    indexing_delay: float,
+    timeout: int,
+    search_mode: str,
+    incremental: bool,
+    latency_report: Optional[str],
+) -> None:
     """Run an end to end test on the pipeline"""
+    splunk = pipeline_search(ssm_root, emulate, indexing_delay)
     cloudwatch_results = send_logs_to_cloudwatch()
     print("Sent logs to CloudWatch")
     start_timestamp = int(datetime.now().timestamp())
     print("Polling splunk to find our logs...")
 
-    splunk_credentials = credentials(ssm_root, "search")
-    splunk = Search(splunk_credentials)
+    tracker = PayloadTracker(cloudwatch_results)
+    query = payload_search_query(cloudwatch_results)
 
     while True:
         duration = int(datetime.now().timestamp()) - start_timestamp
-        splunk_results = splunk.search(search_query(test_type="smoke_test"))
+        search_kwargs = splunk.search_defaults()
+        if incremental:
+            search_kwargs = tracker.search_kwargs(search_kwargs)
+        splunk_results = splunk.search(query, search_kwargs, mode=search_mode)
 
-        if payload_found(cloudwatch_results, splunk_results):
+        if tracker.update(splunk_results):
             print(f"\n✔️ Pipeline smoketest succeeded in {duration} seconds")
+            report = pipeline_latency_report(
+                cloudwatch_results, tracker.matched_results()
+            )
+            print(latency_report_table(report))
+            if latency_report:
+                with open(latency_report, "w") as f:
+                    f.write(latency_report_json(report))
             sys.exit(0)
 
         if duration > timeout:
@@ -73,6 +243,8 @@ def smoke_test(ssm_root: str, timeout: int) -> None:
             print("\n\n\n\n")
             print("Splunk results: ")
             pprint(splunk_results)
+            print("Log lines not found in Splunk: ")
+            pprint(tracker.missing())
             print(
                 f"\n❌ TIMEOUT searching for payload in splunk after {duration} seconds",
                 file=sys.stderr,
@@ -85,23 +257,81 @@ def smoke_test(ssm_root: str, timeout: int) -> None:
 
 @generate_cloudwatch_logs.command()
 @click.option("-t", "--timeout", type=int, default=600)
-@click.option("--ssm", required=True, help="SSM root path")
-def load_test(ssm: str, timeout: int) -> None:
-    """Check Splunk for artillery payloads on the pipeline"""
-    start_timestamp = float(datetime.now().timestamp())
+@click.option("--ssm", help="SSM root path")
+@emulate_option
+@indexing_delay_option
+@click.option(
+    "--load-rate",
+    type=click.IntRange(min=1),
+    default=100,
+    show_default=True,
+    help="Events per second to send with --emulate",
+)
+@click.option(
+    "--load-duration",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Seconds to send events for with --emulate",
+)
+@click.option(
+    "--search-mode",
+    type=click.Choice(SEARCH_MODES),
+    default="normal",
+    help="How to run the Splunk searches",
+)
+@click.option(
+    "-m",
+    "--manifest",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Manifest written by generate-load, instead of an Artillery run",
+)
+def load_test(
+    ssm: Optional[str],
+    emulate: bool,
+    indexing_delay: float,
+    load_rate: int,
+    load_duration: int,
+    timeout: int,
+    search_mode: str,
+    manifest: Optional[str],
+) -> None:
+    """Check Splunk for artillery payloads on the pipeline.
 
-    splunk_credentials = credentials(ssm, "search")
-    splunk = Search(splunk_credentials)
+    With --emulate the load is generated into the emulated pipeline first.
+    """
+    splunk = pipeline_search(ssm, emulate, indexing_delay)
 
-    while True:
+    load = None
+    if emulate:
+        load = generate_load(load_rate, load_duration, log_formats())
+        print(f"Sent {load.total_sent()} events to CloudWatch")
+    elif manifest:
+        load = load_manifest(manifest)
 
-        duration = float(datetime.now().timestamp()) - start_timestamp
+    start_timestamp = float(datetime.now().timestamp())
+    search_kwargs = splunk.search_defaults()
+    if load:
+        artillery_config = load.total_planned()
+        requests_completed = load.total_sent()
+        query = load_test_query(load.payload)
+        search_kwargs["earliest_time"] = str(load.started_ms // 1000)
+    else:
         artillery_config = 80000
         requests_completed = int(os.environ.get("requests_completed", artillery_config))
+        query = search_query(test_type="smoke_test")
+
+    while True:
+
+        duration = float(datetime.now().timestamp()) - start_timestamp
 
-        splunk_results = splunk.search(search_query(test_type="smoke_test"))
+        splunk_results = splunk.search(query, search_kwargs, mode=search_mode)
 
-        if load_test_found(splunk_results, artillery_config, requests_completed):
+        if load_test_found(
+            splunk_results,
+            requests_completed=requests_completed,
+            artillery_config=artillery_config,
+        ):
             print(f"\n✔️ Pipeline load test succeeded in {duration} seconds")
             sys.exit(0)
 
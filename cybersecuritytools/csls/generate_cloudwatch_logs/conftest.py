@@ -0,0 +1,20 @@
+import os
+import time
+from typing import Iterator
+
+import pytest
+
+
+@pytest.fixture
+def non_utc_timezone() -> Iterator[None]:
+    """Run a test with the local time nine hours ahead of UTC, so a local
+    time mistaken for UTC is far enough out to notice."""
+    original = os.environ.get("TZ")
+    os.environ["TZ"] = "JST-9"
+    time.tzset()
+    yield
+    if original is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = original
+    time.tzset()
@@ -0,0 +1,363 @@
+"""An offline stand-in for the CSLS pipeline, so `smoke-test` and
+`load-test` can be run and timed with no AWS account, network or Splunk.
+
+`PipelineEmulator` mocks CloudWatch Logs in process with moto. Events put
+to the test log groups are forwarded, as Kinesis and the Splunk HEC would,
+into a `StubSplunk` which makes each event searchable `indexing_delay`
+seconds after CloudWatch ingested it.
+
+`StubSplunk` stands in for a `splunklib` client, so `StubSearch` runs the
+same job polling, paging and JSON parsing as `Search`. It only
+understands the queries built in `query_splunk`: `index` and `sourcetype`
+filters, quoted search terms any of which must match, `| stats
+count(source)`, and the `earliest_time`, `latest_time` and
+`index_earliest` search arguments.
+"""
+
+import io
+import json
+import os
+import random
+import re
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from time import time
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Type
+
+from cybersecuritytools.splunk.credentials import SplunkCredentials
+from cybersecuritytools.splunk.search import Search
+
+from .put_cloudwatch_logs import log_formats, log_group_name, logs_client
+from .query_splunk import log_group_name_to_splunk_format
+
+if TYPE_CHECKING:
+    from mypy_boto3_logs.client import CloudWatchLogsClient
+
+DEFAULT_INDEXING_DELAY = 2.0
+DEFAULT_INDEX = "test_data"
+
+
+@dataclass
+class IndexedEvent:
+    raw: str
+    time: float
+    indexed_at: float
+    sourcetype: str
+    index: str
+    cd: str
+
+    @property
+    def indextime(self) -> int:
+        """Splunk's `_indextime`, which has a resolution of one second."""
+        return int(self.indexed_at)
+
+    def result(self) -> Dict[str, str]:
+        """The event as a row of `payload_search_query` results."""
+        event_time = datetime.fromtimestamp(self.time, timezone.utc)
+        return {
+            "_raw": self.raw,
+            "_time": event_time.isoformat(timespec="milliseconds"),
+            "_cd": self.cd,
+            "indextime": str(self.indextime),
+            "latency": str(self.indextime - int(self.time)),
+            "sourcetype": self.sourcetype,
+        }
+
+
+@dataclass
+class StubQuery:
+    indexes: List[str] = field(default_factory=list)
+    sourcetypes: List[str] = field(default_factory=list)
+    terms: List[str] = field(default_factory=list)
+    count: bool = False
+
+    def matches(self, event: IndexedEvent) -> bool:
+        return (
+            (not self.indexes or event.index in self.indexes)
+            and (not self.sourcetypes or event.sourcetype in self.sourcetypes)
+            and (not self.terms or any(term in event.raw for term in self.terms))
+        )
+
+
+FIELD_IN = re.compile(r"(\w+)\s+IN\s*\(([^)]*)\)")
+FIELD_EQUALS = re.compile(r'(\w+)\s*=\s*("[^"]*"|\S+)')
+
+
+def parse_query(query: str) -> StubQuery:
+    """Parse the parts of an SPL query that `StubSplunk` understands.
+
+    >>> parse_query('search index="test_data" sourcetype IN ("a:b", c:d) "x"')
+    StubQuery(indexes=['test_data'], sourcetypes=['a:b', 'c:d'], terms=['x'], \
+count=False)
+    """
+    search, *commands = query.split("|")
+    parsed = StubQuery(count=any(c.strip().startswith("stats count") for c in commands))
+
+    fields: Dict[str, List[str]] = {}
+    for name, values in FIELD_IN.findall(search):
+        fields.setdefault(name, []).extend(v.strip(' "') for v in values.split(","))
+    search = FIELD_IN.sub("", search)
+    for name, value in FIELD_EQUALS.findall(search):
+        fields.setdefault(name, []).append(value.strip('"'))
+    search = FIELD_EQUALS.sub("", search)
+
+    parsed.indexes = fields.get("index", [])
+    parsed.sourcetypes = fields.get("sourcetype", [])
+    parsed.terms = re.findall(r'"([^"]*)"', search)
+    return parsed
+
+
+def parse_time(value: Optional[str], now: float) -> Optional[float]:
+    """Epoch seconds for a search time argument such as `now`, `-15m` or
+    an epoch.
+
+    >>> parse_time("-15m", 1000.0), parse_time("now", 1000.0), parse_time("5", 0)
+    (100.0, 1000.0, 5.0)
+    """
+    if value is None:
+        return None
+    if value == "now":
+        return now
+    relative = re.fullmatch(r"-(\d+)([smhd])", value)
+    if relative:
+        seconds = {"s": 1, "m": 60, "h": 3600, "d": 86400}[relative.group(2)]
+        return now - int(relative.group(1)) * seconds
+    return float(value)
+
+
+class StubJob:
+    """A finished search job over a snapshot of the stub index."""
+
+    def __init__(self, sid: str, results: List[Dict[str, str]]):
+        self.sid = sid
+        self.rows = results
+        self.cancelled = False
+
+    def is_done(self) -> bool:
+        return True
+
+    def results(
+        self, count: int = 100, offset: int = 0, output_mode: str = "json"
+    ) -> io.BytesIO:
+        if output_mode != "json":
+            raise ValueError("StubSplunk only returns json results")
+        rows = self.rows[offset:][:count] if count else self.rows[offset:]
+        return results_stream(rows)
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+def results_stream(rows: List[Dict[str, str]]) -> io.BytesIO:
+    """A results body in Splunk's JSON output mode."""
+    body = {"preview": False, "init_offset": 0, "messages": [], "results": rows}
+    return io.BytesIO(json.dumps(body).encode())
+
+
+class StubJobs:
+    def __init__(self, splunk: "StubSplunk"):
+        self.splunk = splunk
+        self.created = 0
+
+    def create(self, query: str, **kwargs: Any) -> StubJob:
+        self.created += 1
+        return StubJob(str(self.created), self.splunk.search(query, **kwargs))
+
+    def oneshot(self, query: str, **kwargs: Any) -> io.BytesIO:
+        return results_stream(self.splunk.search(query, **kwargs))
+
+    def export(self, query: str, **kwargs: Any) -> io.BytesIO:
+        return results_stream(self.splunk.search(query, **kwargs))
+
+
+class StubSplunk:
+    """An in memory Splunk index with the `jobs` interface of a
+    `splunklib` client. `before_search` is called before every search,
+    for example to forward newly sent events into the index."""
+
+    def __init__(
+        self,
+        indexing_delay: float = DEFAULT_INDEXING_DELAY,
+        before_search: Optional[Callable[[], Any]] = None,
+    ):
+        self.indexing_delay = indexing_delay
+        self.before_search = before_search
+        self.events: List[IndexedEvent] = []
+        self.jobs = StubJobs(self)
+        self.lock = threading.Lock()
+
+    def index(
+        self,
+        raw: str,
+        event_time: float,
+        ingested: float,
+        sourcetype: str,
+        index: str = DEFAULT_INDEX,
+    ) -> None:
+        """Index an event received at `ingested`, making it searchable after
+        the indexing delay with up to 10% jitter."""
+        delay = self.indexing_delay * random.uniform(1.0, 1.1)
+        with self.lock:
+            self.events.append(
+                IndexedEvent(
+                    raw=raw,
+                    time=event_time,
+                    indexed_at=ingested + delay,
+                    sourcetype=sourcetype,
+                    index=index,
+                    cd=f"0:{len(self.events)}",
+                )
+            )
+
+    def search(self, query: str, **kwargs: Any) -> List[Dict[str, str]]:
+        if self.before_search is not None:
+            self.before_search()
+
+        now = time()
+        earliest = parse_time(kwargs.get("earliest_time"), now)
+        latest = parse_time(kwargs.get("latest_time"), now)
+        index_earliest = parse_time(kwargs.get("index_earliest"), now)
+        parsed = parse_query(query)
+
+        with self.lock:
+            events = list(self.events)
+        matched = [
+            event
+            for event in events
+            if event.indexed_at <= now
+            and (earliest is None or event.time >= earliest)
+            and (latest is None or event.time <= latest)
+            and (index_earliest is None or event.indextime >= index_earliest)
+            and parsed.matches(event)
+        ]
+
+        if parsed.count:
+            return [{"count(source)": str(len(matched))}]
+        return [event.result() for event in matched]
+
+
+class StubSearch(Search):
+    """A `Search` running against a `StubSplunk` rather than a server."""
+
+    def __init__(self, splunk: StubSplunk, **kwargs: Any):
+        self.splunk = splunk
+        credentials = SplunkCredentials(
+            hostname="localhost", port="8089", password="", username="emulator"
+        )
+        super().__init__(credentials, **kwargs)
+
+    def create_client(self) -> Any:
+        return self.splunk
+
+
+# Placeholder credentials for moto, which never leave the process.
+EMULATOR_ENVIRONMENT = {
+    "AWS_ACCESS_KEY_ID": "emulator",
+    "AWS_SECRET_ACCESS_KEY": "emulator",
+    "AWS_SESSION_TOKEN": "emulator",
+    "AWS_DEFAULT_REGION": "eu-west-2",
+}
+
+
+class PipelineEmulator:
+    """Emulate CloudWatch Logs, Kinesis and Splunk in process. Use it as
+    a context manager around the code sending and searching for events:
+
+        with PipelineEmulator(indexing_delay=5) as emulator:
+            results = send_logs_to_cloudwatch()
+            splunk = emulator.search()
+    """
+
+    def __init__(
+        self,
+        indexing_delay: float = DEFAULT_INDEXING_DELAY,
+        index: str = DEFAULT_INDEX,
+    ):
+        self.index = index
+        self.splunk = StubSplunk(indexing_delay, before_search=self.forward)
+        try:
+            # moto is a development dependency, only needed when emulating.
+            from moto import mock_logs  # type: ignore
+        except ImportError:
+            raise RuntimeError("The pipeline emulator needs moto, pip install moto")
+        self.mock = mock_logs()
+        self.saved_environment: Dict[str, Optional[str]] = {}
+        self.tokens: Dict[Tuple[str, str], str] = {}
+        self.forward_lock = threading.Lock()
+        self._client: Optional["CloudWatchLogsClient"] = None
+
+    def __enter__(self) -> "PipelineEmulator":
+        for name, value in EMULATOR_ENVIRONMENT.items():
+            self.saved_environment[name] = os.environ.get(name)
+            os.environ[name] = value
+        self.mock.start()
+        self._client = logs_client()
+        for fmt in ["general"] + log_formats():
+            self._client.create_log_group(logGroupName=log_group_name(fmt))
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.mock.stop()
+        self._client = None
+        for name, saved in self.saved_environment.items():
+            if saved is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = saved
+
+    @property
+    def client(self) -> "CloudWatchLogsClient":
+        if self._client is None:
+            raise RuntimeError("The pipeline emulator is not running")
+        return self._client
+
+    def search(self, **kwargs: Any) -> StubSearch:
+        return StubSearch(self.splunk, **kwargs)
+
+    def forward(self) -> int:
+        """Index every event put to CloudWatch since the last call, returning
+        how many were forwarded."""
+        forwarded = 0
+        with self.forward_lock:
+            groups = self.client.get_paginator("describe_log_groups").paginate()
+            for page in groups:
+                for group in page["logGroups"]:
+                    forwarded += self.forward_group(group["logGroupName"])
+        return forwarded
+
+    def forward_group(self, group_name: str) -> int:
+        forwarded = 0
+        sourcetype = log_group_name_to_splunk_format(group_name)
+        streams = self.client.get_paginator("describe_log_streams")
+        for page in streams.paginate(logGroupName=group_name):
+            for stream in page["logStreams"]:
+                key = (group_name, stream["logStreamName"])
+                while True:
+                    kwargs: Dict[str, Any] = {"startFromHead": True}
+                    if key in self.tokens:
+                        kwargs["nextToken"] = self.tokens[key]
+                    response = self.client.get_log_events(
+                        logGroupName=group_name,
+                        logStreamName=stream["logStreamName"],
+                        **kwargs,
+                    )
+                    for event in response["events"]:
+                        self.splunk.index(
+                            raw=event["message"],
+                            event_time=event["timestamp"] / 1000,
+                            ingested=event.get("ingestionTime", time() * 1000) / 1000,
+                            sourcetype=sourcetype,
+                            index=self.index,
+                        )
+                    forwarded += len(response["events"])
+                    self.tokens[key] = response["nextForwardToken"]
+                    if not response["events"]:
+                        break
+        return forwarded
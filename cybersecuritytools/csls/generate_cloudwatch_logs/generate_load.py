@@ -0,0 +1,167 @@
+"""Generate a sustained load of test events in CloudWatch logs, recording
+exactly what was sent so `load_test` can verify it arrived in Splunk."""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, Dict, List, Optional
+from uuid import uuid4
+
+if TYPE_CHECKING:
+    from mypy_boto3_logs.client import CloudWatchLogsClient
+    from mypy_boto3_logs.type_defs import InputLogEventTypeDef
+
+from .put_cloudwatch_logs import (
+    create_log_stream,
+    log_group_name,
+    log_lines,
+    logs_client,
+    put_log_event_batches,
+)
+
+
+@dataclass
+class LoadManifest:
+    """The ground truth of a load generation run.
+
+    `planned` and `sent` are the number of events per log format that
+    should have been, and were, accepted by CloudWatch.
+    """
+
+    payload: str
+    rate: int
+    duration: int
+    started_ms: int = 0
+    finished_ms: int = 0
+    planned: Dict[str, int] = field(default_factory=dict)
+    sent: Dict[str, int] = field(default_factory=dict)
+    errors: Dict[str, int] = field(default_factory=dict)
+    log_streams: Dict[str, List[str]] = field(default_factory=dict)
+
+    def total_planned(self) -> int:
+        return sum(self.planned.values())
+
+    def total_sent(self) -> int:
+        return sum(self.sent.values())
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(asdict(self), f, indent=2, sort_keys=True)
+
+
+def load_manifest(path: str) -> LoadManifest:
+    with open(path) as f:
+        return LoadManifest(**json.load(f))
+
+
+def now_ms() -> int:
+    return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+
+@dataclass
+class WorkerResult:
+    file_format: str
+    log_stream_name: str
+    sent: int
+    errors: int
+
+
+def worker_rates(rate: int, workers: int) -> List[int]:
+    """Share `rate` events per second between workers.
+
+    >>> worker_rates(10, 4)
+    [3, 3, 2, 2]
+    >>> worker_rates(2, 4)
+    [1, 1]
+    """
+    rates = [rate // workers + (1 if i < rate % workers else 0) for i in range(workers)]
+    return [r for r in rates if r]
+
+
+def load_worker(
+    client: "CloudWatchLogsClient",
+    file_format: str,
+    payload: str,
+    worker: int,
+    rate: int,
+    duration: int,
+) -> WorkerResult:
+    """Send `rate` events a second to a new log stream for `duration`
+    seconds. Only events CloudWatch accepted are counted as sent, the rest
+    of each second's events are counted as errors."""
+    from botocore.exceptions import ClientError  # type: ignore
+
+    group_name = log_group_name(file_format)
+    stream = create_log_stream(group_name, client, suffix=str(worker))
+    sent = 0
+    errors = 0
+
+    next_tick = monotonic()
+    deadline = next_tick + duration
+    while True:
+        line = log_lines(payload).logs[file_format]
+        events: List["InputLogEventTypeDef"] = [
+            {"timestamp": now_ms(), "message": line}
+        ] * rate
+        accepted = 0
+        try:
+            for count in put_log_event_batches(client, group_name, stream.name, events):
+                accepted += count
+        except ClientError:
+            pass
+        sent += accepted
+        errors += rate - accepted
+
+        next_tick += 1
+        if next_tick >= deadline:
+            break
+        wait = next_tick - monotonic()
+        if wait > 0:
+            sleep(wait)
+
+    return WorkerResult(file_format, stream.name, sent, errors)
+
+
+def generate_load(
+    rate: int,
+    duration: int,
+    formats: List[str],
+    workers: int = 4,
+    payload: Optional[str] = None,
+) -> LoadManifest:
+    """Send `rate` events per second to each format's log group for
+    `duration` seconds, split between `workers` log streams per format.
+
+    All events carry the same payload UUID so they can be counted in
+    Splunk with a single search.
+    """
+    manifest = LoadManifest(
+        payload=payload or str(uuid4()),
+        rate=rate,
+        duration=duration,
+        planned={f: rate * duration for f in formats},
+    )
+
+    cwl = logs_client()
+    manifest.started_ms = now_ms()
+    rates = worker_rates(rate, workers)
+    with ThreadPoolExecutor(max_workers=len(rates) * len(formats)) as executor:
+        futures = [
+            executor.submit(
+                load_worker, cwl, file_format, manifest.payload, i, r, duration
+            )
+            for file_format in formats
+            for i, r in enumerate(rates)
+        ]
+    manifest.finished_ms = now_ms()
+
+    for future in futures:
+        result = future.result()
+        fmt = result.file_format
+        manifest.sent[fmt] = manifest.sent.get(fmt, 0) + result.sent
+        manifest.errors[fmt] = manifest.errors.get(fmt, 0) + result.errors
+        manifest.log_streams.setdefault(fmt, []).append(result.log_stream_name)
+
+    return manifest
@@ -0,0 +1,110 @@
+"""Measure the latency of the CSLS pipeline, from the timestamp of an
+event sent to CloudWatch to the time it was indexed in Splunk."""
+
+import json
+import math
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Tuple
+
+from .put_cloudwatch_logs import CloudWatchLogResult
+from .query_splunk import SplunkResults
+
+
+@dataclass
+class LatencyStats:
+    """Latency in seconds for the events of one log format and sourcetype."""
+
+    log_format: str
+    sourcetype: str
+    count: int
+    p50: float
+    p90: float
+    p99: float
+    max: float
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """The nearest rank percentile of a sorted list of values.
+
+    >>> percentile([1.0, 2.0, 3.0, 4.0], 50)
+    2.0
+    >>> percentile([1.0, 2.0, 3.0, 4.0], 99)
+    4.0
+    """
+    rank = max(math.ceil(pct / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def latency_samples(
+    cloudwatch_results: Dict[str, CloudWatchLogResult],
+    splunk_results: SplunkResults,
+) -> Dict[Tuple[str, str], List[float]]:
+    """Join Splunk events to the CloudWatch log lines they came from, and
+    return the seconds between the CloudWatch event timestamp and the
+    Splunk index time grouped by log format and sourcetype."""
+    formats = {c.log_line: (f, c) for f, c in cloudwatch_results.items()}
+    samples: Dict[Tuple[str, str], List[float]] = {}
+    for result in splunk_results:
+        match = formats.get(result.get("_raw", ""))
+        if match is None or result.get("indextime") is None:
+            continue
+        log_format, cloudwatch_result = match
+        latency = float(result["indextime"]) - cloudwatch_result.timestamp_ms / 1000
+        key = (log_format, str(result.get("sourcetype", "")))
+        samples.setdefault(key, []).append(latency)
+    return samples
+
+
+def latency_report(
+    cloudwatch_results: Dict[str, CloudWatchLogResult],
+    splunk_results: SplunkResults,
+) -> List[LatencyStats]:
+    """Summarise the pipeline latency per log format and sourcetype."""
+    report = []
+    samples = latency_samples(cloudwatch_results, splunk_results)
+    for (log_format, sourcetype), values in sorted(samples.items()):
+        values.sort()
+        report.append(
+            LatencyStats(
+                log_format=log_format,
+                sourcetype=sourcetype,
+                count=len(values),
+                p50=percentile(values, 50),
+                p90=percentile(values, 90),
+                p99=percentile(values, 99),
+                max=values[-1],
+            )
+        )
+    return report
+
+
+def latency_report_json(report: List[LatencyStats]) -> str:
+    return json.dumps([asdict(stats) for stats in report], indent=2)
+
+
+def latency_report_table(report: List[LatencyStats]) -> str:
+    """Format the report as a plain text table.
+
+    >>> print(latency_report_table([LatencyStats("raw", "gds:test:raw", 2,
+    ...     1.0, 1.5, 1.5, 1.5)]))
+    format  sourcetype    count  p50s  p90s  p99s  maxs
+    raw     gds:test:raw      2   1.0   1.5   1.5   1.5
+    """
+    headers = ["format", "sourcetype", "count", "p50s", "p90s", "p99s", "maxs"]
+    rows = [
+        [
+            stats.log_format,
+            stats.sourcetype,
+            str(stats.count),
+            *(f"{v:.1f}" for v in [stats.p50, stats.p90, stats.p99, stats.max]),
+        ]
+        for stats in report
+    ]
+    widths = [max(len(row[i]) for row in [headers] + rows) for i in range(7)]
+    return "\n".join(
+        "  ".join(
+            [row[0].ljust(widths[0]), row[1].ljust(widths[1])]
+            + [cell.rjust(widths[i]) for i, cell in enumerate(row) if i > 1]
+        ).rstrip()
+        for row in [headers] + rows
+    )
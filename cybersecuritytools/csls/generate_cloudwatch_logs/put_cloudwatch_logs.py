@@ -1,16 +1,36 @@
 """Module for generating test data of various types, send data to Cloudwatch."""
+
 import json
-from dataclasses import dataclass
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Any, Dict, List
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Set
 from uuid import uuid4
 
-import boto3
-from mypy_boto3_logs.type_defs import PutLogEventsResponseTypeDef
+from cybersecuritytools.metrics import timed
+
+if TYPE_CHECKING:
+    # boto3 and its stubs are slow to import, so they are only imported
+    # when a function needs a client, keeping `cst` startup fast.
+    from mypy_boto3_logs.client import CloudWatchLogsClient
+    from mypy_boto3_logs.type_defs import (
+        InputLogEventTypeDef,
+        PutLogEventsResponseTypeDef,
+    )
+
+    class LogEventResponseReal(PutLogEventsResponseTypeDef):
+        ResponseMetadata: Dict[Any, Any]
 
 
-class LogEventResponseReal(PutLogEventsResponseTypeDef):
-    ResponseMetadata: Dict[Any, Any]
+# PutLogEvents limits, see
+# https://docs.aws.amazon.com/AmazonCloudWatchLogs/latest/APIReference/API_PutLogEvents.html
+MAX_BATCH_EVENTS = 10000
+MAX_BATCH_BYTES = 1048576
+EVENT_OVERHEAD_BYTES = 26
+# The historical PutLogEvents quota of 5 requests per second per log stream.
+MIN_STREAM_PUT_INTERVAL = 0.2
 
 
 @dataclass
@@ -45,6 +65,12 @@ def log_lines(payload: str = "") -> LogLines:
     return LogLines(logs, payload, now)
 
 
+def logs_client() -> "CloudWatchLogsClient":
+    import boto3
+
+    return boto3.client("logs")
+
+
 def log_formats() -> List[str]:
     """Logging output formats"""
     return [*log_lines().logs]
@@ -64,7 +90,7 @@ def create_cloudwatch_log_group(group_name: str, dest_arn: str, role_arn: str) -
     role_arn: The role arn to use when shipping logs to Kinesis
 
     """
-    cwl = boto3.client("logs")
+    cwl = logs_client()
     try:
         cwl.create_log_group(logGroupName=group_name)
     except cwl.exceptions.ResourceAlreadyExistsException:
@@ -89,31 +115,240 @@ def setup_cloudwatch_log_groups(dest_arn: str, role_arn: str) -> None:
         create_cloudwatch_log_group(log_group_name(fmt), dest_arn, role_arn)
 
 
+def subscription_filter_name(group_name: str) -> str:
+    return f"ship-logs-for-{group_name}"
+
+
+@dataclass
+class LogGroupPlan:
+    """The changes needed to provision a set of subscribed log groups."""
+
+    create_groups: List[str] = field(default_factory=list)
+    put_filters: List[str] = field(default_factory=list)
+
+    def empty(self) -> bool:
+        return not self.create_groups and not self.put_filters
+
+
+def existing_log_groups(client: "CloudWatchLogsClient", prefix: str) -> Set[str]:
+    """The names of all log groups starting with `prefix`, or of every log
+    group if `prefix` is empty."""
+    # DescribeLogGroups rejects an empty prefix rather than ignoring it.
+    kwargs: Dict[str, Any] = {"logGroupNamePrefix": prefix} if prefix else {}
+    paginator = client.get_paginator("describe_log_groups")
+    return {
+        group["logGroupName"]
+        for page in paginator.paginate(**kwargs)
+        for group in page["logGroups"]
+    }
+
+
+def subscription_filter_current(
+    client: "CloudWatchLogsClient", group_name: str, dest_arn: str, role_arn: str
+) -> bool:
+    """Whether the group's subscription filter ships to `dest_arn` as
+    `role_arn`, as `create_cloudwatch_log_group` would have set it up."""
+    paginator = client.get_paginator("describe_subscription_filters")
+    name = subscription_filter_name(group_name)
+    for page in paginator.paginate(logGroupName=group_name, filterNamePrefix=name):
+        for subscription in page["subscriptionFilters"]:
+            if subscription["filterName"] == name:
+                return (
+                    subscription.get("destinationArn") == dest_arn
+                    and subscription.get("roleArn") == role_arn
+                    and subscription.get("filterPattern", "") == ""
+                )
+    return False
+
+
+def log_group_plan(
+    client: "CloudWatchLogsClient",
+    group_names: List[str],
+    dest_arn: str,
+    role_arn: str,
+    max_workers: int = 8,
+) -> LogGroupPlan:
+    """Diff the wanted log groups against the account. The groups are
+    listed in one paginated call, and the subscription filters of groups
+    that already exist are read concurrently."""
+    existing = existing_log_groups(client, os.path.commonprefix(group_names))
+    plan = LogGroupPlan(
+        create_groups=[name for name in group_names if name not in existing]
+    )
+
+    present = [name for name in group_names if name in existing]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        current = executor.map(
+            lambda name: subscription_filter_current(client, name, dest_arn, role_arn),
+            present,
+        )
+        stale = [name for name, ok in zip(present, current) if not ok]
+
+    plan.put_filters = plan.create_groups + stale
+    return plan
+
+
+def apply_log_group_plan(
+    client: "CloudWatchLogsClient",
+    plan: LogGroupPlan,
+    dest_arn: str,
+    role_arn: str,
+    max_workers: int = 8,
+) -> None:
+    """Create the planned log groups, then put their subscription filters,
+    each step concurrently over the one client."""
+
+    def create(group_name: str) -> None:
+        try:
+            client.create_log_group(logGroupName=group_name)
+        except client.exceptions.ResourceAlreadyExistsException:
+            pass
+
+    def subscribe(group_name: str) -> None:
+        client.put_subscription_filter(
+            logGroupName=group_name,
+            filterName=subscription_filter_name(group_name),
+            filterPattern="",
+            destinationArn=dest_arn,
+            roleArn=role_arn,
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(create, plan.create_groups))
+        list(executor.map(subscribe, plan.put_filters))
+
+
+def provision_cloudwatch_log_groups(
+    dest_arn: str,
+    role_arn: str,
+    group_names: Optional[List[str]] = None,
+    client: Optional["CloudWatchLogsClient"] = None,
+    dry_run: bool = False,
+    max_workers: int = 8,
+) -> LogGroupPlan:
+    """Create only the log groups and subscription filters that are missing
+    or out of date, defaulting to the groups `setup_cloudwatch_log_groups`
+    creates. Running it again against a provisioned account only reads."""
+    client = client or logs_client()
+    if group_names is None:
+        group_names = [log_group_name(fmt) for fmt in ["general"] + log_formats()]
+
+    plan = log_group_plan(client, group_names, dest_arn, role_arn, max_workers)
+    if not dry_run:
+        apply_log_group_plan(client, plan, dest_arn, role_arn, max_workers)
+    return plan
+
+
 @dataclass
 class LogStream:
     name: str
     timestamp_ms: int
 
 
-def log_stream_name() -> LogStream:
+def log_stream_name(suffix: str = "") -> LogStream:
     """Generate an appropriately named log group of the format
-    '{timestamp_ms}-{invocation}-test-data'
+    '{timestamp_ms}-{invocation}-test-data'. A `suffix` is appended to
+    keep streams created in the same millisecond apart.
     """
-    timestamp_seconds = datetime.now().replace(tzinfo=timezone.utc).timestamp()
+    timestamp_seconds = datetime.now(timezone.utc).timestamp()
     timestamp_ms = int(timestamp_seconds * 1000)
     name = f"{timestamp_ms}-test-data"
+    if suffix:
+        name = f"{name}-{suffix}"
     return LogStream(name, timestamp_ms)
 
 
-def create_log_stream(group_name: str) -> LogStream:
+def create_log_stream(
+    group_name: str, client: Optional["CloudWatchLogsClient"] = None, suffix: str = ""
+) -> LogStream:
     """Create a log stream with the a name genreated by log_stream_name()"""
-    ls = log_stream_name()
-    boto3.client("logs").create_log_stream(
+    ls = log_stream_name(suffix)
+    (client or logs_client()).create_log_stream(
         logGroupName=group_name, logStreamName=ls.name
     )
     return ls
 
 
+def log_event_batches(
+    events: List["InputLogEventTypeDef"],
+) -> Iterator[List["InputLogEventTypeDef"]]:
+    """Split events into batches that fit in a single PutLogEvents call.
+
+    >>> events = [{"timestamp": 0, "message": "x" * 1000}] * 2000
+    >>> [len(batch) for batch in log_event_batches(events)]
+    [1022, 978]
+    """
+    batch: List["InputLogEventTypeDef"] = []
+    batch_bytes = 0
+    for event in events:
+        event_bytes = len(event["message"].encode()) + EVENT_OVERHEAD_BYTES
+        if batch and (
+            len(batch) >= MAX_BATCH_EVENTS
+            or batch_bytes + event_bytes > MAX_BATCH_BYTES
+        ):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(event)
+        batch_bytes += event_bytes
+    if batch:
+        yield batch
+
+
+def accepted_events(batch_size: int, response: Any) -> int:
+    """The number of events in a batch that PutLogEvents accepted, rather
+    than rejected as too new, too old or expired.
+
+    >>> accepted_events(10, {})
+    10
+    >>> accepted_events(10, {"rejectedLogEventsInfo": {
+    ...     "tooOldLogEventEndIndex": 2, "tooNewLogEventStartIndex": 8}})
+    6
+    """
+    rejected: Dict[str, int] = response.get("rejectedLogEventsInfo", {})
+    first = max(
+        rejected.get("tooOldLogEventEndIndex", 0),
+        rejected.get("expiredLogEventEndIndex", 0),
+    )
+    last = min(rejected.get("tooNewLogEventStartIndex", batch_size), batch_size)
+    return max(last - first, 0)
+
+
+def put_log_event_batches(
+    client: "CloudWatchLogsClient",
+    group_name: str,
+    stream_name: str,
+    events: List["InputLogEventTypeDef"],
+) -> Iterator[int]:
+    """Send events to a log stream in as few PutLogEvents calls as the
+    batch limits allow, keeping to the per stream request rate. Yields
+    the number of events accepted by each call, so a caller can count
+    the batches sent before one fails."""
+    last_put = 0.0
+    for batch in log_event_batches(events):
+        wait = last_put + MIN_STREAM_PUT_INTERVAL - monotonic()
+        if wait > 0:
+            sleep(wait)
+        last_put = monotonic()
+        with timed("cloudwatch.put_log_events") as call:
+            call.bytes = sum(len(event["message"].encode()) for event in batch)
+            response = client.put_log_events(
+                logGroupName=group_name, logStreamName=stream_name, logEvents=batch
+            )
+        yield accepted_events(len(batch), response)
+
+
+def put_log_events_batched(
+    client: "CloudWatchLogsClient",
+    group_name: str,
+    stream_name: str,
+    events: List["InputLogEventTypeDef"],
+) -> List[int]:
+    """Send events with `put_log_event_batches`, returning the number of
+    events accepted by each call."""
+    return list(put_log_event_batches(client, group_name, stream_name, events))
+
+
 @dataclass
 class CloudWatchLogResult:
     timestamp_ms: int
@@ -121,32 +356,58 @@ class CloudWatchLogResult:
     log_line: str
     log_stream_name: str
     payload: str
+    event_count: int = 1
+
+
+def send_log_line(
+    client: "CloudWatchLogsClient",
+    file_format: str,
+    line: str,
+    payload: str,
+    events_per_format: int = 1,
+) -> CloudWatchLogResult:
+    """Send `events_per_format` copies of a log line to a new log stream
+    in the log group for `file_format`."""
+    group_name = log_group_name(file_format)
+    stream = create_log_stream(group_name, client)
+
+    events: List["InputLogEventTypeDef"] = [
+        {"timestamp": stream.timestamp_ms, "message": line}
+    ] * events_per_format
+    put_log_events_batched(client, group_name, stream.name, events)
+
+    return CloudWatchLogResult(
+        timestamp_ms=stream.timestamp_ms,
+        log_group_name=group_name,
+        log_line=line,
+        log_stream_name=stream.name,
+        payload=payload,
+        event_count=events_per_format,
+    )
 
 
-def send_logs_to_cloudwatch() -> Dict[str, CloudWatchLogResult]:
-    """Send logs to Cloudwatch, creating a new logstream for those events"""
-    lines = log_lines()
-
-    results = {}
-
-    cwl = boto3.client("logs")
-    for file_format, line in lines.logs.items():
-
-        group_name = log_group_name(file_format)
-        stream = create_log_stream(group_name)
-
-        cwl.put_log_events(
-            logGroupName=group_name,
-            logStreamName=stream.name,
-            logEvents=[{"timestamp": stream.timestamp_ms, "message": line}],
-        )
+def send_logs_to_cloudwatch(
+    events_per_format: int = 1, max_workers: Optional[int] = None
+) -> Dict[str, CloudWatchLogResult]:
+    """Send logs to Cloudwatch, creating a new logstream for those events.
 
-        results[file_format] = CloudWatchLogResult(
-            timestamp_ms=stream.timestamp_ms,
-            log_group_name=group_name,
-            log_line=line,
-            log_stream_name=stream.name,
-            payload=lines.payload,
-        )
+    The formats are sent concurrently over a single client, and each
+    format's events are packed into as few PutLogEvents calls as possible.
+    """
+    lines = log_lines()
 
-    return results
+    cwl = logs_client()
+    with ThreadPoolExecutor(max_workers=max_workers or len(lines.logs)) as executor:
+        futures = {
+            file_format: executor.submit(
+                send_log_line,
+                cwl,
+                file_format,
+                line,
+                lines.payload,
+                events_per_format,
+            )
+            for file_format, line in lines.logs.items()
+        }
+
+    return {file_format: future.result() for file_format, future in futures.items()}
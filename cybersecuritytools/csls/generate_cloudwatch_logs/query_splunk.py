@@ -1,5 +1,5 @@
 import os
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Set, Tuple
 from uuid import uuid4
 
 from .put_cloudwatch_logs import CloudWatchLogResult, log_formats, log_group_name
@@ -14,7 +14,6 @@ def log_group_name_to_splunk_format(group_name: str) -> str:
     return group_name.replace("/", ":").strip(":")
 
 
-# TODO: Search for the exact cloudwatch log payload instead of this wide search.
 def search_query(test_type: str, index: str = "test_data") -> str:
     """Generate search query to find the test data."""
     sourcetypes = ", ".join(
@@ -36,6 +35,47 @@ def search_query(test_type: str, index: str = "test_data") -> str:
         )
 
 
+def load_test_query(payload: str, index: str = "test_data") -> str:
+    """Generate a search query counting the events from a generate-load run.
+
+    >>> load_test_query("abc")
+    'search index="test_data" "abc" | stats count(source)'
+    """
+    return f'search index="{index}" "{payload}" | stats count(source)'
+
+
+def payload_search_query(
+    cloudwatch_results: Dict[str, CloudWatchLogResult], index: str = "test_data"
+) -> str:
+    """Generate a search query that only matches the events sent to
+    CloudWatch, returning just the fields needed to check them.
+
+    >>> from .put_cloudwatch_logs import CloudWatchLogResult
+    >>> result = CloudWatchLogResult(1, "/gds/test/raw", "line", "stream", "abc")
+    >>> payload_search_query({"raw": result})
+    'search index="test_data" sourcetype IN ("gds:test:raw") "abc" \
+|eval indextime = _indextime |eval latency=_indextime - _time \
+|table _raw _time _cd indextime latency sourcetype'
+    """
+    payloads = sorted({c.payload for c in cloudwatch_results.values()})
+    sourcetypes = sorted(
+        {
+            log_group_name_to_splunk_format(c.log_group_name)
+            for c in cloudwatch_results.values()
+        }
+    )
+    sourcetype_list = ", ".join(f'"{s}"' for s in sourcetypes)
+    payload_terms = " OR ".join(f'"{p}"' for p in payloads)
+    if len(payloads) > 1:
+        payload_terms = f"({payload_terms})"
+    return (
+        f'search index="{index}" sourcetype IN ({sourcetype_list}) {payload_terms} '
+        "|eval indextime = _indextime "
+        "|eval latency=_indextime - _time "
+        "|table _raw _time _cd indextime latency sourcetype"
+    )
+
+
 SplunkResults = List[Dict[Any, Any]]
 
 
@@ -48,6 +88,59 @@ def payload_found(
     return sr >= cwr
 
 
+class PayloadTracker:
+    """Track which log lines sent to CloudWatch have been found in Splunk
+    across repeated polls.
+
+    Each poll only needs to search events indexed since the latest
+    `indextime` seen so far, see `search_kwargs`.
+    """
+
+    def __init__(self, cloudwatch_results: Dict[str, CloudWatchLogResult]):
+        self.expected: Set[str] = {c.log_line for c in cloudwatch_results.values()}
+        self.found: Set[str] = set()
+        self.events: Dict[Tuple[str, str], Dict[Any, Any]] = {}
+        self.last_indextime: Optional[int] = None
+
+    def update(self, splunk_results: SplunkResults) -> bool:
+        """Record the matching payloads in `splunk_results` and return
+        `True` once every expected log line has been found."""
+        for result in splunk_results:
+            raw = result.get("_raw")
+            if raw in self.expected:
+                self.found.add(raw)
+                # `_cd` is the event's address in the index, so events
+                # seen again by an overlapping poll are only kept once.
+                key = (str(result.get("_cd", raw)), str(result.get("indextime")))
+                self.events[key] = result
+
+            indextime = result.get("indextime")
+            if indextime is not None:
+                indextime = int(indextime)
+                if self.last_indextime is None or indextime > self.last_indextime:
+                    self.last_indextime = indextime
+
+        return self.complete()
+
+    def complete(self) -> bool:
+        return self.found >= self.expected
+
+    def missing(self) -> Set[str]:
+        return self.expected - self.found
+
+    def matched_results(self) -> SplunkResults:
+        """The Splunk events found for the expected log lines."""
+        return list(self.events.values())
+
+    def search_kwargs(self, search_kwargs: Dict[str, str]) -> Dict[str, str]:
+        """Restrict `search_kwargs` to events indexed at or after the latest
+        index time already seen. Events sharing that second are searched
+        again as Splunk's index time only has one second resolution."""
+        if self.last_indextime is None:
+            return search_kwargs
+        return {**search_kwargs, "index_earliest": str(self.last_indextime)}
+
+
 def load_test_found(
     splunk_results: SplunkResults, requests_completed: int, artillery_config: int
 ) -> bool:
@@ -65,4 +158,3 @@ def load_test_found(
 
 
 # TODO: Check that logs are appearing in the correct log groups.
-# TODO: Compute delta between Cloudwatch ingestion and Splunk index time.
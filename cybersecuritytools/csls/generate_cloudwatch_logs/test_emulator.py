@@ -0,0 +1,96 @@
+import os
+
+from click.testing import CliRunner
+
+from .cli import generate_cloudwatch_logs
+from .emulator import PipelineEmulator, StubSplunk
+from .generate_load import generate_load
+from .put_cloudwatch_logs import log_formats, send_logs_to_cloudwatch
+from .query_splunk import PayloadTracker, load_test_query, payload_search_query
+
+
+def test_emulated_smoke_test() -> None:
+    with PipelineEmulator(indexing_delay=0) as emulator:
+        cloudwatch_results = send_logs_to_cloudwatch(events_per_format=3)
+        splunk = emulator.search()
+        query = payload_search_query(cloudwatch_results)
+
+        tracker = PayloadTracker(cloudwatch_results)
+        results = splunk.search(query, splunk.search_defaults())
+        assert tracker.update(results)
+        assert len(results) == 3 * len(log_formats())
+        assert {r["sourcetype"] for r in results} == {
+            f"gds:test:{fmt}" for fmt in log_formats()
+        }
+
+        # Events are only forwarded once.
+        assert splunk.search(query, splunk.search_defaults(), mode="oneshot") == (
+            results
+        )
+        assert len(emulator.splunk.events) == len(results)
+
+
+def test_indexing_delay() -> None:
+    with PipelineEmulator(indexing_delay=60) as emulator:
+        cloudwatch_results = send_logs_to_cloudwatch()
+        splunk = emulator.search()
+        query = payload_search_query(cloudwatch_results)
+        assert splunk.search(query) == []
+        assert len(emulator.splunk.events) == len(log_formats())
+
+
+def test_emulated_load_count() -> None:
+    with PipelineEmulator(indexing_delay=0) as emulator:
+        load = generate_load(100, 1, ["raw", "json"], workers=2)
+        splunk = emulator.search()
+        results = splunk.search(load_test_query(load.payload), mode="export")
+        assert results == [{"count(source)": str(load.total_sent())}]
+
+
+def test_search_filters() -> None:
+    splunk = StubSplunk(indexing_delay=0)
+    splunk.index("old abc", event_time=100, ingested=100, sourcetype="a:b")
+    splunk.index("new abc", event_time=200, ingested=200, sourcetype="a:b")
+    splunk.index("new abc", event_time=200, ingested=200, sourcetype="c:d")
+
+    query = 'search index="test_data" sourcetype IN ("a:b") "abc"'
+    assert len(splunk.search(query)) == 2
+    assert [r["_raw"] for r in splunk.search(query, index_earliest="150")] == [
+        "new abc"
+    ]
+    assert splunk.search(query, earliest_time="-15m") == []
+    assert splunk.search('search index="other"') == []
+
+
+def test_environment_restored() -> None:
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-1"
+    with PipelineEmulator():
+        assert os.environ["AWS_DEFAULT_REGION"] == "eu-west-2"
+    assert os.environ["AWS_DEFAULT_REGION"] == "eu-west-1"
+
+
+def test_smoke_test_command_emulated() -> None:
+    result = CliRunner().invoke(
+        generate_cloudwatch_logs, ["smoke-test", "--emulate", "--indexing-delay", "0"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "smoketest succeeded" in result.output
+
+
+def test_smoke_test_command_emulated_in_non_utc_timezone(
+    non_utc_timezone: None,
+) -> None:
+    """Events should be searchable straight away, rather than filtered out
+    by `latest_time=now` as if they were in the future"""
+    result = CliRunner().invoke(
+        generate_cloudwatch_logs,
+        ["smoke-test", "--emulate", "--indexing-delay", "0", "--timeout", "5"],
+    )
+    assert result.exit_code == 0, result.output
+    assert "smoketest succeeded" in result.output
+
+
+def test_smoke_test_needs_ssm() -> None:
+    result = CliRunner().invoke(generate_cloudwatch_logs, ["smoke-test"])
+    assert result.exit_code == 2
+    assert "--ssm is required" in result.output
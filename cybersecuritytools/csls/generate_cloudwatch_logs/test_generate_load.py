@@ -0,0 +1,75 @@
+import os
+from typing import Any
+
+import boto3
+from botocore.exceptions import ClientError  # type: ignore
+from click.testing import CliRunner
+from moto import mock_logs  # type: ignore
+from pytest_mock import MockerFixture
+
+from .cli import generate_cloudwatch_logs
+from .generate_load import LoadManifest, generate_load, load_manifest, load_worker
+from .put_cloudwatch_logs import log_group_name
+
+
+@mock_logs  # type: ignore
+def test_generate_load() -> None:
+    """Every event sent should be recorded in the manifest"""
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-1"
+    client = boto3.client("logs")
+    for file_format in ["raw", "json"]:
+        client.create_log_group(logGroupName=log_group_name(file_format))
+
+    manifest = generate_load(rate=10, duration=1, formats=["raw", "json"], workers=3)
+
+    assert manifest.sent == {"raw": 10, "json": 10}
+    assert manifest.total_sent() == manifest.total_planned() == 20
+    assert len(manifest.log_streams["raw"]) == 3
+
+    events = 0
+    for stream in manifest.log_streams["json"]:
+        response = client.get_log_events(
+            logGroupName=log_group_name("json"), logStreamName=stream
+        )
+        events += len(response["events"])
+        assert all(manifest.payload in e["message"] for e in response["events"])
+    assert events == 10
+
+
+def test_manifest_round_trip(tmp_path: Any) -> None:
+    manifest = LoadManifest(
+        payload="abc", rate=5, duration=2, planned={"raw": 10}, sent={"raw": 9}
+    )
+    path = str(tmp_path / "manifest.json")
+    manifest.write(path)
+    assert load_manifest(path) == manifest
+
+
+def test_load_worker_counts_accepted_events(mocker: MockerFixture) -> None:
+    """Events CloudWatch rejected, or never got after a batch failed,
+    should be counted as errors rather than sent"""
+    client = mocker.MagicMock()
+    client.put_log_events.return_value = {
+        "rejectedLogEventsInfo": {"tooNewLogEventStartIndex": 8}
+    }
+    result = load_worker(client, "raw", "abc", 0, rate=10, duration=1)
+    assert (result.sent, result.errors) == (8, 2)
+
+    # Enough events for two batches, the second of which fails.
+    client.put_log_events.reset_mock()
+    client.put_log_events.side_effect = [
+        {},
+        ClientError({"Error": {"Code": "ThrottlingException"}}, "PutLogEvents"),
+    ]
+    result = load_worker(client, "raw", "abc", 0, rate=20000, duration=1)
+    first_batch = client.put_log_events.call_args_list[0].kwargs["logEvents"]
+    assert result.sent == len(first_batch)
+    assert result.errors == 20000 - len(first_batch)
+
+
+def test_generate_load_needs_a_rate() -> None:
+    result = CliRunner().invoke(
+        generate_cloudwatch_logs, ["generate-load", "-r", "0", "-d", "1"]
+    )
+    assert result.exit_code == 2
+    assert "-r" in result.output
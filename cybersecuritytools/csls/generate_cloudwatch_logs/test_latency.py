@@ -0,0 +1,54 @@
+from .emulator import PipelineEmulator
+from .latency import latency_report
+from .put_cloudwatch_logs import (
+    CloudWatchLogResult,
+    log_formats,
+    send_logs_to_cloudwatch,
+)
+from .query_splunk import payload_search_query
+
+
+def test_latency_report() -> None:
+    """Latency should be measured from the CloudWatch timestamp to the
+    Splunk index time, per format and sourcetype"""
+    cloudwatch_results = {
+        fmt: CloudWatchLogResult(
+            payload="abc",
+            timestamp_ms=1000000,
+            log_group_name=f"/gds/test/{fmt}",
+            log_line=f"{fmt} line",
+            log_stream_name="stream.name",
+        )
+        for fmt in ["raw", "json"]
+    }
+    splunk_results = [
+        {"_raw": "raw line", "indextime": str(1000 + i), "sourcetype": "gds:test:raw"}
+        for i in range(1, 101)
+    ] + [
+        {"_raw": "json line", "indextime": "1004", "sourcetype": "gds:test:json"},
+        {"_raw": "unrelated", "indextime": "1004", "sourcetype": "gds:test:json"},
+    ]
+
+    report = {
+        stats.log_format: stats
+        for stats in latency_report(cloudwatch_results, splunk_results)
+    }
+
+    assert report["raw"].count == 100
+    assert (report["raw"].p50, report["raw"].p90, report["raw"].p99) == (50, 90, 99)
+    assert report["raw"].max == 100
+    assert report["json"].count == 1
+    assert report["json"].p50 == 4
+
+
+def test_latency_in_non_utc_timezone(non_utc_timezone: None) -> None:
+    """The CloudWatch timestamp should be UTC whatever the local timezone"""
+    with PipelineEmulator(indexing_delay=0) as emulator:
+        cloudwatch_results = send_logs_to_cloudwatch()
+        splunk = emulator.search()
+        splunk_results = splunk.search(payload_search_query(cloudwatch_results))
+
+    report = latency_report(cloudwatch_results, splunk_results)
+    assert len(report) == len(log_formats())
+    for stats in report:
+        assert -1 <= stats.p50 <= stats.max < 5
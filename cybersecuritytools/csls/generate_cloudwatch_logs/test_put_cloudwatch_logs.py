@@ -1,10 +1,11 @@
 import json
 import os
+from typing import Iterator
 from uuid import uuid4
 
 import boto3
 import pytest
-from moto import mock_logs  # type: ignore
+from moto import mock_kinesis, mock_logs  # type: ignore
 from pytest_mock import MockerFixture
 
 from cybersecuritytools.csls.generate_cloudwatch_logs import put_cloudwatch_logs
@@ -13,6 +14,7 @@ from .put_cloudwatch_logs import (
     log_formats,
     log_group_name,
     log_lines,
+    provision_cloudwatch_log_groups,
     send_logs_to_cloudwatch,
     setup_cloudwatch_log_groups,
 )
@@ -80,3 +82,85 @@ def test_send_logs_to_cloudwatch(file_format: str, mocker: MockerFixture) -> Non
     assert file_format in results
     assert results[file_format].payload
     assert results[file_format].timestamp_ms
+
+
+@mock_logs  # type: ignore
+def test_send_logs_to_cloudwatch_batches(mocker: MockerFixture) -> None:
+    """Many events per format should be packed into few PutLogEvents calls"""
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-1"
+    client = boto3.client("logs")
+    for file_format in log_formats():
+        client.create_log_group(logGroupName=log_group_name(file_format))
+    spy = mocker.spy(put_cloudwatch_logs, "put_log_events_batched")
+
+    results = send_logs_to_cloudwatch(events_per_format=50)
+
+    assert spy.call_count == len(log_formats())
+    for result in results.values():
+        assert result.event_count == 50
+        events = client.get_log_events(
+            logGroupName=result.log_group_name,
+            logStreamName=result.log_stream_name,
+        )["events"]
+        assert len(events) == 50
+
+
+@pytest.fixture
+def kinesis_stream() -> Iterator[str]:
+    """A Kinesis stream for subscription filters to deliver to."""
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-1"
+    with mock_kinesis(), mock_logs():
+        kinesis = boto3.client("kinesis")
+        kinesis.create_stream(StreamName="csls", ShardCount=1)
+        yield kinesis.describe_stream(StreamName="csls")["StreamDescription"][
+            "StreamARN"
+        ]
+
+
+ROLE_ARN = "arn:aws:iam::123456789012:role/csls"
+
+
+def test_provision_cloudwatch_log_groups(
+    kinesis_stream: str, mocker: MockerFixture
+) -> None:
+    client = boto3.client("logs")
+    client.create_log_group(logGroupName=log_group_name("json"))
+    groups = [log_group_name(fmt) for fmt in ["general"] + FORMATS]
+
+    plan = provision_cloudwatch_log_groups(
+        kinesis_stream, ROLE_ARN, client=client, dry_run=True
+    )
+    assert sorted(plan.create_groups) == sorted(set(groups) - {"/gds/test/json"})
+    assert sorted(plan.put_filters) == sorted(groups)
+    assert len(client.describe_log_groups()["logGroups"]) == 1
+
+    provision_cloudwatch_log_groups(kinesis_stream, ROLE_ARN, client=client)
+    for group in groups:
+        filters = client.describe_subscription_filters(logGroupName=group)
+        assert filters["subscriptionFilters"][0]["destinationArn"] == kinesis_stream
+
+    # Provisioned groups are only read.
+    put = mocker.spy(client, "put_subscription_filter")
+    plan = provision_cloudwatch_log_groups(kinesis_stream, ROLE_ARN, client=client)
+    assert plan.empty()
+    assert put.call_count == 0
+
+    # A filter for another role is put again.
+    plan = provision_cloudwatch_log_groups(
+        kinesis_stream, ROLE_ARN + "-new", group_names=groups[:2], client=client
+    )
+    assert plan.create_groups == []
+    assert plan.put_filters == groups[:2]
+    assert put.call_count == 2
+
+
+def test_provision_groups_without_common_prefix(kinesis_stream: str) -> None:
+    client = boto3.client("logs")
+    client.create_log_group(logGroupName="app-b")
+    groups = ["/gds/a", "app-b"]
+
+    plan = provision_cloudwatch_log_groups(
+        kinesis_stream, ROLE_ARN, group_names=groups, client=client, dry_run=True
+    )
+    assert plan.create_groups == ["/gds/a"]
+    assert sorted(plan.put_filters) == groups
@@ -2,7 +2,13 @@ import re
 from copy import deepcopy
 
 from .put_cloudwatch_logs import CloudWatchLogResult
-from .query_splunk import log_group_name_to_splunk_format, payload_found, search_query
+from .query_splunk import (
+    PayloadTracker,
+    log_group_name_to_splunk_format,
+    payload_found,
+    payload_search_query,
+    search_query,
+)
 
 
 def test_log_group_name_to_splunk_format() -> None:
@@ -87,3 +93,59 @@ def test_search_query() -> None:
 
     assert search_query(test_type="smoke_test") == expected
     assert re.match(load_expected_regex, search_query(test_type="load_test"))
+
+
+def test_payload_tracker_incremental() -> None:
+    """Payloads found over several polls should be combined, and later
+    polls should only search from the latest index time seen."""
+    base = CloudWatchLogResult(
+        payload="abcde",
+        timestamp_ms=12345,
+        log_group_name="group_name",
+        log_line="line",
+        log_stream_name="stream.name",
+    )
+    cloudwatch_results = {}
+    for payload in ["abc", "123"]:
+        c = deepcopy(base)
+        c.log_line = f"---{payload}---"
+        cloudwatch_results[payload] = c
+
+    tracker = PayloadTracker(cloudwatch_results)
+    defaults = {"earliest_time": "-15m"}
+    assert tracker.search_kwargs(defaults) == defaults
+
+    assert not tracker.update([{"_raw": "---abc---", "indextime": "100"}])
+    assert tracker.missing() == {"---123---"}
+    assert tracker.search_kwargs(defaults) == {
+        "earliest_time": "-15m",
+        "index_earliest": "100",
+    }
+
+    assert tracker.update([{"_raw": "---123---", "indextime": "102"}])
+    assert tracker.last_indextime == 102
+
+    # An overlapping poll returning the same event shouldn't duplicate it
+    tracker.update([{"_raw": "---123---", "indextime": "102"}])
+    assert len(tracker.matched_results()) == 2
+
+
+def test_payload_search_query() -> None:
+    """The query should only match the sent payloads and sourcetypes"""
+    cloudwatch_results = {
+        fmt: CloudWatchLogResult(
+            payload=payload,
+            timestamp_ms=12345,
+            log_group_name=f"/gds/test/{fmt}",
+            log_line="line",
+            log_stream_name="stream.name",
+        )
+        for fmt, payload in [("json", "abc"), ("csv", "abc"), ("raw", "def")]
+    }
+    query = payload_search_query(cloudwatch_results, index="foo")
+    assert query.startswith(
+        'search index="foo" '
+        'sourcetype IN ("gds:test:csv", "gds:test:json", "gds:test:raw") '
+        '("abc" OR "def") '
+    )
+    assert query.endswith("|table _raw _time _cd indextime latency sourcetype")
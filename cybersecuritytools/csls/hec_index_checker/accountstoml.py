@@ -1,8 +1,131 @@
-from typing import Any, MutableMapping, Set
+"""The CSLS `accounts_loggroup_index.toml`, mapping each AWS account's log
+groups to the Splunk index and sourcetype they are sent to:
+
+    [1111111111]
+    "/log_group1" = { index = "index1", sourcetype = "aws:foo:bar" }
+
+`load_accounts_toml` validates the file into an `AccountsToml` with
+lookups in both directions, and keeps the parsed result so checking the
+same unchanged file again doesn't parse it again.
+"""
+
+import hashlib
+import os
+import threading
+from typing import Any, Dict, FrozenSet, List, MutableMapping, Optional, Set, Tuple
 
 import toml
 
 
+class AccountsTomlError(ValueError):
+    """The accounts TOML doesn't match the expected schema."""
+
+
+class LogGroup:
+    __slots__ = ("account", "name", "index", "sourcetype")
+
+    def __init__(
+        self, account: str, name: str, index: str, sourcetype: Optional[str] = None
+    ):
+        self.account = account
+        self.name = name
+        self.index = index
+        self.sourcetype = sourcetype
+
+    def __repr__(self) -> str:
+        return (
+            f"LogGroup({self.account!r}, {self.name!r}, {self.index!r}, "
+            f"{self.sourcetype!r})"
+        )
+
+
+class AccountsToml:
+    """The log groups in an accounts TOML, indexed by `(account, log group)`,
+    by index and by account."""
+
+    __slots__ = ("log_groups", "by_name", "by_index", "by_account", "indexes")
+
+    def __init__(self, log_groups: List[LogGroup]):
+        self.log_groups = log_groups
+        self.by_name: Dict[Tuple[str, str], LogGroup] = {}
+        self.by_index: Dict[str, List[LogGroup]] = {}
+        by_account: Dict[str, Set[str]] = {}
+        for log_group in log_groups:
+            self.by_name[(log_group.account, log_group.name)] = log_group
+            self.by_index.setdefault(log_group.index, []).append(log_group)
+            by_account.setdefault(log_group.account, set()).add(log_group.index)
+        self.by_account = {
+            account: frozenset(indexes) for account, indexes in by_account.items()
+        }
+        self.indexes = frozenset(self.by_index)
+
+    @classmethod
+    def from_mapping(cls, accounts: MutableMapping[str, Any]) -> "AccountsToml":
+        """Validate a parsed accounts TOML, raising `AccountsTomlError` on
+        the first entry that doesn't match the schema."""
+        log_groups = []
+        for account, account_log_groups in accounts.items():
+            if not isinstance(account_log_groups, dict):
+                raise AccountsTomlError(f"Account {account} is not a table")
+            for name, settings in account_log_groups.items():
+                where = f"{account} {name}"
+                if not isinstance(settings, dict):
+                    raise AccountsTomlError(f"Log group {where} is not a table")
+                index = settings.get("index")
+                if not isinstance(index, str) or not index:
+                    raise AccountsTomlError(f"Log group {where} has no index")
+                sourcetype = settings.get("sourcetype")
+                if sourcetype is not None and not isinstance(sourcetype, str):
+                    raise AccountsTomlError(f"Log group {where} sourcetype invalid")
+                log_groups.append(LogGroup(account, name, index, sourcetype))
+        return cls(log_groups)
+
+    def index(self, account: str, log_group: str) -> str:
+        """Raises `KeyError` if the account has no such log group."""
+        return self.by_name[(account, log_group)].index
+
+    def log_groups_for_index(self, index: str) -> List[LogGroup]:
+        return self.by_index.get(index, [])
+
+    def account_indexes(self, account: str) -> FrozenSet[str]:
+        return self.by_account.get(account, frozenset())
+
+
+# path -> ((mtime, size), sha256 of the contents, parsed file)
+_accounts_cache: Dict[str, Tuple[Tuple[int, int], str, AccountsToml]] = {}
+_accounts_cache_lock = threading.Lock()
+
+
+def load_accounts_toml(path: str) -> AccountsToml:
+    """Load and validate an accounts TOML. A file whose mtime and size are
+    unchanged since it was last loaded isn't read again, and one whose
+    contents hash the same isn't parsed again.
+
+    Raises `FileNotFoundError`, `toml.TomlDecodeError` or `AccountsTomlError`.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+
+    with _accounts_cache_lock:
+        cached = _accounts_cache.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[2]
+
+    with open(path, "rb") as f:
+        contents = f.read()
+    digest = hashlib.sha256(contents).hexdigest()
+
+    if cached is not None and cached[1] == digest:
+        accounts = cached[2]
+    else:
+        accounts = AccountsToml.from_mapping(toml.loads(contents.decode()))
+
+    with _accounts_cache_lock:
+        _accounts_cache[path] = (stamp, digest, accounts)
+    return accounts
+
+
 def load_accounts_loggroup_index_toml(path: str) -> MutableMapping[str, Any]:
     with open(path) as f:
         return toml.load(f)
@@ -1,9 +1,17 @@
+import os
 import pathlib
 from typing import Any, MutableMapping
 
 import pytest
+import toml
+from pytest_mock import MockerFixture
 
-from .accountstoml import indexes_from_accounts, load_accounts_loggroup_index_toml
+from .accountstoml import (
+    AccountsTomlError,
+    indexes_from_accounts,
+    load_accounts_loggroup_index_toml,
+    load_accounts_toml,
+)
 
 
 @pytest.fixture
@@ -55,3 +63,53 @@ def test_indexes_from_accounts(accounts: MutableMapping[str, Any]) -> None:
     indexes = indexes_from_accounts(accounts)
     expected = set(["index1", "index2"])
     assert indexes == expected
+
+
+def test_load_accounts_toml(accounts_toml_path: str) -> None:
+    accounts = load_accounts_toml(accounts_toml_path)
+
+    assert accounts.indexes == {"index1", "index2"}
+    assert accounts.index("1111111111", "/log_group1") == "index1"
+    assert [g.name for g in accounts.log_groups_for_index("index2")] == ["/log_group2"]
+    assert accounts.log_groups_for_index("missing") == []
+    assert accounts.account_indexes("2222222222") == {"index2"}
+    assert accounts.by_name[("1111111111", "/log_group1")].sourcetype == "aws:foo:bar"
+    with pytest.raises(KeyError):
+        accounts.index("1111111111", "/log_group2")
+
+
+@pytest.mark.parametrize(  # type: ignore
+    "contents",
+    [
+        'account = "not a table"',
+        '[111]\n"/group" = "not a table"',
+        '[111]\n"/group" = { sourcetype = "aws:foo" }',
+        '[111]\n"/group" = { index = "index1", sourcetype = 1 }',
+    ],
+)
+def test_load_accounts_toml_invalid(tmp_path: pathlib.Path, contents: str) -> None:
+    path = tmp_path / "accounts.toml"
+    path.write_text(contents)
+    with pytest.raises(AccountsTomlError):
+        load_accounts_toml(str(path))
+
+
+def test_load_accounts_toml_cache(
+    tmp_path: pathlib.Path, mocker: MockerFixture
+) -> None:
+    path = tmp_path / "accounts.toml"
+    path.write_text('[111]\n"/group" = { index = "index1" }\n')
+    loads = mocker.spy(toml, "loads")
+
+    first = load_accounts_toml(str(path))
+    assert load_accounts_toml(str(path)) is first
+    assert loads.call_count == 1
+
+    # Touched but unchanged contents are read and hashed, but not parsed.
+    os.utime(path, ns=(0, 0))
+    assert load_accounts_toml(str(path)) is first
+    assert loads.call_count == 1
+
+    path.write_text('[111]\n"/group" = { index = "index2" }\n')
+    assert load_accounts_toml(str(path)).indexes == {"index2"}
+    assert loads.call_count == 2
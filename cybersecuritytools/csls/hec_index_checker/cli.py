@@ -1,14 +1,64 @@
+import json
 from sys import exit
+from typing import List, Optional, Tuple
 
 import click
 
-from .hec_index_checker import hec_index_checker
-
 
 @click.command()
 @click.option("--accounts", required=True, help="Accounts TOML path")
 @click.option("--token", required=True, help="Token name to check")
 @click.option("--ssm", required=True, help="SSM root path")
 def check_hec_token(accounts: str, token: str, ssm: str) -> None:
+    from .hec_index_checker import hec_index_checker
+
     if not hec_index_checker(accounts, token, ssm):
         exit("Splunk HEC token does not have all indexes required by CSLS.")
+
+
+def parse_check(value: str) -> Tuple[str, str]:
+    token, sep, accounts = value.partition("=")
+    if not (sep and token and accounts):
+        raise click.BadParameter(f"expected TOKEN=ACCOUNTS_TOML, got {value}")
+    return token, accounts
+
+
+@click.command()
+@click.option(
+    "--check",
+    "checks",
+    multiple=True,
+    required=True,
+    help="TOKEN=ACCOUNTS_TOML pair to check, can be repeated",
+)
+@click.option("--ssm", required=True, help="SSM root path")
+@click.option("--report", help="Write a JSON report to this path, - for stdout")
+def check_hec_tokens(checks: List[str], ssm: str, report: Optional[str]) -> None:
+    """Check many HEC tokens have the indexes in their accounts TOML."""
+    from .hec_index_checker import hec_index_checker_bulk
+
+    results = hec_index_checker_bulk([parse_check(c) for c in checks], ssm)
+    if results is None:
+        exit("Unable to query the Splunk HEC tokens.")
+
+    # Keep stdout for the report alone when it's written there.
+    to_stderr = report == "-"
+    for result in results:
+        if result.error:
+            click.echo(f"[!] {result.token}: {result.error}", err=to_stderr)
+        elif result.missing_indexes:
+            missing = ", ".join(result.missing_indexes)
+            click.echo(f"[!] {result.token}: missing indexes {missing}", err=to_stderr)
+        else:
+            click.echo(f"[+] {result.token}: has all required indexes", err=to_stderr)
+
+    if report:
+        text = json.dumps([r.as_dict() for r in results], indent=2)
+        if report == "-":
+            print(text)
+        else:
+            with open(report, "w") as f:
+                f.write(text)
+
+    if not all(result.ok for result in results):
+        exit("Splunk HEC tokens do not have all indexes required by CSLS.")
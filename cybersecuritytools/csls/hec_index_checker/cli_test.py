@@ -0,0 +1,67 @@
+import json
+import pathlib
+from typing import Any, Dict
+
+import pytest
+from _pytest.capture import CaptureFixture
+from click.testing import CliRunner
+from pytest_mock import MockerFixture
+
+from .cli import check_hec_tokens
+from .hec_index_checker import check_token_indexes
+from .hec_index_checker_test import hec_tokens  # noqa: F401
+
+ACCOUNTS = f"{pathlib.Path(__file__).parent.absolute()}"
+ACCOUNTS += "/accounts_loggroup_index_test.toml"
+
+
+def test_check_hec_tokens_report_to_stdout(
+    hec_tokens: Dict[str, Any],  # noqa: F811
+    mocker: MockerFixture,
+    capsys: CaptureFixture[str],
+) -> None:
+    """The JSON report should be the only thing written to stdout"""
+    mocker.patch(
+        f"{__package__}.hec_index_checker.hec_index_checker_bulk",
+        side_effect=lambda checks, ssm: check_token_indexes(hec_tokens, checks),
+    )
+
+    # Run outside CliRunner, which mixes stderr into the output in click 8.0.
+    with pytest.raises(SystemExit) as e:
+        check_hec_tokens.main(
+            [
+                "--check",
+                f"complete={ACCOUNTS}",
+                "--check",
+                f"partial={ACCOUNTS}",
+                "--ssm",
+                "/root",
+                "--report",
+                "-",
+            ],
+            standalone_mode=False,
+        )
+    assert e.value.code == "Splunk HEC tokens do not have all indexes required by CSLS."
+
+    out, err = capsys.readouterr()
+    report = json.loads(out)
+    assert [r["token"] for r in report] == ["complete", "partial"]
+    assert report[1]["missing_indexes"] == ["index1"]
+    assert "[!] partial: missing indexes index1" in err
+    assert "[+] complete: has all required indexes" in err
+
+
+def test_check_hec_tokens_prints_status(
+    hec_tokens: Dict[str, Any], mocker: MockerFixture  # noqa: F811
+) -> None:
+    mocker.patch(
+        f"{__package__}.hec_index_checker.hec_index_checker_bulk",
+        side_effect=lambda checks, ssm: check_token_indexes(hec_tokens, checks),
+    )
+
+    result = CliRunner().invoke(
+        check_hec_tokens, ["--check", f"complete={ACCOUNTS}", "--ssm", "/root"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert result.output == "[+] complete: has all required indexes\n"
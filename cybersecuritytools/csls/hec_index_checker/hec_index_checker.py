@@ -1,13 +1,45 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import toml
 from botocore.exceptions import ClientError  # type: ignore
 
-from cybersecuritytools.splunk.api import SplunkApi, SplunkApiError
-from cybersecuritytools.splunk.credentials import credentials
-from cybersecuritytools.splunk.x509 import (
-    RequestsFingerPrintAdapterCertificates,
-    cert_bundle_new,
-)
+from cybersecuritytools.splunk.api import SplunkApi, SplunkApiError, hec_token_indexes
+from cybersecuritytools.splunk.x509 import RequestsFingerPrintAdapterCertificates
+
+from .accountstoml import AccountsTomlError, load_accounts_toml
+
+
+def required_indexes(accounts: str) -> Set[str]:
+    """The indexes named in the accounts TOML at `accounts`, or raise a
+    `ValueError` describing why they can't be read."""
+    try:
+        return set(load_accounts_toml(accounts).indexes)
+    except FileNotFoundError:
+        raise ValueError(f"Can not open TOML file: {accounts}")
+    except (toml.TomlDecodeError, AccountsTomlError) as e:
+        raise ValueError(f"Invalid TOML file {accounts}: {e}")
+
 
-from .accountstoml import indexes_from_accounts, load_accounts_loggroup_index_toml
+def splunk_api(ssm: str) -> Optional[SplunkApi]:
+    """Connect to the Splunk API using the details in SSM, or return
+    `None` if they can't be retrieved."""
+    from cybersecuritytools.splunk.cache import cached_cert_bundle, cached_credentials
+
+    try:
+        api_credentials = cached_credentials(ssm, "api")
+    except ClientError:
+        print("[!] Unable to build Splunk Credentials")
+        return None
+
+    try:
+        cert_bundle = cached_cert_bundle(ssm)
+    except ClientError:
+        print("[!] Unable to build Splunk certificate bundle")
+        return None
+    rfpac = RequestsFingerPrintAdapterCertificates(cert_bundle)
+
+    return SplunkApi(api_credentials, rfpac)
 
 
 def hec_index_checker(accounts: str, token: str, ssm: str) -> bool:
@@ -32,40 +64,95 @@ def hec_index_checker(accounts: str, token: str, ssm: str) -> bool:
     the required indexes.
     """
     try:
-        accounts_log_group = load_accounts_loggroup_index_toml(accounts)
-    except FileNotFoundError:
-        print(f"[!] Can not open TOML file: {accounts}")
-        return False
-
-    required_indexes = indexes_from_accounts(accounts_log_group)
-
-    try:
-        api_credentials = credentials(ssm, "api")
-    except ClientError:
-        print("[!] Unable to build Splunk Credentials")
+        required = required_indexes(accounts)
+    except ValueError as e:
+        print(f"[!] {e}")
         return False
 
-    try:
-        cert_bundle = cert_bundle_new(ssm)
-    except ClientError:
-        print("[!] Unable to build Splunk certificate bundle")
+    api = splunk_api(ssm)
+    if api is None:
         return False
-    rfpac = RequestsFingerPrintAdapterCertificates(cert_bundle)
-
-    splunk_api = SplunkApi(api_credentials, rfpac)
 
     try:
-        available_indexes = splunk_api.token_indexes(token)
+        available_indexes = api.token_indexes(token)
     except SplunkApiError:
         print("[!] Splunk returned a non 200 status code.")
         return False
-    except StopIteration:
+    except KeyError:
         print(f"[!] HEC token `{token}` does not exist")
         return False
 
-    if required_indexes.issubset(available_indexes):
+    if required.issubset(available_indexes):
         print("[+] HEC token has all required indexes")
         return True
     else:
         print("[!] HEC token does *NOT* have all required indexes!")
         return False
+
+
+@dataclass
+class TokenCheck:
+    """The result of checking one HEC token against one accounts TOML."""
+
+    token: str
+    accounts: str
+    error: Optional[str] = None
+    missing_indexes: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.missing_indexes
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "token": self.token,
+            "accounts": self.accounts,
+            "ok": self.ok,
+            "error": self.error,
+            "missing_indexes": self.missing_indexes,
+        }
+
+
+def check_token_indexes(
+    tokens: Dict[str, Any], checks: List[Tuple[str, str]]
+) -> List[TokenCheck]:
+    """Check each `(token name, accounts TOML path)` pair against a
+    listing of HEC tokens from `SplunkApi.hec_tokens_by_name`. Each TOML
+    file is only parsed once however many tokens it is checked against."""
+    results = []
+    for token, accounts in checks:
+        result = TokenCheck(token=token, accounts=accounts)
+        results.append(result)
+
+        try:
+            required = required_indexes(accounts)
+        except ValueError as e:
+            result.error = str(e)
+            continue
+
+        if token not in tokens:
+            result.error = f"HEC token `{token}` does not exist"
+        else:
+            available = hec_token_indexes(tokens[token])
+            result.missing_indexes = sorted(required - available)
+
+    return results
+
+
+def hec_index_checker_bulk(
+    checks: List[Tuple[str, str]], ssm: str
+) -> Optional[List[TokenCheck]]:
+    """Check many HEC tokens, each against an accounts TOML, with a single
+    request for the HEC token listing. Returns `None` if Splunk can't be
+    queried, see `hec_index_checker` for the SSM parameters needed."""
+    api = splunk_api(ssm)
+    if api is None:
+        return None
+
+    try:
+        tokens = api.hec_tokens_by_name()
+    except SplunkApiError:
+        print("[!] Splunk returned a non 200 status code.")
+        return None
+
+    return check_token_indexes(tokens, checks)
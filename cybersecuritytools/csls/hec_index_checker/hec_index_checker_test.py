@@ -0,0 +1,36 @@
+import pathlib
+from typing import Any, Dict
+
+import pytest
+
+from .hec_index_checker import check_token_indexes
+
+
+@pytest.fixture
+def hec_tokens() -> Dict[str, Any]:
+    """HEC tokens indexed by name, as from `SplunkApi.hec_tokens_by_name`"""
+    return {
+        "complete": {"name": "complete", "content": {"indexes": "index1,index2"}},
+        "partial": {"name": "partial", "content": {"indexes": "index2"}},
+    }
+
+
+def test_check_token_indexes(hec_tokens: Dict[str, Any]) -> None:
+    accounts = f"{pathlib.Path(__file__).parent.absolute()}"
+    accounts += "/accounts_loggroup_index_test.toml"
+
+    results = check_token_indexes(
+        hec_tokens,
+        [
+            ("complete", accounts),
+            ("partial", accounts),
+            ("missing", accounts),
+            ("complete", "/does/not/exist.toml"),
+        ],
+    )
+
+    assert [r.ok for r in results] == [True, False, False, False]
+    assert results[1].missing_indexes == ["index1"]
+    assert results[2].error == "HEC token `missing` does not exist"
+    assert results[3].error
+    assert results[1].as_dict()["missing_indexes"] == ["index1"]
@@ -1,12 +1,45 @@
-import click
-
-from cybersecuritytools.csls.cli import csls
+from typing import Optional
 
+import click
 
-@click.group()
-def cli() -> None:
-    pass
+from cybersecuritytools.lazy_group import LazyGroup
+from cybersecuritytools.metrics import export_metrics
 
 
-# Add new modules here
-cli.add_command(csls)
+# Add new modules here, as "name": "module:group". Each module is only
+# imported when its commands are run, so keep imports of cst cheap.
+@click.group(
+    cls=LazyGroup,
+    lazy_subcommands={
+        "aws": "cybersecuritytools.aws.cli:aws",
+        "csls": "cybersecuritytools.csls.cli:csls",
+        "splunk": "cybersecuritytools.splunk.cli:splunk",
+    },
+)
+@click.option(
+    "--metrics",
+    "metrics_summary",
+    is_flag=True,
+    help="Print the count and latency of AWS and Splunk calls at exit",
+)
+@click.option(
+    "--metrics-json",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the call metrics to this path as JSON at exit",
+)
+@click.option(
+    "--metrics-textfile",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the call metrics to this path in the Prometheus text format",
+)
+@click.pass_context
+def cli(
+    ctx: click.Context,
+    metrics_summary: bool,
+    metrics_json: Optional[str],
+    metrics_textfile: Optional[str],
+) -> None:
+    if metrics_summary or metrics_json or metrics_textfile:
+        ctx.call_on_close(
+            lambda: export_metrics(metrics_summary, metrics_json, metrics_textfile)
+        )
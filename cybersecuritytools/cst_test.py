@@ -0,0 +1,104 @@
+import subprocess
+import sys
+from typing import Dict, List
+
+import click
+import pytest
+from click.testing import CliRunner
+
+from .cst import cli
+from .lazy_group import LazyGroup
+
+# Modules which must only be imported by the commands that use them.
+HEAVY_MODULES = [
+    "aiohttp",
+    "boto3",
+    "botocore",
+    "cryptography",
+    "mypy_boto3_logs",
+    "requests",
+    "requests_toolbelt",
+    "splunklib",
+]
+
+# Importing cst takes around 30ms, most of it click. The budget is
+# generous so it only fails when something heavy is imported eagerly.
+IMPORT_BUDGET_MICROSECONDS = 150_000
+
+RUN_CST = "import sys; from cybersecuritytools.cst import cli; cli(sys.argv[1:])"
+
+
+def import_times(*args: str) -> Dict[str, int]:
+    """Run `cst` with `args` under `python -X importtime`, returning the
+    cumulative import time in microseconds of every module imported."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", RUN_CST, *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split(":", 1)[1].split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--help"],
+        ["aws", "--help"],
+        ["csls", "--help"],
+        ["csls", "check-hec-token", "--help"],
+        ["csls", "generate-cloudwatch-logs", "smoke-test", "--help"],
+    ],
+)
+def test_help_does_not_import_sdks(args: List[str]) -> None:
+    imported = import_times(*args)
+    assert "cybersecuritytools.cst" in imported
+    assert [m for m in HEAVY_MODULES if m in imported] == []
+
+
+def test_import_time_budget() -> None:
+    imported = import_times("--help")
+    assert imported["cybersecuritytools.cst"] < IMPORT_BUDGET_MICROSECONDS
+
+
+def test_lazy_subcommands_resolve() -> None:
+    def check(group: click.Group, ctx: click.Context) -> None:
+        for name in group.list_commands(ctx):
+            command = group.get_command(ctx, name)
+            assert isinstance(command, click.Command), name
+            if isinstance(command, click.Group):
+                check(command, click.Context(command, parent=ctx, info_name=name))
+
+    check(cli, click.Context(cli, info_name="cst"))
+
+
+def test_lazy_group_lists_and_runs_commands() -> None:
+    @click.group(
+        cls=LazyGroup,
+        lazy_subcommands={"run": "cybersecuritytools.cst_test:example"},
+    )
+    def group() -> None:
+        pass
+
+    @group.command()
+    def eager() -> None:
+        """An eager command."""
+
+    result = CliRunner().invoke(group, ["--help"])
+    assert "eager  An eager command." in result.output
+    assert "run" in result.output
+
+    result = CliRunner().invoke(group, ["run"])
+    assert result.exit_code == 0
+    assert result.output == "ran\n"
+
+
+@click.command()
+def example() -> None:
+    print("ran")
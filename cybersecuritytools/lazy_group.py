@@ -0,0 +1,57 @@
+"""A click group that only imports a subcommand's module when the
+subcommand is used, so `cst --help` and commands that don't need the AWS
+or Splunk SDKs don't pay to import them."""
+
+import importlib
+from typing import Any, Dict, List, Optional
+
+import click
+
+
+class LazyGroup(click.Group):
+    """`lazy_subcommands` maps each command name to the
+    `"package.module:attribute"` holding its click command or group.
+
+        @click.group(cls=LazyGroup, lazy_subcommands={"aws": "pkg.aws.cli:aws"})
+        def cli() -> None:
+            pass
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        lazy_subcommands: Optional[Dict[str, str]] = None,
+        **kwargs: Any,
+    ):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = lazy_subcommands or {}
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        return sorted([*super().list_commands(ctx), *self.lazy_subcommands])
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name in self.lazy_subcommands:
+            return self.load_command(cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def load_command(self, cmd_name: str) -> click.Command:
+        module_name, attribute = self.lazy_subcommands[cmd_name].split(":")
+        command = getattr(importlib.import_module(module_name), attribute)
+        if not isinstance(command, click.Command):
+            raise ValueError(f"{self.lazy_subcommands[cmd_name]} is not a command")
+        return command
+
+    def format_commands(self, ctx: click.Context, formatter: Any) -> None:
+        """List the commands without importing the lazy ones for their help
+        text, which is what would make `--help` slow."""
+        rows = []
+        for name in self.list_commands(ctx):
+            if name in self.lazy_subcommands:
+                rows.append((name, ""))
+                continue
+            command = self.get_command(ctx, name)
+            if command is not None and not command.hidden:
+                rows.append((name, command.get_short_help_str()))
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
@@ -0,0 +1,230 @@
+"""Count, time and size the outbound calls made to AWS and Splunk.
+
+Calls are recorded by name, such as `ssm.get_parameter`, in a process wide
+registry:
+
+    with timed("cloudwatch.put_log_events") as call:
+        call.bytes = len(payload)
+        client.put_log_events(...)
+
+An exception raised in the block is counted as an error and re-raised.
+Bytes are the size of the response body, or of the parameter values for
+SSM. They aren't recorded for Splunk searches, whose results are streamed
+after the call returns.
+`cst --metrics` prints a summary at exit, and `--metrics-json` and
+`--metrics-textfile` write the registry as JSON or in the Prometheus text
+format read by the node exporter textfile collector.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, TextIO
+
+# Upper bounds in seconds of the latency histogram buckets, the last
+# bucket counts everything slower.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def empty_buckets() -> List[int]:
+    return [0] * (len(LATENCY_BUCKETS) + 1)
+
+
+@dataclass
+class CallStats:
+    count: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    bytes: int = 0
+    buckets: List[int] = field(default_factory=empty_buckets)
+
+    def observe(self, seconds: float, size: int = 0, error: bool = False) -> None:
+        self.count += 1
+        self.errors += error
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.bytes += size
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def mean_seconds(self) -> float:
+        return self.seconds / self.count if self.count else 0.0
+
+    def cumulative_buckets(self) -> List[int]:
+        """Calls at or below each bucket's upper bound, and then in total.
+
+        >>> stats = CallStats()
+        >>> for seconds in [0.001, 0.02, 0.02, 60]:
+        ...     stats.observe(seconds)
+        >>> stats.cumulative_buckets()
+        [1, 1, 3, 3, 3, 3, 3, 3, 3, 3, 3, 4]
+        """
+        counts = []
+        total = 0
+        for count in self.buckets:
+            total += count
+            counts.append(total)
+        return counts
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "seconds": self.seconds,
+            "mean_seconds": self.mean_seconds(),
+            "max_seconds": self.max_seconds,
+            "bytes": self.bytes,
+            "buckets": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], self.buckets)),
+        }
+
+
+class Call:
+    """Set `bytes` to the size sent or received, or `error` to count a
+    call which failed without raising."""
+
+    __slots__ = ("bytes", "error")
+
+    def __init__(self) -> None:
+        self.bytes = 0
+        self.error = False
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.calls: Dict[str, CallStats] = {}
+        self.lock = threading.Lock()
+
+    def record(
+        self, name: str, seconds: float, size: int = 0, error: bool = False
+    ) -> None:
+        with self.lock:
+            stats = self.calls.get(name)
+            if stats is None:
+                stats = self.calls[name] = CallStats()
+            stats.observe(seconds, size, error)
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[Call]:
+        call = Call()
+        start = perf_counter()
+        try:
+            yield call
+        except Exception:
+            call.error = True
+            raise
+        finally:
+            self.record(name, perf_counter() - start, call.bytes, call.error)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.calls.clear()
+
+    def snapshot(self) -> Dict[str, CallStats]:
+        with self.lock:
+            return {
+                name: CallStats(
+                    s.count, s.errors, s.seconds, s.max_seconds, s.bytes, [*s.buckets]
+                )
+                for name, s in sorted(self.calls.items())
+            }
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {name: stats.as_dict() for name, stats in self.snapshot().items()}
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict(), indent=2)
+
+    def prometheus_text(self, prefix: str = "cst") -> str:
+        """The calls as a histogram of latency, and counters of errors and
+        bytes, labelled with the call name."""
+        snapshot = self.snapshot()
+        latency = f"{prefix}_call_duration_seconds"
+        lines = [
+            f"# HELP {latency} Latency of outbound calls.",
+            f"# TYPE {latency} histogram",
+        ]
+        for name, stats in snapshot.items():
+            bounds = [*map(str, LATENCY_BUCKETS), "+Inf"]
+            for bound, count in zip(bounds, stats.cumulative_buckets()):
+                lines.append(f'{latency}_bucket{{call="{name}",le="{bound}"}} {count}')
+            lines.append(f'{latency}_sum{{call="{name}"}} {stats.seconds}')
+            lines.append(f'{latency}_count{{call="{name}"}} {stats.count}')
+
+        for metric, description, attribute in [
+            ("errors", "Outbound calls which failed.", "errors"),
+            ("bytes", "Bytes sent or received by outbound calls.", "bytes"),
+        ]:
+            counter = f"{prefix}_call_{metric}_total"
+            lines.append(f"# HELP {counter} {description}")
+            lines.append(f"# TYPE {counter} counter")
+            for name, stats in snapshot.items():
+                value = getattr(stats, attribute)
+                lines.append(f'{counter}{{call="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """A table of the calls, slowest in total first."""
+        rows = sorted(self.snapshot().items(), key=lambda r: r[1].seconds, reverse=True)
+        lines = [
+            f"{'call':<34} {'count':>7} {'errors':>6} {'total s':>9} "
+            f"{'mean ms':>9} {'max ms':>9} {'bytes':>11}"
+        ]
+        for name, s in rows:
+            lines.append(
+                f"{name:<34} {s.count:>7} {s.errors:>6} {s.seconds:>9.3f} "
+                f"{s.mean_seconds() * 1000:>9.1f} {s.max_seconds * 1000:>9.1f} "
+                f"{s.bytes:>11}"
+            )
+        return "\n".join(lines)
+
+
+def write_atomically(path: str, text: str) -> None:
+    """Write to a temporary file and rename it over `path`, so a collector
+    reading the file never sees it half written. The file is made world
+    readable, as the node exporter usually runs as another user."""
+    directory = os.path.dirname(os.path.abspath(path))
+    f = tempfile.NamedTemporaryFile(
+        "w", dir=directory, prefix=".metrics-", delete=False
+    )
+    try:
+        with f:
+            f.write(text)
+        os.chmod(f.name, 0o644)
+        os.replace(f.name, path)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+
+
+_metrics = Metrics()
+
+
+def metrics() -> Metrics:
+    """The process wide registry used by `timed`."""
+    return _metrics
+
+
+def timed(name: str) -> ContextManager[Call]:
+    """Time a call made in a `with` block, see `Metrics.timed`."""
+    return _metrics.timed(name)
+
+
+def export_metrics(
+    summary: bool = False,
+    json_path: Optional[str] = None,
+    textfile_path: Optional[str] = None,
+    stream: Optional[TextIO] = None,
+) -> None:
+    """Write the process wide registry to each destination asked for."""
+    if json_path:
+        write_atomically(json_path, _metrics.to_json())
+    if textfile_path:
+        write_atomically(textfile_path, _metrics.prometheus_text())
+    if summary:
+        print(_metrics.summary(), file=stream or sys.stderr)
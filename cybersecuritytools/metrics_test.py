@@ -0,0 +1,111 @@
+import json
+import os
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+from click.testing import CliRunner
+
+from .cst import cli
+from .metrics import Metrics, metrics, timed, write_atomically
+
+
+@pytest.fixture
+def registry() -> Iterator[Metrics]:
+    metrics().clear()
+    yield metrics()
+    metrics().clear()
+
+
+def test_record_counts_latency_and_bytes() -> None:
+    registry = Metrics()
+    registry.record("ssm.get_parameter", 0.02, size=10)
+    registry.record("ssm.get_parameter", 0.2, size=5, error=True)
+
+    stats = registry.as_dict()["ssm.get_parameter"]
+    assert stats["count"] == 2
+    assert stats["errors"] == 1
+    assert stats["bytes"] == 15
+    assert stats["max_seconds"] == 0.2
+    assert stats["mean_seconds"] == pytest.approx(0.11)
+    assert stats["buckets"]["0.025"] == 1
+    assert stats["buckets"]["0.25"] == 1
+
+
+def test_timed_counts_exceptions_as_errors(registry: Metrics) -> None:
+    with timed("splunk.api.get_url") as call:
+        call.bytes = 100
+    with pytest.raises(KeyError):
+        with timed("splunk.api.get_url"):
+            raise KeyError("token")
+
+    stats = registry.snapshot()["splunk.api.get_url"]
+    assert (stats.count, stats.errors, stats.bytes) == (2, 1, 100)
+
+
+def test_prometheus_text() -> None:
+    registry = Metrics()
+    registry.record("cloudwatch.put_log_events", 0.3, size=2048)
+
+    lines = registry.prometheus_text().splitlines()
+    assert "# TYPE cst_call_duration_seconds histogram" in lines
+    call = 'call="cloudwatch.put_log_events"'
+    assert f'cst_call_duration_seconds_bucket{{{call},le="0.25"}} 0' in lines
+    assert f'cst_call_duration_seconds_bucket{{{call},le="0.5"}} 1' in lines
+    assert f'cst_call_duration_seconds_bucket{{{call},le="+Inf"}} 1' in lines
+    assert f"cst_call_duration_seconds_count{{{call}}} 1" in lines
+    assert f"cst_call_bytes_total{{{call}}} 2048" in lines
+    assert f"cst_call_errors_total{{{call}}} 0" in lines
+
+
+def test_summary_lists_slowest_first() -> None:
+    registry = Metrics()
+    registry.record("splunk.search.job.is_done", 0.01)
+    registry.record("splunk.search.jobs.create", 1.5)
+
+    lines = registry.summary().splitlines()
+    assert lines[0].split()[:3] == ["call", "count", "errors"]
+    assert lines[1].startswith("splunk.search.jobs.create")
+    assert lines[2].startswith("splunk.search.job.is_done")
+
+
+def test_cli_exports_metrics_at_exit(registry: Metrics, tmp_path: Path) -> None:
+    json_path = tmp_path / "metrics.json"
+    textfile_path = tmp_path / "cst.prom"
+    result = CliRunner().invoke(
+        cli,
+        [
+            "--metrics",
+            "--metrics-json",
+            str(json_path),
+            "--metrics-textfile",
+            str(textfile_path),
+            "splunk",
+            "hec-benchmark",
+            "--stub",
+            "-n",
+            "100",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+
+    assert json.loads(json_path.read_text())["splunk.hec.event"]["count"] == 1
+    assert 'cst_call_bytes_total{call="splunk.hec.event"}' in textfile_path.read_text()
+    summary = result.output.splitlines()[-2:]
+    assert summary[0].startswith("call")
+    assert summary[1].startswith("splunk.hec.event")
+
+
+def test_write_atomically_is_world_readable(tmp_path: Path) -> None:
+    path = tmp_path / "cst.prom"
+    write_atomically(str(path), "text\n")
+    assert path.read_text() == "text\n"
+    assert path.stat().st_mode & 0o777 == 0o644
+
+
+def test_write_atomically_removes_temp_file_on_failure(tmp_path: Path) -> None:
+    # A file can't replace a directory.
+    (tmp_path / "cst.prom").mkdir()
+    with pytest.raises(OSError):
+        write_atomically(str(tmp_path / "cst.prom"), "text\n")
+    assert os.listdir(tmp_path) == ["cst.prom"]
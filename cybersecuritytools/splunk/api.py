@@ -1,74 +1,209 @@
-from typing import Any, Set
+import ssl
+from typing import Any, Dict, Optional, Set, Tuple, Union
 
 import requests
-from requests.auth import HTTPBasicAuth
 from requests_toolbelt.adapters.fingerprint import FingerprintAdapter  # type: ignore
+from urllib3.poolmanager import PoolManager
+from urllib3.util.retry import Retry
 
+from ..metrics import timed
 from .credentials import SplunkCredentials
 from .x509 import RequestsFingerPrintAdapterCertificates
 
+# Connections kept open to the Splunk API, enough for a thread pool
+# sharing a single SplunkApi.
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 3
+DEFAULT_TIMEOUT = (5.0, 30.0)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
 
 class SplunkApiError(Exception):
+    def __init__(self, message: str = "", status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class SplunkApiAuthenticationError(SplunkApiError):
+    """The credentials were rejected, or lack a required capability."""
+
+
+class SplunkApiNotFoundError(SplunkApiError):
     pass
 
 
+class SplunkApiServerError(SplunkApiError):
+    """Splunk kept failing or rate limiting requests after retrying."""
+
+
+def splunk_api_error(response: requests.Response) -> SplunkApiError:
+    """The SplunkApiError subclass matching a response's status code."""
+    return status_code_error(response.status_code, response.url)
+
+
+def status_code_error(status: int, url: str) -> SplunkApiError:
+    message = f"Splunk API returned {status} for {url}"
+    if status in (401, 403):
+        return SplunkApiAuthenticationError(message, status)
+    if status == 404:
+        return SplunkApiNotFoundError(message, status)
+    if status == 429 or status >= 500:
+        return SplunkApiServerError(message, status)
+    return SplunkApiError(message, status)
+
+
+class PinnedCertificateAdapter(FingerprintAdapter):  # type: ignore
+    """A `FingerprintAdapter` that verifies with an in-memory `ssl_context`
+    rather than a CA bundle file."""
+
+    def __init__(self, fingerprint: str, ssl_context: ssl.SSLContext, **kwargs: Any):
+        self.ssl_context = ssl_context
+        super().__init__(fingerprint, **kwargs)
+
+    def init_poolmanager(
+        self, connections: int, maxsize: int, block: bool = False, **kwargs: Any
+    ) -> None:
+        self.poolmanager = PoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            assert_fingerprint=self.fingerprint,
+            ssl_context=self.ssl_context,
+        )
+
+    def cert_verify(self, conn: Any, url: str, verify: Any, cert: Any) -> None:
+        """Verify with `ssl_context` alone. requests would otherwise point
+        the connection at its CA bundle, which urllib3 then loads into the
+        shared context for every new connection."""
+        super().cert_verify(conn, url, False, cert)
+        conn.cert_reqs = "CERT_REQUIRED"
+
+
 class SplunkApi:
     """A class access the Splunk API. It uses certificate pinning to work
-    around the self signed certificate on Splunk Cloud."""
+    around the self signed certificate on Splunk Cloud.
+
+    Requests share a pool of keep-alive connections, are retried with
+    backoff on 429 and 5xx responses, and authenticate with a session key
+    from `/services/auth/login` rather than sending the password each time.
+    """
 
     def __init__(
         self,
         credentials: SplunkCredentials,
         rfpac: RequestsFingerPrintAdapterCertificates,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        retries: int = DEFAULT_RETRIES,
+        timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT,
     ):
         self.credentials = credentials
         self.rfpac = rfpac
+        self.pool_size = pool_size
+        self.retries = retries
+        self.timeout = timeout
+        self.session_key: Optional[str] = None
         self.create_session()
 
     def base_url(self) -> str:
         return f"https://{self.credentials.hostname}:{self.credentials.port}"
 
     def create_session(self) -> None:
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUS_CODES,
+            raise_on_status=False,
+        )
         self.session = requests.Session()
         self.session.mount(
             self.base_url(),
-            FingerprintAdapter(self.rfpac.host_certificate_fingerprint()),
+            PinnedCertificateAdapter(
+                self.rfpac.host_certificate_fingerprint(),
+                self.rfpac.ssl_context(),
+                pool_connections=1,
+                pool_maxsize=self.pool_size,
+                max_retries=retry,
+            ),
         )
 
-    def get_url(self, url: str) -> Any:
-        auth = HTTPBasicAuth(
-            self.credentials.username,
-            self.credentials.password,
-        )
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
         try:
-            response = self.session.get(
+            return self.session.request(
+                method,
                 self.base_url() + url,
-                auth=auth,
-                timeout=5,
-                verify=self.rfpac.cert_filename(),
+                timeout=self.timeout,
+                **kwargs,
             )
         except requests.exceptions.ConnectTimeout:
             print("[!] Timed out connecting to Splunk API")
             raise
 
+    def login(self) -> None:
+        """Exchange the username and password for a session key."""
+        with timed("splunk.api.login"):
+            response = self.request(
+                "POST",
+                "/services/auth/login",
+                data={
+                    "username": self.credentials.username,
+                    "password": self.credentials.password,
+                    "output_mode": "json",
+                },
+            )
+            if response.status_code != 200:
+                raise splunk_api_error(response)
+
+        self.session_key = response.json()["sessionKey"]
+        self.session.headers["Authorization"] = f"Splunk {self.session_key}"
+
+    def get_url(self, url: str, params: Optional[Dict[str, str]] = None) -> Any:
+        if self.session_key is None:
+            self.login()
+
+        response = self.timed_get(url, params)
+        if response.status_code == 401:
+            # The session key has expired, log in again and retry once.
+            self.login()
+            response = self.timed_get(url, params)
+
         if response.status_code != 200:
-            raise SplunkApiError
+            raise splunk_api_error(response)
+        return response
 
+    def timed_get(
+        self, url: str, params: Optional[Dict[str, str]] = None
+    ) -> requests.Response:
+        """A single GET, timed without any login it leads to."""
+        with timed("splunk.api.get_url") as call:
+            response = self.request("GET", url, params=params)
+            call.bytes = len(response.content)
+            call.error = response.status_code != 200
         return response
 
+    def get_json(self, url: str, **params: str) -> Any:
+        """GET a Splunk REST endpoint and return the decoded JSON body."""
+        return self.get_url(url, params={"output_mode": "json", **params}).json()
+
     def get_hec_tokens(self) -> Any:
         """The Splunk users role needs the `dmc_deploy_apps` and
         `dmc_deploy_token_http` capabilities."""
-        url = "/services/dmc/config/inputs/-/http?output_mode=json"
-        tokens = self.get_url(url).json()
-        return tokens
+        # Splunk returns 30 entries unless asked for all of them.
+        return self.get_json("/services/dmc/config/inputs/-/http", count="0")
 
-    def get_hec_token(self, token_name: str) -> Any:
+    def hec_tokens_by_name(self) -> Dict[str, Any]:
+        """Fetch every HEC token once, indexed by token name."""
         tokens = self.get_hec_tokens()
-        token = next(token for token in tokens["entry"] if token["name"] == token_name)
-        return token
+        return {token["name"]: token for token in tokens["entry"]}
+
+    def get_hec_token(self, token_name: str) -> Any:
+        """Raises `KeyError` if there is no token called `token_name`."""
+        return self.hec_tokens_by_name()[token_name]
 
     def token_indexes(self, token_name: str) -> Set[str]:
-        token = self.get_hec_token(token_name)
-        token_indexes = set(token["content"]["indexes"].split(","))
-        return token_indexes
+        return hec_token_indexes(self.get_hec_token(token_name))
+
+
+def hec_token_indexes(token: Any) -> Set[str]:
+    """The indexes a HEC token from `get_hec_tokens` can write to."""
+    token_indexes = set(token["content"]["indexes"].split(","))
+    return token_indexes
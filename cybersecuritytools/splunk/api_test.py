@@ -1,8 +1,26 @@
+import base64
+import json
+import ssl
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from typing import Any, Iterator, Tuple
+
 import pytest
+import requests
+from pytest_mock import MockerFixture
 
-from .api import SplunkApi
+from ..metrics import metrics
+from .api import (
+    SplunkApi,
+    SplunkApiAuthenticationError,
+    SplunkApiError,
+    SplunkApiNotFoundError,
+    SplunkApiServerError,
+)
 from .credentials import SplunkCredentials
-from .x509 import RequestsFingerPrintAdapterCertificates
+from .x509 import CertBundle, RequestsFingerPrintAdapterCertificates
+from .x509_test import self_signed_certificate
 
 
 @pytest.fixture
@@ -30,3 +48,175 @@ def test_splunk_api_base_url(
     expected = f"https://{splunk_credentials.hostname}:{splunk_credentials.port}"
     result = splunk_api.base_url()
     assert result == expected
+
+
+def test_hec_tokens_by_name(splunk_api: SplunkApi, mocker: MockerFixture) -> None:
+    tokens = {
+        "entry": [
+            {"name": "foo", "content": {"indexes": "index1,index2"}},
+            {"name": "bar", "content": {"indexes": "index3"}},
+        ]
+    }
+    mocker.patch.object(splunk_api, "get_hec_tokens", return_value=tokens)
+
+    assert set(splunk_api.hec_tokens_by_name()) == {"foo", "bar"}
+    assert splunk_api.token_indexes("foo") == {"index1", "index2"}
+    with pytest.raises(KeyError):
+        splunk_api.get_hec_token("baz")
+
+
+def response(status_code: int, body: Any = None) -> requests.Response:
+    r = requests.Response()
+    r.status_code = status_code
+    r.url = "https://splunkfoo.com/"
+    r._content = json.dumps(body or {}).encode()
+    return r
+
+
+def test_get_json_logs_in_once(splunk_api: SplunkApi, mocker: MockerFixture) -> None:
+    request = mocker.patch.object(
+        splunk_api.session,
+        "request",
+        side_effect=[
+            response(200, {"sessionKey": "key1"}),
+            response(200, {"entry": []}),
+            response(200, {"entry": []}),
+        ],
+    )
+
+    assert splunk_api.get_json("/services/foo") == {"entry": []}
+    assert splunk_api.get_json("/services/foo") == {"entry": []}
+
+    assert request.call_count == 3
+    assert splunk_api.session.headers["Authorization"] == "Splunk key1"
+    assert request.mock_calls[1].kwargs["params"] == {"output_mode": "json"}
+
+
+def test_get_hec_tokens_lists_every_token(
+    splunk_api: SplunkApi, mocker: MockerFixture
+) -> None:
+    splunk_api.session_key = "key"
+    request = mocker.patch.object(
+        splunk_api.session, "request", return_value=response(200, {"entry": []})
+    )
+
+    splunk_api.get_hec_tokens()
+    assert request.mock_calls[0].kwargs["params"]["count"] == "0"
+
+
+def test_get_url_expired_session(splunk_api: SplunkApi, mocker: MockerFixture) -> None:
+    metrics().clear()
+    splunk_api.session_key = "expired"
+    mocker.patch.object(
+        splunk_api.session,
+        "request",
+        side_effect=[
+            response(401),
+            response(200, {"sessionKey": "key2"}),
+            response(200),
+        ],
+    )
+
+    assert splunk_api.get_url("/services/foo").status_code == 200
+    assert splunk_api.session_key == "key2"
+
+    # The login is timed on its own, not as part of either GET.
+    get_url = metrics().snapshot()["splunk.api.get_url"]
+    assert (get_url.count, get_url.errors) == (2, 1)
+    assert metrics().snapshot()["splunk.api.login"].count == 1
+    metrics().clear()
+
+
+@pytest.mark.parametrize(  # type: ignore
+    "status_code,error",
+    [
+        (403, SplunkApiAuthenticationError),
+        (404, SplunkApiNotFoundError),
+        (503, SplunkApiServerError),
+        (400, SplunkApiError),
+    ],
+)
+def test_get_url_typed_errors(
+    splunk_api: SplunkApi, mocker: MockerFixture, status_code: int, error: Any
+) -> None:
+    splunk_api.session_key = "key"
+    mocker.patch.object(
+        splunk_api.session, "request", return_value=response(status_code)
+    )
+
+    with pytest.raises(error) as e:
+        splunk_api.get_url("/services/foo")
+    assert e.value.status_code == status_code
+
+
+def test_session_retries(splunk_api: SplunkApi) -> None:
+    adapter: Any = splunk_api.session.get_adapter(splunk_api.base_url())
+    assert adapter.max_retries.total == splunk_api.retries
+    assert 503 in adapter.max_retries.status_forcelist
+
+
+@pytest.fixture
+def https_server(
+    tmp_path: Path, certificate: Tuple[bytes, bytes]
+) -> Iterator[HTTPServer]:
+    """A local HTTPS server answering every GET with an empty JSON object."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    (tmp_path / "cert.pem").write_bytes(certificate[0])
+    (tmp_path / "key.pem").write_bytes(certificate[1])
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(tmp_path / "cert.pem", tmp_path / "key.pem")
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def local_api(
+    server: HTTPServer, rfpac: RequestsFingerPrintAdapterCertificates
+) -> SplunkApi:
+    credentials = SplunkCredentials(
+        hostname="127.0.0.1",
+        port=str(server.server_address[1]),
+        username="tester",
+        password="foobar123",
+    )
+    return SplunkApi(credentials, rfpac, retries=0)
+
+
+def test_pinned_certificate_from_memory(
+    https_server: HTTPServer, rfpac: RequestsFingerPrintAdapterCertificates
+) -> None:
+    api = local_api(https_server, rfpac)
+    assert api.request("GET", "/services/foo").json() == {}
+    assert api.request("GET", "/services/foo").status_code == 200
+    # Only the pinned CA is trusted, no bundle was loaded into the context.
+    assert rfpac.ssl_context().cert_store_stats()["x509"] == 1
+
+
+def test_pinned_certificate_mismatch(
+    https_server: HTTPServer, cert_bundle: CertBundle
+) -> None:
+    other_cert = ssl.PEM_cert_to_DER_cert(self_signed_certificate()[0].decode())
+    other = RequestsFingerPrintAdapterCertificates(
+        CertBundle(
+            host_cert=base64.b64encode(other_cert).decode(),
+            ca_cert=cert_bundle.ca_cert,
+        )
+    )
+    api = local_api(https_server, other)
+    with pytest.raises(requests.exceptions.SSLError):
+        api.request("GET", "/services/foo")
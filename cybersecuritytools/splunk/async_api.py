@@ -0,0 +1,213 @@
+"""An asyncio client for the Splunk REST API, covering the same ground as
+`SplunkApi` and `Search` so one process can drive many concurrent
+requests without threads.
+
+    async with AsyncSplunkApi(credentials, rfpac) as api:
+        indexes = await asyncio.gather(
+            *(api.token_indexes(token) for token in tokens)
+        )
+"""
+
+import asyncio
+import random
+from types import TracebackType
+from typing import Any, Dict, List, Optional, Set, Type
+
+import aiohttp
+
+from .api import (
+    DEFAULT_RETRIES,
+    RETRY_STATUS_CODES,
+    SplunkApiError,
+    hec_token_indexes,
+    status_code_error,
+)
+from .credentials import SplunkCredentials
+from .search import DEFAULT_PAGE_SIZE
+from .x509 import RequestsFingerPrintAdapterCertificates
+
+DEFAULT_MAX_CONNECTIONS = 100
+
+
+class AsyncSplunkApi:
+    """Access the Splunk API with asyncio, pinning the host certificate
+    fingerprint like `SplunkApi`. Use it as an async context manager so
+    its connection pool is closed."""
+
+    def __init__(
+        self,
+        credentials: SplunkCredentials,
+        rfpac: RequestsFingerPrintAdapterCertificates,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        retries: int = DEFAULT_RETRIES,
+        timeout: float = 30.0,
+    ):
+        self.credentials = credentials
+        self.rfpac = rfpac
+        self.max_connections = max_connections
+        self.retries = retries
+        self.timeout = timeout
+        self.session_key: Optional[str] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._login_lock: Optional[asyncio.Lock] = None
+
+    def base_url(self) -> str:
+        return f"https://{self.credentials.hostname}:{self.credentials.port}"
+
+    async def __aenter__(self) -> "AsyncSplunkApi":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            fingerprint = bytes.fromhex(self.rfpac.host_certificate_fingerprint())
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections, ssl=aiohttp.Fingerprint(fingerprint)
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> Any:
+        """Make a request and return the decoded JSON body, retrying with
+        backoff on 429 and 5xx responses."""
+        headers = {}
+        if self.session_key is not None:
+            headers["Authorization"] = f"Splunk {self.session_key}"
+
+        for attempt in range(self.retries + 1):
+            async with self.session.request(
+                method, self.base_url() + url, headers=headers, **kwargs
+            ) as response:
+                status = response.status
+                if status == 200 or status == 201:
+                    return await response.json(content_type=None)
+            if status not in RETRY_STATUS_CODES or attempt == self.retries:
+                raise status_code_error(status, url)
+            await asyncio.sleep(random.uniform(0, 0.5 * 2**attempt))
+
+        raise SplunkApiError(f"Splunk API request to {url} failed")  # pragma: no cover
+
+    async def login(self) -> None:
+        """Exchange the username and password for a session key. Concurrent
+        callers share a single login."""
+        if self._login_lock is None:
+            self._login_lock = asyncio.Lock()
+        session_key = self.session_key
+        async with self._login_lock:
+            if self.session_key != session_key:
+                return
+            self.session_key = None
+            response = await self.request(
+                "POST",
+                "/services/auth/login",
+                data={
+                    "username": self.credentials.username,
+                    "password": self.credentials.password,
+                    "output_mode": "json",
+                },
+            )
+            self.session_key = response["sessionKey"]
+
+    async def authenticated_request(self, method: str, url: str, **kwargs: Any) -> Any:
+        if self.session_key is None:
+            await self.login()
+        try:
+            return await self.request(method, url, **kwargs)
+        except SplunkApiError as e:
+            if e.status_code != 401:
+                raise
+        # The session key has expired, log in again and retry once.
+        await self.login()
+        return await self.request(method, url, **kwargs)
+
+    async def get_json(self, url: str, **params: str) -> Any:
+        params = {"output_mode": "json", **params}
+        return await self.authenticated_request("GET", url, params=params)
+
+    async def post_json(self, url: str, **data: str) -> Any:
+        data = {"output_mode": "json", **data}
+        return await self.authenticated_request("POST", url, data=data)
+
+    async def get_hec_tokens(self) -> Any:
+        # Splunk returns 30 entries unless asked for all of them.
+        return await self.get_json("/services/dmc/config/inputs/-/http", count="0")
+
+    async def hec_tokens_by_name(self) -> Dict[str, Any]:
+        tokens = await self.get_hec_tokens()
+        return {token["name"]: token for token in tokens["entry"]}
+
+    async def token_indexes(self, token_name: str) -> Set[str]:
+        """Raises `KeyError` if there is no token called `token_name`."""
+        tokens = await self.hec_tokens_by_name()
+        return hec_token_indexes(tokens[token_name])
+
+    async def create_job(self, search_query: str, **search_kwargs: str) -> str:
+        """Start a search job and return its search id."""
+        response = await self.post_json(
+            "/services/search/jobs", search=search_query, **search_kwargs
+        )
+        return str(response["sid"])
+
+    async def is_job_done(self, sid: str) -> bool:
+        response = await self.get_json(f"/services/search/jobs/{sid}")
+        return bool(response["entry"][0]["content"]["isDone"])
+
+    async def wait_for_job(
+        self,
+        sid: str,
+        poll_interval: float = 0.1,
+        poll_max_interval: float = 5.0,
+        poll_backoff: float = 2.0,
+    ) -> None:
+        """Poll a job until it is done, backing off exponentially like
+        `Search.wait_for_job`."""
+        interval = poll_interval
+        while not await self.is_job_done(sid):
+            await asyncio.sleep(random.uniform(interval / 2, interval))
+            interval = min(interval * poll_backoff, poll_max_interval)
+
+    async def job_results(
+        self, sid: str, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> List[Dict[str, Any]]:
+        """Page through the results of a finished job."""
+        results: List[Dict[str, Any]] = []
+        while True:
+            response = await self.get_json(
+                f"/services/search/jobs/{sid}/results",
+                count=str(page_size),
+                offset=str(len(results)),
+            )
+            page = response.get("results", [])
+            results.extend(page)
+            if len(page) < page_size:
+                return results
+
+    async def cancel_job(self, sid: str) -> None:
+        await self.post_json(f"/services/search/jobs/{sid}/control", action="cancel")
+
+    async def search(
+        self, search_query: str, **search_kwargs: str
+    ) -> List[Dict[str, Any]]:
+        """Run a search job to completion and return its results."""
+        sid = await self.create_job(search_query, **search_kwargs)
+        try:
+            await self.wait_for_job(sid)
+            return await self.job_results(sid)
+        finally:
+            await self.cancel_job(sid)
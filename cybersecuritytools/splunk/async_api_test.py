@@ -0,0 +1,230 @@
+import asyncio
+import ssl
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Tuple, TypeVar
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from .api import SplunkApiNotFoundError, SplunkApiServerError
+from .async_api import AsyncSplunkApi
+from .credentials import SplunkCredentials
+from .x509 import CertBundle, RequestsFingerPrintAdapterCertificates
+
+T = TypeVar("T")
+
+TOKENS = {
+    "entry": [
+        {"name": "foo", "content": {"indexes": "index1,index2"}},
+        {"name": "bar", "content": {"indexes": "index3"}},
+    ]
+}
+
+
+class StubSplunk:
+    """Just enough of the Splunk REST API to exercise AsyncSplunkApi."""
+
+    def __init__(self) -> None:
+        self.logins = 0
+        self.polls = 0
+        self.cancelled: List[str] = []
+        self.failures: List[int] = []
+        self.results = [{"n": str(n)} for n in range(5)]
+        self.tokens_listed = TOKENS
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/services/auth/login", self.login)
+        app.router.add_get("/services/dmc/config/inputs/-/http", self.tokens)
+        app.router.add_post("/services/search/jobs", self.create_job)
+        app.router.add_get("/services/search/jobs/{sid}", self.job)
+        app.router.add_get("/services/search/jobs/{sid}/results", self.job_results)
+        app.router.add_post("/services/search/jobs/{sid}/control", self.control)
+        return app
+
+    def authorized(self, request: web.Request) -> None:
+        if request.headers.get("Authorization") != f"Splunk key{self.logins}":
+            raise web.HTTPUnauthorized()
+
+    async def login(self, request: web.Request) -> web.Response:
+        data = await request.post()
+        if data["password"] != "foobar123":
+            raise web.HTTPUnauthorized()
+        self.logins += 1
+        return web.json_response({"sessionKey": f"key{self.logins}"})
+
+    async def tokens(self, request: web.Request) -> web.Response:
+        if self.failures:
+            return web.Response(status=self.failures.pop(0))
+        self.authorized(request)
+        # Like Splunk, list 30 entries by default and all of them for 0.
+        count = int(request.query.get("count", 30)) or None
+        return web.json_response({"entry": self.tokens_listed["entry"][:count]})
+
+    async def create_job(self, request: web.Request) -> web.Response:
+        self.authorized(request)
+        data = await request.post()
+        assert data["search"] == "search index=foo"
+        return web.json_response({"sid": "1234.5"}, status=201)
+
+    async def job(self, request: web.Request) -> web.Response:
+        self.authorized(request)
+        if request.match_info["sid"] != "1234.5":
+            raise web.HTTPNotFound()
+        self.polls += 1
+        done = self.polls >= 3
+        return web.json_response({"entry": [{"content": {"isDone": done}}]})
+
+    async def job_results(self, request: web.Request) -> web.Response:
+        self.authorized(request)
+        count = int(request.query["count"])
+        offset = int(request.query["offset"])
+        page = self.results[offset:][:count]
+        return web.json_response({"results": page})
+
+    async def control(self, request: web.Request) -> web.Response:
+        self.authorized(request)
+        self.cancelled.append(request.match_info["sid"])
+        return web.json_response({})
+
+
+@pytest.fixture
+def stub_splunk() -> StubSplunk:
+    return StubSplunk()
+
+
+@pytest.fixture
+def run_against_stub(
+    tmp_path: Path,
+    stub_splunk: StubSplunk,
+    certificate: Tuple[bytes, bytes],
+    cert_bundle: CertBundle,
+) -> Callable[[Callable[[AsyncSplunkApi], Awaitable[T]]], T]:
+    """Run a coroutine function with an AsyncSplunkApi connected to a
+    stub Splunk on a local HTTPS port."""
+    (tmp_path / "cert.pem").write_bytes(certificate[0])
+    (tmp_path / "key.pem").write_bytes(certificate[1])
+    ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    ssl_context.load_cert_chain(tmp_path / "cert.pem", tmp_path / "key.pem")
+
+    async def run(test: Callable[[AsyncSplunkApi], Awaitable[T]]) -> T:
+        runner = web.AppRunner(stub_splunk.app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0, ssl_context=ssl_context)
+        await site.start()
+        port = runner.addresses[0][1]
+        credentials = SplunkCredentials(
+            hostname="127.0.0.1",
+            port=str(port),
+            username="tester",
+            password="foobar123",
+        )
+        rfpac = RequestsFingerPrintAdapterCertificates(cert_bundle)
+        try:
+            async with AsyncSplunkApi(credentials, rfpac, retries=2) as api:
+                return await test(api)
+        finally:
+            await runner.cleanup()
+
+    def run_test(test: Callable[[AsyncSplunkApi], Awaitable[T]]) -> T:
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(run(test))
+        finally:
+            loop.close()
+
+    return run_test
+
+
+def test_token_indexes(run_against_stub: Any, stub_splunk: StubSplunk) -> None:
+    async def test(api: AsyncSplunkApi) -> Any:
+        return await asyncio.gather(*(api.token_indexes(t) for t in ["foo", "bar"]))
+
+    assert run_against_stub(test) == [{"index1", "index2"}, {"index3"}]
+    # Concurrent requests share one login.
+    assert stub_splunk.logins == 1
+
+
+def test_missing_token(run_against_stub: Any) -> None:
+    async def test(api: AsyncSplunkApi) -> Any:
+        return await api.token_indexes("baz")
+
+    with pytest.raises(KeyError):
+        run_against_stub(test)
+
+
+def test_lists_every_token(run_against_stub: Any, stub_splunk: StubSplunk) -> None:
+    stub_splunk.tokens_listed = {
+        "entry": [
+            {"name": f"token{i}", "content": {"indexes": "index1"}} for i in range(40)
+        ]
+    }
+
+    async def test(api: AsyncSplunkApi) -> Dict[str, Any]:
+        return await api.hec_tokens_by_name()
+
+    assert len(run_against_stub(test)) == 40
+
+
+def test_login_again_when_session_key_expires(
+    run_against_stub: Any, stub_splunk: StubSplunk
+) -> None:
+    async def test(api: AsyncSplunkApi) -> Dict[str, Any]:
+        await api.login()
+        api.session_key = "expired"
+        return await api.hec_tokens_by_name()
+
+    assert set(run_against_stub(test)) == {"foo", "bar"}
+    assert stub_splunk.logins == 2
+
+
+def test_retry_server_errors(run_against_stub: Any, stub_splunk: StubSplunk) -> None:
+    stub_splunk.failures = [503, 429]
+
+    async def test(api: AsyncSplunkApi) -> Any:
+        return await api.get_hec_tokens()
+
+    assert run_against_stub(test) == TOKENS
+
+    stub_splunk.failures = [503, 503, 503]
+    with pytest.raises(SplunkApiServerError):
+        run_against_stub(test)
+
+
+def test_search(run_against_stub: Any, stub_splunk: StubSplunk) -> None:
+    async def test(api: AsyncSplunkApi) -> Any:
+        sid = await api.create_job("search index=foo")
+        await api.wait_for_job(sid, poll_interval=0.01)
+        results = await api.job_results(sid, page_size=2)
+        await api.cancel_job(sid)
+        return results
+
+    assert run_against_stub(test) == stub_splunk.results
+    assert stub_splunk.polls == 3
+    assert stub_splunk.cancelled == ["1234.5"]
+
+
+def test_search_cancels_job(run_against_stub: Any, stub_splunk: StubSplunk) -> None:
+    async def test(api: AsyncSplunkApi) -> Any:
+        return await api.search("search index=foo")
+
+    assert run_against_stub(test) == stub_splunk.results
+    assert stub_splunk.cancelled == ["1234.5"]
+
+
+def test_job_not_found(run_against_stub: Any) -> None:
+    async def test(api: AsyncSplunkApi) -> Any:
+        return await api.is_job_done("missing")
+
+    with pytest.raises(SplunkApiNotFoundError):
+        run_against_stub(test)
+
+
+def test_fingerprint_mismatch(run_against_stub: Any) -> None:
+    async def test(api: AsyncSplunkApi) -> Any:
+        api.rfpac = RequestsFingerPrintAdapterCertificates(CertBundle("AAAA", "BBBB"))
+        return await api.get_hec_tokens()
+
+    with pytest.raises(aiohttp.ServerFingerprintMismatch):
+        run_against_stub(test)
@@ -0,0 +1,150 @@
+"""An optional, encrypted, on-disk cache of resolved Splunk connection
+details. It lets back to back `cst` invocations skip the SSM lookups made
+by `credentials` and `cert_bundle_new`.
+
+The cache is only used when `CST_CACHE_KEY` is set to a Fernet key, which
+can be generated with `cryptography.fernet.Fernet.generate_key()`.
+
+The environment variables are:
+CST_CACHE_KEY       The key used to encrypt the cache files
+CST_CACHE_DIR       Where to write the cache, defaults to ~/.cache/cybersecuritytools
+CST_CACHE_MAX_AGE   Seconds before a cached value is fetched again, defaults to 3600
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import asdict
+from typing import Any, Callable, Dict, List, Optional
+
+from .credentials import CREDENTIAL_PARAMETERS, SplunkCredentials, credentials
+from .x509 import CERT_PARAMETERS, CertBundle, cert_bundle_new
+
+DEFAULT_MAX_AGE_SECONDS = 3600
+
+
+def default_cache_dir() -> str:
+    cache_home = os.environ.get(
+        "XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")
+    )
+    return os.path.join(cache_home, "cybersecuritytools")
+
+
+class CredentialCache:
+    """Store values encrypted with `key` as one file per cache entry in
+    `path`. Entries older than `max_age` seconds are ignored, and when
+    `refresh` is set every lookup is fetched again and re-written."""
+
+    def __init__(
+        self,
+        key: str,
+        path: Optional[str] = None,
+        max_age: int = DEFAULT_MAX_AGE_SECONDS,
+        refresh: bool = False,
+    ):
+        # cryptography is slow to import, so only import it when caching.
+        from cryptography.fernet import Fernet
+
+        self.fernet = Fernet(key.encode())
+        self.path = path or default_cache_dir()
+        self.max_age = max_age
+        self.refresh = refresh
+
+    def filename(self, name: str) -> str:
+        digest = hashlib.sha256(name.encode()).hexdigest()
+        return os.path.join(self.path, f"{digest}.cache")
+
+    def read(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the decrypted entry or `None` if it is missing, expired
+        or can not be decrypted with the current key."""
+        from cryptography.fernet import InvalidToken
+
+        try:
+            with open(self.filename(name), "rb") as f:
+                token = f.read()
+            value: Dict[str, Any] = json.loads(
+                self.fernet.decrypt(token, ttl=self.max_age)
+            )
+        except (OSError, InvalidToken, ValueError):
+            return None
+        return value
+
+    def write(self, name: str, value: Dict[str, Any]) -> None:
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        token = self.fernet.encrypt(json.dumps(value).encode())
+        filename = self.filename(name)
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        fd = os.open(tmp_filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(token)
+        os.replace(tmp_filename, filename)
+
+    def get(self, name: str, fetch: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Return the cached entry `name`, calling `fetch` and caching the
+        result if there isn't a usable one."""
+        value = None if self.refresh else self.read(name)
+        if value is None:
+            value = fetch()
+            self.write(name, value)
+        return value
+
+
+_settings: Dict[str, Any] = {}
+
+
+def configure_credential_cache(
+    max_age: Optional[int] = None, refresh: bool = False
+) -> None:
+    """Override the environment settings for the process wide cache."""
+    if max_age is not None:
+        _settings["max_age"] = max_age
+    _settings["refresh"] = refresh
+
+
+def credential_cache() -> Optional[CredentialCache]:
+    """The cache configured by the environment, or `None` if caching is off."""
+    key = os.environ.get("CST_CACHE_KEY")
+    if not key:
+        return None
+    max_age = _settings.get(
+        "max_age", int(os.environ.get("CST_CACHE_MAX_AGE", DEFAULT_MAX_AGE_SECONDS))
+    )
+    return CredentialCache(
+        key,
+        path=os.environ.get("CST_CACHE_DIR"),
+        max_age=max_age,
+        refresh=_settings.get("refresh", False),
+    )
+
+
+def overridden(parameters: List[str]) -> bool:
+    """Whether any of the parameters is set in the environment, which is
+    preferred over SSM and so over anything cached from it."""
+    return any(parameter.upper() in os.environ for parameter in parameters)
+
+
+def cached_credentials(ssm_root: str, service: str) -> SplunkCredentials:
+    """`credentials` backed by the credential cache when it is enabled,
+    and none of the credentials are set in the environment."""
+    cache = credential_cache()
+    if cache is None or overridden(CREDENTIAL_PARAMETERS):
+        return credentials(ssm_root, service)
+
+    value = cache.get(
+        f"credentials:{ssm_root}:{service}",
+        lambda: asdict(credentials(ssm_root, service)),
+    )
+    return SplunkCredentials(**value)
+
+
+def cached_cert_bundle(ssm_root: str) -> CertBundle:
+    """`cert_bundle_new` backed by the credential cache when it is enabled,
+    and neither certificate is set in the environment."""
+    cache = credential_cache()
+    if cache is None or overridden(CERT_PARAMETERS):
+        return cert_bundle_new(ssm_root)
+
+    value = cache.get(
+        f"cert_bundle:{ssm_root}", lambda: asdict(cert_bundle_new(ssm_root))
+    )
+    return CertBundle(**value)
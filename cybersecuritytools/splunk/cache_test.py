@@ -0,0 +1,65 @@
+import os
+from typing import Any, Dict
+
+import pytest
+from cryptography.fernet import Fernet
+
+from .cache import CredentialCache, cached_cert_bundle
+from .x509 import CertBundle
+
+
+@pytest.fixture
+def cache(tmp_path: Any) -> CredentialCache:
+    return CredentialCache(Fernet.generate_key().decode(), path=str(tmp_path))
+
+
+def test_cache_round_trip(cache: CredentialCache) -> None:
+    calls = []
+
+    def fetch() -> Dict[str, Any]:
+        calls.append(1)
+        return {"hostname": "splunkfoo.com"}
+
+    assert cache.get("credentials:root:api", fetch) == {"hostname": "splunkfoo.com"}
+    assert cache.get("credentials:root:api", fetch) == {"hostname": "splunkfoo.com"}
+    assert len(calls) == 1
+
+
+def test_cache_is_encrypted(cache: CredentialCache) -> None:
+    cache.write("cert_bundle:root", {"host_cert": "plaintext-cert"})
+    filename = cache.filename("cert_bundle:root")
+    with open(filename, "rb") as f:
+        assert b"plaintext-cert" not in f.read()
+    assert os.stat(filename).st_mode & 0o077 == 0
+
+
+def test_cache_wrong_key(cache: CredentialCache) -> None:
+    cache.write("cert_bundle:root", {"host_cert": "AAAA"})
+    other = CredentialCache(Fernet.generate_key().decode(), path=cache.path)
+    assert other.read("cert_bundle:root") is None
+
+
+def test_cache_refresh(cache: CredentialCache) -> None:
+    cache.write("cert_bundle:root", {"host_cert": "AAAA"})
+    cache.refresh = True
+    assert cache.get("cert_bundle:root", lambda: {"host_cert": "BBBB"}) == {
+        "host_cert": "BBBB"
+    }
+    cache.refresh = False
+    assert cache.read("cert_bundle:root") == {"host_cert": "BBBB"}
+
+
+def test_environment_overrides_cache(
+    tmp_path: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Certificates set in the environment should be used over cached ones"""
+    key = Fernet.generate_key().decode()
+    monkeypatch.setenv("CST_CACHE_KEY", key)
+    monkeypatch.setenv("CST_CACHE_DIR", str(tmp_path))
+    cache = CredentialCache(key, path=str(tmp_path))
+    cache.write("cert_bundle:root", {"host_cert": "AAAA", "ca_cert": "BBBB"})
+    assert cached_cert_bundle("root") == CertBundle("AAAA", "BBBB")
+
+    monkeypatch.setenv("SPLUNK_HOST_CERT", "CCCC")
+    monkeypatch.setenv("SPLUNK_CA_CERT", "DDDD")
+    assert cached_cert_bundle("root") == CertBundle("CCCC", "DDDD")
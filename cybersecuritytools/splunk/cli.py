@@ -0,0 +1,81 @@
+from sys import exit
+from typing import Optional
+
+import click
+
+from .hec import (
+    DEFAULT_BATCH_BYTES,
+    DEFAULT_WORKERS,
+    HecError,
+    HecResult,
+    HecSender,
+    StubCollector,
+    run_hec_benchmark,
+)
+
+
+# Top level module group
+@click.group()
+def splunk() -> None:
+    pass
+
+
+@splunk.command()
+@click.option("--url", help="HEC URL, e.g. https://http-inputs-foo.splunkcloud.com")
+@click.option("--token", envvar="SPLUNK_HEC_TOKEN", help="HEC token")
+@click.option("--stub", is_flag=True, help="Send to a local stub collector")
+@click.option("-n", "--events", type=int, default=100000, show_default=True)
+@click.option("--event-bytes", type=int, default=256, show_default=True)
+@click.option("--batch-bytes", type=int, default=DEFAULT_BATCH_BYTES, show_default=True)
+@click.option("-w", "--workers", type=int, default=DEFAULT_WORKERS, show_default=True)
+@click.option("--no-gzip", is_flag=True, help="Send payloads uncompressed")
+@click.option("--acks", is_flag=True, help="Wait for indexer acknowledgement")
+@click.option("--index", help="Index to send the events to")
+@click.option("--insecure", is_flag=True, help="Don't verify the HEC certificate")
+def hec_benchmark(
+    url: Optional[str],
+    token: Optional[str],
+    stub: bool,
+    events: int,
+    event_bytes: int,
+    batch_bytes: int,
+    workers: int,
+    no_gzip: bool,
+    acks: bool,
+    index: Optional[str],
+    insecure: bool,
+) -> None:
+    """Measure HEC ingestion throughput with synthetic events."""
+
+    def benchmark(url: str, token: str) -> HecResult:
+        sender = HecSender(
+            url,
+            token,
+            batch_bytes=batch_bytes,
+            workers=workers,
+            compress=not no_gzip,
+            acks=acks,
+            verify=not insecure,
+        )
+        try:
+            return run_hec_benchmark(sender, events, event_bytes, index)
+        except HecError as e:
+            exit(f"[!] {e}")
+
+    if stub:
+        with StubCollector() as collector:
+            result = benchmark(collector.url, token or "stub")
+    elif url and token:
+        result = benchmark(url, token)
+    else:
+        raise click.UsageError("--url and --token are required without --stub")
+
+    print(f"events:       {result.events}")
+    print(f"requests:     {result.requests}")
+    print(f"bytes:        {result.bytes}")
+    print(f"gzip bytes:   {result.compressed_bytes}")
+    print(f"seconds:      {result.seconds:.2f}")
+    print(f"events/s:     {result.events_per_second():.0f}")
+    print(f"MB/s:         {result.bytes_per_second() / 1048576:.1f}")
+    if acks:
+        print(f"unacked:      {len(result.unacknowledged)}")
@@ -1,2 +1,2 @@
 from .api_test import splunk_api, splunk_credentials  # noqa: F401
-from .x509_test import cert_bundle, rfpac  # noqa: F401
+from .x509_test import cert_bundle, certificate, rfpac  # noqa: F401
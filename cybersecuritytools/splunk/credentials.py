@@ -2,6 +2,14 @@ from dataclasses import dataclass
 
 from cybersecuritytools.aws.ssm import env_or_param
 
+# The parameters read by `credentials`, each from the environment or SSM.
+CREDENTIAL_PARAMETERS = [
+    "splunk_{service}_hostname_query",
+    "splunk_{service}_port_query",
+    "splunk_{service}_username_query",
+    "splunk_{service}_password_query",
+]
+
 
 @dataclass
 class SplunkCredentials:
@@ -35,10 +43,9 @@ def credentials(ssm_root: str, service: str) -> SplunkCredentials:
     service = service.lower()
     assert service in ["api", "search"]
 
-    hostname = env_or_param(ssm_root, "splunk_{service}_hostname_query")
-    port = env_or_param(ssm_root, "splunk_{service}_port_query")
-    username = env_or_param(ssm_root, "splunk_{service}_username_query")
-    password = env_or_param(ssm_root, "splunk_{service}_password_query")
+    hostname, port, username, password = [
+        env_or_param(ssm_root, parameter) for parameter in CREDENTIAL_PARAMETERS
+    ]
 
     return SplunkCredentials(
         hostname=hostname,
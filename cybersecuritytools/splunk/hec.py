@@ -0,0 +1,376 @@
+"""Send events to a Splunk HTTP Event Collector (HEC).
+
+Events are JSON encoded once, packed into newline delimited payloads of up
+to `batch_bytes`, gzipped and posted concurrently over a pool of keep-alive
+connections. With `acks` enabled every request carries a channel and
+`wait_for_acks` polls `/services/collector/ack` until the indexers confirm
+the events were written.
+
+`StubCollector` is a local collector which counts what it receives, for
+benchmarking the sender without an indexer.
+"""
+
+import gzip
+import json
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from time import perf_counter, sleep
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Set
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ..metrics import timed
+from .api import PinnedCertificateAdapter
+from .x509 import RequestsFingerPrintAdapterCertificates
+
+# Splunk Cloud rejects HEC requests larger than 1 MB by default.
+DEFAULT_BATCH_BYTES = 512 * 1024
+DEFAULT_WORKERS = 4
+# HEC only returns these when it is refusing requests, before accepting any
+# events. A 500, 502 or 504 may come from a gateway after the events were
+# indexed, so retrying them could send the events twice.
+RETRY_STATUS_CODES = (429, 503)
+EVENT_PATH = "/services/collector/event"
+ACK_PATH = "/services/collector/ack"
+
+
+class HecError(Exception):
+    def __init__(
+        self, message: str = "", status_code: Optional[int] = None, code: int = -1
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+
+
+def hec_event(
+    event: Any,
+    time: Optional[float] = None,
+    index: Optional[str] = None,
+    sourcetype: Optional[str] = None,
+    source: Optional[str] = None,
+    host: Optional[str] = None,
+) -> Dict[str, Any]:
+    """A HEC event envelope, leaving out unset metadata.
+
+    >>> hec_event("hello", index="main")
+    {'event': 'hello', 'index': 'main'}
+    """
+    metadata = {
+        "time": time,
+        "index": index,
+        "sourcetype": sourcetype,
+        "source": source,
+        "host": host,
+    }
+    envelope = {"event": event}
+    envelope.update({k: v for k, v in metadata.items() if v is not None})
+    return envelope
+
+
+def event_payloads(
+    events: Iterable[Dict[str, Any]], batch_bytes: int = DEFAULT_BATCH_BYTES
+) -> Iterator[List[bytes]]:
+    """Group JSON encoded events into batches of up to `batch_bytes` once
+    newline delimited. An event larger than `batch_bytes` is sent alone.
+
+    >>> events = [hec_event("x" * 10) for _ in range(5)]
+    >>> [len(batch) for batch in event_payloads(events, batch_bytes=60)]
+    [2, 2, 1]
+    """
+    batch: List[bytes] = []
+    size = 0
+    for event in events:
+        encoded = json.dumps(event, separators=(",", ":")).encode()
+        if batch and size + len(encoded) + 1 > batch_bytes:
+            yield batch
+            batch = []
+            size = 0
+        batch.append(encoded)
+        size += len(encoded) + 1
+    if batch:
+        yield batch
+
+
+@dataclass
+class HecResult:
+    events: int = 0
+    requests: int = 0
+    bytes: int = 0
+    compressed_bytes: int = 0
+    seconds: float = 0.0
+    ack_ids: List[int] = field(default_factory=list)
+    unacknowledged: List[int] = field(default_factory=list)
+
+    def add(self, other: "HecResult") -> None:
+        self.events += other.events
+        self.requests += other.requests
+        self.bytes += other.bytes
+        self.compressed_bytes += other.compressed_bytes
+        self.ack_ids.extend(other.ack_ids)
+
+    def events_per_second(self) -> float:
+        return self.events / self.seconds if self.seconds else 0.0
+
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+
+class HecSender:
+    """Post events to the collector at `url`, e.g.
+    `https://http-inputs-foo.splunkcloud.com:443`.
+
+    `rfpac` pins the collector certificate like `SplunkApi`, otherwise
+    `verify` is passed to requests."""
+
+    def __init__(
+        self,
+        url: str,
+        token: str,
+        batch_bytes: int = DEFAULT_BATCH_BYTES,
+        workers: int = DEFAULT_WORKERS,
+        compress: bool = True,
+        acks: bool = False,
+        retries: int = 3,
+        timeout: float = 30.0,
+        rfpac: Optional[RequestsFingerPrintAdapterCertificates] = None,
+        verify: bool = True,
+    ):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.batch_bytes = batch_bytes
+        self.workers = workers
+        self.compress = compress
+        self.channel = str(uuid.uuid4()) if acks else None
+        self.timeout = timeout
+        self.verify = verify
+        self.session = self.create_session(retries, rfpac)
+
+    def create_session(
+        self, retries: int, rfpac: Optional[RequestsFingerPrintAdapterCertificates]
+    ) -> requests.Session:
+        # Retry POSTs only when the payload can't have been accepted: on a
+        # refused connection or a status in RETRY_STATUS_CODES. A read
+        # error may follow the events being indexed, so isn't retried.
+        retry = Retry(
+            total=retries,
+            read=0,
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=None,
+            raise_on_status=False,
+        )
+        adapter_kwargs: Dict[str, Any] = {
+            "pool_connections": 1,
+            "pool_maxsize": self.workers,
+            "max_retries": retry,
+        }
+        adapter: HTTPAdapter
+        if rfpac is not None:
+            adapter = PinnedCertificateAdapter(
+                rfpac.host_certificate_fingerprint(),
+                rfpac.ssl_context(),
+                **adapter_kwargs,
+            )
+        else:
+            adapter = HTTPAdapter(**adapter_kwargs)
+
+        session = requests.Session()
+        session.mount(self.url, adapter)
+        session.headers["Authorization"] = f"Splunk {self.token}"
+        if self.channel is not None:
+            session.headers["X-Splunk-Request-Channel"] = self.channel
+        return session
+
+    def post(self, path: str, data: bytes, headers: Dict[str, str]) -> Any:
+        with timed(f"splunk.hec.{path.rsplit('/', 1)[1]}") as call:
+            call.bytes = len(data)
+            response = self.session.post(
+                self.url + path,
+                data=data,
+                headers=headers,
+                timeout=self.timeout,
+                verify=self.verify,
+            )
+            call.error = response.status_code != 200
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if response.status_code != 200:
+            raise HecError(
+                f"HEC returned {response.status_code}: {body.get('text', '')}",
+                response.status_code,
+                body.get("code", -1),
+            )
+        return body
+
+    def send_batch(self, batch: List[bytes]) -> HecResult:
+        payload = b"\n".join(batch)
+        data = payload
+        headers = {}
+        if self.compress:
+            data = gzip.compress(payload, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+
+        body = self.post(EVENT_PATH, data, headers)
+        return HecResult(
+            events=len(batch),
+            requests=1,
+            bytes=len(payload),
+            compressed_bytes=len(data),
+            ack_ids=[body["ackId"]] if "ackId" in body else [],
+        )
+
+    def send(self, events: Iterable[Dict[str, Any]]) -> HecResult:
+        """Send `events`, made with `hec_event`, and return totals for the
+        requests made. Raises `HecError` if a batch is rejected."""
+        result = HecResult()
+        start = perf_counter()
+        # Only encode a couple of batches ahead of the workers, so sending
+        # a large or generated stream of events doesn't hold it in memory.
+        in_flight: Deque["Future[HecResult]"] = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for batch in event_payloads(events, self.batch_bytes):
+                if len(in_flight) >= 2 * self.workers:
+                    result.add(in_flight.popleft().result())
+                in_flight.append(executor.submit(self.send_batch, batch))
+            while in_flight:
+                result.add(in_flight.popleft().result())
+        result.seconds = perf_counter() - start
+        return result
+
+    def acknowledged(self, ack_ids: Iterable[int]) -> Set[int]:
+        body = self.post(ACK_PATH, json.dumps({"acks": list(ack_ids)}).encode(), {})
+        return {int(ack_id) for ack_id, done in body["acks"].items() if done}
+
+    def wait_for_acks(
+        self, ack_ids: Iterable[int], timeout: float = 60.0, poll_interval: float = 1.0
+    ) -> List[int]:
+        """Poll until every ack id is acknowledged or `timeout` seconds
+        pass, returning the ack ids that are still outstanding."""
+        if self.channel is None:
+            raise HecError("The sender was created without acks")
+
+        pending = set(ack_ids)
+        deadline = perf_counter() + timeout
+        while pending:
+            pending -= self.acknowledged(pending)
+            if not pending or perf_counter() > deadline:
+                break
+            sleep(poll_interval)
+        return sorted(pending)
+
+
+class StubCollector(ThreadingMixIn, HTTPServer):
+    """A local HEC endpoint that accepts every token, counting the events
+    and bytes it is sent. Each ack id is acknowledged the first time it is
+    polled for. Use it as a context manager to serve from a thread."""
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0):
+        super().__init__(("127.0.0.1", port), StubCollectorHandler)
+        self.events = 0
+        self.bytes = 0
+        self.requests = 0
+        self.next_ack_id = 0
+        # Statuses to reply to the next event requests with, without
+        # accepting their events.
+        self.fail_with: List[int] = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self) -> "StubCollector":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class StubCollectorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StubCollector
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+
+        if self.path == ACK_PATH:
+            acks = json.loads(body)["acks"]
+            self.reply({"acks": {str(ack_id): True for ack_id in acks}})
+            return
+
+        if self.path != EVENT_PATH:
+            self.reply({"text": "The requested URL was not found", "code": 404}, 404)
+            return
+
+        with self.server.lock:
+            status = self.server.fail_with.pop(0) if self.server.fail_with else 200
+        if status != 200:
+            self.reply({"text": "Server is busy", "code": 9}, status)
+            return
+
+        response: Dict[str, Any] = {"text": "Success", "code": 0}
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.events += body.count(b"\n") + 1
+            self.server.bytes += len(body)
+            if "X-Splunk-Request-Channel" in self.headers:
+                response["ackId"] = self.server.next_ack_id
+                self.server.next_ack_id += 1
+        self.reply(response)
+
+    def reply(self, body: Dict[str, Any], status: int = 200) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+def synthetic_events(
+    count: int, event_bytes: int = 256, index: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """`count` HEC events each with a message of about `event_bytes`."""
+    padding = "x" * event_bytes
+    for n in range(count):
+        yield hec_event(
+            {"n": n, "message": padding}, index=index, sourcetype="cst:benchmark"
+        )
+
+
+def run_hec_benchmark(
+    sender: HecSender,
+    count: int,
+    event_bytes: int = 256,
+    index: Optional[str] = None,
+    ack_timeout: float = 60.0,
+) -> HecResult:
+    """Time sending `count` synthetic events. When the sender uses acks the
+    time includes waiting for the events to be acknowledged."""
+    start = perf_counter()
+    result = sender.send(synthetic_events(count, event_bytes, index))
+    if sender.channel is not None:
+        result.unacknowledged = sender.wait_for_acks(
+            result.ack_ids, timeout=ack_timeout, poll_interval=0.1
+        )
+    result.seconds = perf_counter() - start
+    return result
@@ -0,0 +1,87 @@
+from typing import Iterator
+
+import pytest
+
+from .hec import (
+    HecError,
+    HecSender,
+    StubCollector,
+    hec_event,
+    run_hec_benchmark,
+    synthetic_events,
+)
+
+
+@pytest.fixture
+def collector() -> Iterator[StubCollector]:
+    with StubCollector() as collector:
+        yield collector
+
+
+def test_send_gzipped_batches(collector: StubCollector) -> None:
+    sender = HecSender(collector.url, "token", batch_bytes=4096, workers=3)
+    result = sender.send(synthetic_events(500, event_bytes=100))
+
+    assert result.events == collector.events == 500
+    assert result.requests == collector.requests > 1
+    assert result.bytes == collector.bytes
+    assert result.compressed_bytes < result.bytes
+    assert result.ack_ids == []
+
+
+def test_send_uncompressed(collector: StubCollector) -> None:
+    sender = HecSender(collector.url, "token", compress=False)
+    result = sender.send([hec_event("hello", index="main")])
+
+    assert result.events == collector.events == 1
+    assert result.compressed_bytes == result.bytes
+
+
+def test_acks(collector: StubCollector) -> None:
+    sender = HecSender(collector.url, "token", batch_bytes=1024, acks=True)
+    result = sender.send(synthetic_events(50))
+
+    assert sorted(result.ack_ids) == list(range(result.requests))
+    assert sender.wait_for_acks(result.ack_ids) == []
+
+
+def test_wait_for_acks_without_channel(collector: StubCollector) -> None:
+    sender = HecSender(collector.url, "token")
+    with pytest.raises(HecError):
+        sender.wait_for_acks([0])
+
+
+def test_rejected_batch(collector: StubCollector) -> None:
+    sender = HecSender(collector.url + "/missing", "token")
+    with pytest.raises(HecError) as e:
+        sender.send(synthetic_events(1))
+    assert e.value.status_code == 404
+
+
+def test_retries_busy_collector(collector: StubCollector) -> None:
+    collector.fail_with = [503, 429]
+    sender = HecSender(collector.url, "token")
+    result = sender.send(synthetic_events(10))
+
+    assert result.events == collector.events == 10
+    assert collector.requests == 1
+
+
+def test_server_error_not_retried(collector: StubCollector) -> None:
+    """A 500 may come after the events were indexed, so they aren't resent"""
+    collector.fail_with = [500, 500]
+    sender = HecSender(collector.url, "token")
+    with pytest.raises(HecError) as e:
+        sender.send(synthetic_events(10))
+
+    assert e.value.status_code == 500
+    assert collector.fail_with == [500]
+
+
+def test_run_hec_benchmark(collector: StubCollector) -> None:
+    sender = HecSender(collector.url, "token", acks=True)
+    result = run_hec_benchmark(sender, 1000, event_bytes=64)
+
+    assert result.events == 1000
+    assert result.unacknowledged == []
+    assert result.events_per_second() > 0
@@ -1,19 +1,53 @@
+import random
+from collections import deque
 from time import sleep
-from typing import Any, Dict, List
-
-from splunklib import client  # type: ignore
-from splunklib.results import ResultsReader  # type: ignore
+from typing import Any, Deque, Dict, Generator, Iterable, Iterator, List, Tuple
 
+from ..metrics import timed
 from .credentials import SplunkCredentials
 
+# Rows requested per call to the job results endpoint. This is kept
+# below Splunk's default `maxresultrows` of 50,000.
+DEFAULT_PAGE_SIZE = 10000
+
+# How a search is run:
+# normal   Create a job, poll until it is done, then page through the results
+# oneshot  Block on a single request that returns all of the results
+# export   Stream results back as the search produces them
+SEARCH_MODES = ["normal", "oneshot", "export"]
+
+# Splunk's default per user concurrent search quota for the `user` role
+# is 3, leave headroom for searches run from the web interface.
+DEFAULT_MAX_CONCURRENT_SEARCHES = 2
+
+
+def is_done(job: Any) -> bool:
+    with timed("splunk.search.job.is_done"):
+        return bool(job.is_done())
+
 
 class Search:
-    def __init__(self, credentials: SplunkCredentials):
+    def __init__(
+        self,
+        credentials: SplunkCredentials,
+        poll_interval: float = 0.1,
+        poll_max_interval: float = 5.0,
+        poll_backoff: float = 2.0,
+    ):
+        """`poll_interval` is the first wait between job status checks. It
+        is multiplied by `poll_backoff` after each check, up to
+        `poll_max_interval`, with random jitter to spread concurrent
+        pollers apart."""
         self.credentials = credentials
+        self.poll_interval = poll_interval
+        self.poll_max_interval = poll_max_interval
+        self.poll_backoff = poll_backoff
         self.client = self.create_client()
 
     def create_client(self) -> Any:
         """Create a client to connect to Splunk."""
+        from splunklib import client  # type: ignore
+
         return client.connect(
             host=self.credentials.hostname,
             port=self.credentials.port,
@@ -22,22 +56,169 @@ class Search:
         )
 
     def search(
-        self, search_query: str, search_kwargs: Dict[str, str] = {}
+        self,
+        search_query: str,
+        search_kwargs: Dict[str, str] = {},
+        mode: str = "normal",
     ) -> List[Dict[Any, Any]]:
         """Make a splunk search on `service`."""
+        return list(self.iter_results(search_query, search_kwargs, mode=mode))
+
+    def iter_results(
+        self,
+        search_query: str,
+        search_kwargs: Dict[str, str] = {},
+        page_size: int = DEFAULT_PAGE_SIZE,
+        output_mode: str = "json",
+        mode: str = "normal",
+    ) -> Iterator[Dict[Any, Any]]:
+        """Make a splunk search and yield each result row as it is read.
+
+        In "normal" mode results are fetched `page_size` rows at a time so
+        memory use is bounded by the page size rather than the size of
+        the result set. The search job is cancelled when the iterator is
+        exhausted or closed early, for example by breaking out of a `for`
+        loop. See `SEARCH_MODES` for the other modes, which don't poll.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
 
         if not search_kwargs:
             search_kwargs = self.search_defaults()
 
-        job = self.client.jobs.create(search_query, **search_kwargs)
+        if mode != "normal":
+            yield from self.stream_results(
+                search_query, search_kwargs, mode, output_mode
+            )
+            return
+
+        with timed("splunk.search.jobs.create"):
+            job = self.client.jobs.create(search_query, **search_kwargs)
+        try:
+            self.wait_for_job(job)
+            yield from self.job_results(job, page_size, output_mode)
+        finally:
+            job.cancel()
+
+    def search_many(
+        self,
+        search_queries: Iterable[str],
+        search_kwargs: Dict[str, str] = {},
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT_SEARCHES,
+    ) -> Generator[Tuple[str, List[Dict[Any, Any]]], None, None]:
+        """Run several searches as concurrent Splunk jobs, yielding
+        `(search_query, results)` for each job in the order they finish.
+
+        At most `max_concurrent` jobs run at once. If Splunk refuses a new
+        job because the user's search quota is full the limit is lowered
+        to the number of jobs already running. Jobs still running when
+        the iterator is closed early are cancelled.
+        """
+        from splunklib.binding import HTTPError  # type: ignore
+
+        if not search_kwargs:
+            search_kwargs = self.search_defaults()
+
+        pending: Deque[str] = deque(search_queries)
+        running: List[Tuple[str, Any]] = []
+        limit = max_concurrent
+        interval = self.poll_interval
+
+        try:
+            while pending or running:
+                while pending and len(running) < limit:
+                    try:
+                        with timed("splunk.search.jobs.create"):
+                            job = self.client.jobs.create(pending[0], **search_kwargs)
+                    except HTTPError as e:
+                        if e.status != 503 or not running:
+                            raise
+                        limit = len(running)
+                        break
+                    running.append((pending.popleft(), job))
+
+                finished = [(query, job) for query, job in running if is_done(job)]
+                if not finished:
+                    sleep(random.uniform(interval / 2, interval))
+                    interval = min(interval * self.poll_backoff, self.poll_max_interval)
+                    continue
+
+                interval = self.poll_interval
+                for query, job in finished:
+                    running.remove((query, job))
+                    try:
+                        results = list(self.job_results(job))
+                    finally:
+                        job.cancel()
+                    yield query, results
+        finally:
+            for _, job in running:
+                job.cancel()
+
+    def wait_for_job(self, job: Any) -> None:
+        """Poll `job` until it is done, backing off exponentially."""
+        interval = self.poll_interval
+        while not is_done(job):
+            sleep(random.uniform(interval / 2, interval))
+            interval = min(interval * self.poll_backoff, self.poll_max_interval)
+
+    def stream_results(
+        self,
+        search_query: str,
+        search_kwargs: Dict[str, str],
+        mode: str,
+        output_mode: str = "json",
+    ) -> Iterator[Dict[Any, Any]]:
+        """Run a "oneshot" or "export" search and yield the final result
+        rows, skipping previews and diagnostic messages."""
+        kwargs = {k: v for k, v in search_kwargs.items() if k != "exec_mode"}
+        if mode == "oneshot":
+            # A count of 0 returns every result rather than the first 100.
+            with timed("splunk.search.jobs.oneshot"):
+                stream = self.client.jobs.oneshot(
+                    search_query, count=0, output_mode=output_mode, **kwargs
+                )
+        else:
+            # Only the time until Splunk starts streaming results back.
+            with timed("splunk.search.jobs.export"):
+                stream = self.client.jobs.export(
+                    search_query,
+                    search_mode="normal",
+                    output_mode=output_mode,
+                    **kwargs,
+                )
+
+        reader = self.results_reader(output_mode)(stream)
+        for result in reader:
+            if isinstance(result, dict) and not reader.is_preview:
+                yield result
+
+    def results_reader(self, output_mode: str) -> Any:
+        from splunklib.results import JSONResultsReader, ResultsReader  # type: ignore
 
-        query_results: List[Dict[Any, Any]] = []
-        while not job.is_done():
-            sleep(0.1)
-        query_results = [r for r in ResultsReader(job.results())]
-        job.cancel()
+        return JSONResultsReader if output_mode == "json" else ResultsReader
 
-        return query_results
+    def job_results(
+        self, job: Any, page_size: int = DEFAULT_PAGE_SIZE, output_mode: str = "json"
+    ) -> Iterator[Dict[Any, Any]]:
+        """Page through the results of a finished job using `count` and
+        `offset`, yielding the rows and skipping Splunk's diagnostic
+        messages. `output_mode` is either "json" or "xml"."""
+        reader = self.results_reader(output_mode)
+        offset = 0
+        while True:
+            with timed("splunk.search.job.results"):
+                stream = job.results(
+                    count=page_size, offset=offset, output_mode=output_mode
+                )
+            rows = 0
+            for result in reader(stream):
+                if isinstance(result, dict):
+                    rows += 1
+                    yield result
+            if rows < page_size:
+                return
+            offset += rows
 
     def search_defaults(self, minutes: int = 15) -> Dict[str, str]:
         """Query Splunk for the latest CloudWatch test data."""
@@ -0,0 +1,132 @@
+import io
+import json
+from typing import Any, Dict, List
+
+import pytest
+from pytest_mock import MockerFixture
+
+from .credentials import SplunkCredentials
+from .search import Search
+
+
+class StubJob:
+    """A finished Splunk search job serving `rows` as JSON results."""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        self.pages: List[Dict[str, Any]] = []
+        self.cancelled = False
+
+    def is_done(self) -> bool:
+        return True
+
+    def results(self, count: int, offset: int, output_mode: str) -> io.BytesIO:
+        self.pages.append({"count": count, "offset": offset})
+        body = {
+            "preview": False,
+            "init_offset": offset,
+            "messages": [{"type": "INFO", "text": "stub"}],
+            "results": self.rows[offset : offset + count],  # noqa: E203
+        }
+        return io.BytesIO(json.dumps(body).encode())
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+@pytest.fixture
+def stub_job() -> StubJob:
+    return StubJob([{"_raw": f"event {i}"} for i in range(25)])
+
+
+@pytest.fixture
+def search(
+    mocker: MockerFixture, splunk_credentials: SplunkCredentials, stub_job: StubJob
+) -> Search:
+    mocker.patch("splunklib.client.connect")
+    search = Search(splunk_credentials)
+    search.client.jobs.create.return_value = stub_job
+    return search
+
+
+def test_search_returns_all_rows(search: Search, stub_job: StubJob) -> None:
+    results = search.search("search index=foo")
+    assert results == stub_job.rows
+    assert stub_job.cancelled
+
+
+def test_iter_results_pages(search: Search, stub_job: StubJob) -> None:
+    results = list(search.iter_results("search index=foo", page_size=10))
+    assert len(results) == 25
+    assert [p["offset"] for p in stub_job.pages] == [0, 10, 20]
+
+
+def test_iter_results_stops_early(search: Search, stub_job: StubJob) -> None:
+    for result in search.iter_results("search index=foo", page_size=10):
+        if result["_raw"] == "event 3":
+            break
+    assert len(stub_job.pages) == 1
+    assert stub_job.cancelled
+
+
+def test_wait_for_job_backs_off(search: Search, mocker: MockerFixture) -> None:
+    sleep = mocker.patch(f"{__package__}.search.sleep")
+    job = mocker.Mock()
+    job.is_done.side_effect = [False] * 8 + [True]
+    search.poll_interval = 1.0
+    search.poll_max_interval = 4.0
+
+    search.wait_for_job(job)
+
+    waits = [c.args[0] for c in sleep.mock_calls]
+    assert len(waits) == 8
+    assert 0.5 <= waits[0] <= 1.0
+    assert all(2.0 <= w <= 4.0 for w in waits[2:])
+
+
+@pytest.mark.parametrize("mode", ["oneshot", "export"])  # type: ignore
+def test_stream_modes_skip_polling(search: Search, mode: str) -> None:
+    body = {"preview": False, "results": [{"_raw": "a"}, {"_raw": "b"}]}
+    stream = getattr(search.client.jobs, mode)
+    stream.return_value = io.BytesIO(json.dumps(body).encode())
+
+    results = search.search("search index=foo", mode=mode)
+
+    assert results == [{"_raw": "a"}, {"_raw": "b"}]
+    assert "exec_mode" not in stream.call_args.kwargs
+    search.client.jobs.create.assert_not_called()
+
+
+def test_unknown_search_mode(search: Search) -> None:
+    with pytest.raises(ValueError):
+        search.search("search index=foo", mode="realtime")
+
+
+def test_search_many(search: Search, mocker: MockerFixture) -> None:
+    mocker.patch(f"{__package__}.search.sleep")
+    jobs = {
+        "slow": StubJob([{"_raw": "slow"}]),
+        "fast": StubJob([{"_raw": "fast"}]),
+        "last": StubJob([{"_raw": "last"}]),
+    }
+    jobs["slow"].is_done = mocker.Mock(side_effect=[False, False, True])  # type: ignore # noqa: E501
+    search.client.jobs.create.side_effect = lambda query, **kwargs: jobs[query]
+
+    results = list(search.search_many(["slow", "fast", "last"], max_concurrent=2))
+
+    assert [query for query, _ in results] == ["fast", "last", "slow"]
+    assert dict(results)["slow"] == [{"_raw": "slow"}]
+    assert all(job.cancelled for job in jobs.values())
+
+
+def test_search_many_cancels_on_close(search: Search, mocker: MockerFixture) -> None:
+    mocker.patch(f"{__package__}.search.sleep")
+    slow = StubJob([])
+    slow.is_done = mocker.Mock(return_value=False)  # type: ignore
+    search.client.jobs.create.side_effect = [StubJob([]), slow]
+
+    searches = search.search_many(["fast", "slow"])
+    assert next(searches)[0] == "fast"
+    searches.close()
+
+    assert slow.cancelled
@@ -1,25 +1,29 @@
 import base64
 import hashlib
-import os
-import tempfile
+import ssl
+import threading
 from dataclasses import dataclass
+from typing import Optional
 
-from ..aws.ssm import get_param_from_ssm
+from ..aws.ssm import env_or_param
 
+# The parameters read by `cert_bundle_new`, each from the environment or SSM.
+CERT_PARAMETERS = ["splunk_host_cert", "splunk_ca_cert"]
 
-@dataclass
+
+@dataclass(frozen=True)
 class CertBundle:
     host_cert: str
     ca_cert: str
 
 
 def cert_bundle_new(ssm_root: str) -> CertBundle:
-    host_cert = os.environ.get(
-        "SPLUNK_HOST_CERT", get_param_from_ssm(f"/{ssm_root}/splunk_host_cert")
-    )
-    ca_cert = os.environ.get(
-        "SPLUNK_CA_CERT", get_param_from_ssm(f"/{ssm_root}/splunk_ca_cert")
-    )
+    """Retrieve the Splunk certificates from the `SPLUNK_HOST_CERT` and
+    `SPLUNK_CA_CERT` environment variables, falling back to
+    '/{ssm_root}/splunk_host_cert' and '/{ssm_root}/splunk_ca_cert' in SSM."""
+    host_cert, ca_cert = [
+        env_or_param(ssm_root, parameter) for parameter in CERT_PARAMETERS
+    ]
     return CertBundle(
         host_cert=host_cert,
         ca_cert=ca_cert,
@@ -27,15 +31,16 @@ def cert_bundle_new(ssm_root: str) -> CertBundle:
 
 
 class RequestsFingerPrintAdapterCertificates:
+    """The Splunk certificates, held in memory. Fingerprints are computed
+    once and the `ssl.SSLContext` is built on first use, so one instance
+    can be shared between sessions and threads."""
+
     def __init__(self, cert_bundle: CertBundle):
         self.cert_bundle = cert_bundle
-        self.cert_file = tempfile.NamedTemporaryFile()
-        self.write_certificate_file()
-
-    def write_certificate_file(self) -> None:
-        armoured_certs = self.certificate_bundle()
-        self.cert_file.write(armoured_certs.encode())
-        self.cert_file.flush()
+        self.host_fingerprint = self.certificate_fingerprint(cert_bundle.host_cert)
+        self.ca_fingerprint = self.certificate_fingerprint(cert_bundle.ca_cert)
+        self._ssl_context: Optional[ssl.SSLContext] = None
+        self._lock = threading.Lock()
 
     def certificate_bundle(self) -> str:
         """Join multiple certificates into a the CA bundle format"""
@@ -52,10 +57,10 @@ class RequestsFingerPrintAdapterCertificates:
 """
 
     def host_certificate_fingerprint(self) -> str:
-        return self.certificate_fingerprint(self.cert_bundle.host_cert)
+        return self.host_fingerprint
 
     def ca_certificate_fingerprint(self) -> str:
-        return self.certificate_fingerprint(self.cert_bundle.ca_cert)
+        return self.ca_fingerprint
 
     def certificate_fingerprint(self, cert: str) -> str:
         """Generate a sha256 fingerprint from a certificater base64 encdoded
@@ -64,5 +69,13 @@ class RequestsFingerPrintAdapterCertificates:
         sha256.update(base64.b64decode(cert))
         return sha256.hexdigest()
 
-    def cert_filename(self) -> str:
-        return self.cert_file.name
+    def ssl_context(self) -> ssl.SSLContext:
+        """An SSL context trusting the certificate bundle, loaded from memory
+        rather than a CA file. The host certificate is pinned by fingerprint,
+        so hostnames are not checked."""
+        with self._lock:
+            if self._ssl_context is None:
+                context = ssl.create_default_context(cadata=self.certificate_bundle())
+                context.check_hostname = False
+                self._ssl_context = context
+        return self._ssl_context
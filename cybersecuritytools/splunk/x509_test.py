@@ -1,49 +1,85 @@
-from os.path import isfile
+import base64
+import datetime
+import ssl
+from typing import Tuple
 
 import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from pytest_mock import MockerFixture
 
 from .x509 import CertBundle, RequestsFingerPrintAdapterCertificates
 
 
-@pytest.fixture
-def cert_bundle() -> CertBundle:
-    host_cert = "AAAA"
-    ca_cert = "BBBB"
-    return CertBundle(host_cert, ca_cert)
+def self_signed_certificate() -> Tuple[bytes, bytes]:
+    """A self signed PEM certificate and private key for localhost."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.utcnow()
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    key_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    return cert.public_bytes(serialization.Encoding.PEM), key_pem
 
 
 @pytest.fixture
-def rfpac(cert_bundle: CertBundle) -> RequestsFingerPrintAdapterCertificates:
-    return RequestsFingerPrintAdapterCertificates(cert_bundle)
+def certificate() -> Tuple[bytes, bytes]:
+    return self_signed_certificate()
 
 
-def test_init_creates_cert_file(rfpac: RequestsFingerPrintAdapterCertificates) -> None:
-    assert rfpac.cert_file.name
-    assert isfile(rfpac.cert_file.name)
+@pytest.fixture
+def cert_bundle(certificate: Tuple[bytes, bytes]) -> CertBundle:
+    der = ssl.PEM_cert_to_DER_cert(certificate[0].decode())
+    cert = base64.b64encode(der).decode()
+    return CertBundle(host_cert=cert, ca_cert=cert)
 
 
-def test_cert_file(rfpac: RequestsFingerPrintAdapterCertificates) -> None:
-    with open(rfpac.cert_file.name) as f:
-        contents = f.read()
-    assert "-----BEGIN CERTIFICATE-----" in contents
-    assert "AAAA" in contents
-    assert "BBBB" in contents
-    assert "-----END CERTIFICATE-----" in contents
+@pytest.fixture
+def rfpac(cert_bundle: CertBundle) -> RequestsFingerPrintAdapterCertificates:
+    return RequestsFingerPrintAdapterCertificates(cert_bundle)
 
 
-def test_host_certificate_fingerprint(
-    rfpac: RequestsFingerPrintAdapterCertificates,
-) -> None:
+def test_certificate_fingerprints() -> None:
+    rfpac = RequestsFingerPrintAdapterCertificates(CertBundle("AAAA", "BBBB"))
     assert (
         rfpac.host_certificate_fingerprint()
         == "709e80c88487a2411e1ee4dfb9f22a861492d20c4765150c0c794abd70f8147c"
     )
-
-
-def test_ca_certificate_fingerprint(
-    rfpac: RequestsFingerPrintAdapterCertificates,
-) -> None:
     assert (
         rfpac.ca_certificate_fingerprint()
         == "09c08a63fc2b11a50cf88eb6f6c062c727964a0c828808fe46c740af3a33897a"
     )
+
+
+def test_fingerprints_computed_once(
+    rfpac: RequestsFingerPrintAdapterCertificates, mocker: MockerFixture
+) -> None:
+    fingerprint = mocker.spy(rfpac, "certificate_fingerprint")
+    for _ in range(3):
+        rfpac.host_certificate_fingerprint()
+        rfpac.ca_certificate_fingerprint()
+    assert fingerprint.call_count == 0
+
+
+def test_ssl_context_from_memory(
+    rfpac: RequestsFingerPrintAdapterCertificates,
+) -> None:
+    context = rfpac.ssl_context()
+    assert rfpac.ssl_context() is context
+    assert context.verify_mode == ssl.CERT_REQUIRED
+    assert not context.check_hostname
+    assert context.cert_store_stats()["x509"] == 1